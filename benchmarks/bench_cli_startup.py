@@ -0,0 +1,177 @@
+"""
+Startup time of ``rgs-cli`` per command, measured with ``python -X importtime``.
+
+Each command runs in a fresh interpreter ``--repeats`` times. The wall-clock time, the total
+import time and the number of modules imported are recorded, along with the slowest
+top-level imports. Commands that would touch the database only show their ``--help``.
+Results are appended to ``benchmarks/results/startup.jsonl``, tagged with the package
+version and commit::
+
+    python -m benchmarks.bench_cli_startup
+    python -m benchmarks.bench_cli_startup --compare 0.4.1   # exits with 1 if a command got more than 10% slower
+    python -m benchmarks.bench_cli_startup --report
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from benchmarks.suite import ROOT, git_commit, package_version
+
+DEFAULT_HISTORY = Path(__file__).resolve().parent / "results" / "startup.jsonl"
+COMMANDS = {
+    "import": [],  # Only import the CLI module
+    "--help": ["--help"],
+    "credentials check": ["credentials", "check"],
+    "fetch --help": ["fetch", "--help"],
+    "list-patients --help": ["list-patients", "--help"],
+    "sync --help": ["sync", "--help"],
+}
+HEAVY_MODULES = ("pandas", "sqlalchemy", "pyarrow", "numpy", "sklearn")
+
+
+def parse_importtime(stderr: str) -> Tuple[float, List[Tuple[str, float]], List[str]]:
+    """Total import seconds, top-level imports with their cumulative seconds, and all imported modules."""
+    top_level, modules = [], []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append(name.strip())
+        if not name.startswith("  "):  # Nested imports are indented by two spaces per level
+            top_level.append((name.strip(), int(cumulative) / 1e6))
+    return sum(seconds for _, seconds in top_level), top_level, modules
+
+
+def run_command(args: List[str]) -> Tuple[float, str]:
+    code = "from rgs_interface.cli import app; app()" if args else "import rgs_interface.cli"
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT / "src"), os.environ.get("PYTHONPATH")]))}
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code, *args], capture_output=True, text=True, env=env, cwd=ROOT
+    )
+    return time.perf_counter() - start, result.stderr
+
+
+def measure(args: List[str], repeats: int) -> Dict[str, object]:
+    wall, imports = [], []
+    for _ in range(repeats):
+        seconds, stderr = run_command(args)
+        import_seconds, top_level, modules = parse_importtime(stderr)
+        wall.append(seconds)
+        imports.append(import_seconds)
+    return {
+        "median_s": statistics.median(wall),
+        "min_s": min(wall),
+        "import_s": statistics.median(imports),
+        "modules": len(modules),
+        "heavy_modules": sorted({name.split(".")[0] for name in modules}.intersection(HEAVY_MODULES)),
+        "slowest_imports": [
+            [name, round(seconds, 4)] for name, seconds in sorted(top_level, key=lambda item: -item[1])[:5]
+        ],
+    }
+
+
+def load_history(path: Path) -> List[dict]:
+    if not path.exists():
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(current: List[dict], history: List[dict], baseline: str, threshold: float) -> int:
+    """Print the current medians against ``baseline`` (a version or commit) and return the number of regressions."""
+    previous = {}
+    for record in history:
+        if baseline in (record["version"], record["commit"]):
+            previous.setdefault(record["case"], []).append(record["median_s"])
+    if not previous:
+        print(f"No runs of {baseline} to compare against.")
+        return 0
+
+    regressions = 0
+    print(f"\n{'command':<24} {baseline:>10} {'current':>10} {'ratio':>7}")
+    for record in current:
+        if record["case"] not in previous:
+            continue
+        before = statistics.median(previous[record["case"]])
+        ratio = record["median_s"] / before
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{record['case']:<24} {before * 1000:>8.0f}ms {record['median_s'] * 1000:>8.0f}ms {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def report(history: List[dict]):
+    if not history:
+        print("No results recorded yet.")
+        return
+    medians: Dict[str, Dict[str, List[float]]] = {}
+    for record in history:
+        medians.setdefault(record["case"], {}).setdefault(record["version"], []).append(record["median_s"])
+    versions = sorted({record["version"] for record in history})
+    print(f"{'command':<24}" + "".join(f"{version:>10}" for version in versions))
+    for case, by_version in medians.items():
+        cells = [
+            f"{statistics.median(by_version[version]) * 1000:>8.0f}ms" if version in by_version else f"{'':>10}"
+            for version in versions
+        ]
+        print(f"{case:<24}" + "".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--history", type=Path, default=DEFAULT_HISTORY)
+    parser.add_argument("--no-save", action="store_true", help="Don't append the results to the history.")
+    parser.add_argument("--compare", metavar="VERSION", help="Version or commit to compare the results against.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Slowdown ratio flagged as a regression.")
+    parser.add_argument("--report", action="store_true", help="Print the recorded history and exit.")
+    args = parser.parse_args()
+
+    history = load_history(args.history)
+    if args.report:
+        report(history)
+        return
+
+    metadata = {
+        "version": package_version(),
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "repeats": args.repeats,
+    }
+    print(f"{metadata['version']} ({metadata['commit']}), Python {metadata['python']}")
+    print(f"{'command':<24} {'median ms':>10} {'import ms':>10} {'modules':>8}  heavy / slowest imports")
+    results = []
+    for case, command_args in COMMANDS.items():
+        result = measure(command_args, args.repeats)
+        results.append({**metadata, "case": case, **result})
+        slowest = ", ".join(f"{name}={seconds * 1000:.0f}" for name, seconds in result["slowest_imports"][:3])
+        print(
+            f"{case:<24} {result['median_s'] * 1000:>10.0f} {result['import_s'] * 1000:>10.0f} "
+            f"{result['modules']:>8}  {','.join(result['heavy_modules']) or '-'} / {slowest}"
+        )
+
+    if not args.no_save:
+        args.history.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.history, "a") as f:
+            for record in results:
+                f.write(json.dumps(record) + "\n")
+        print(f"\nResults appended to {args.history}")
+
+    if args.compare and compare(results, history, args.compare, args.threshold):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Memory of fetched frames with and without ``compact_dtypes``.
+
+Seeds a synthetic SQLite database (or uses ``--url``) and fetches the long DM/PE frames and
+the wide timeseries frame for the whole cohort, reporting the deep memory usage per query::
+
+    python -m benchmarks.bench_compact_dtypes --patients 500
+"""
+
+import argparse
+import tempfile
+from pathlib import Path
+
+from sqlalchemy import create_engine
+
+from benchmarks.synthetic import SyntheticScale, seed_database
+from rgs_interface.data.interface import DatabaseInterface
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="SQLAlchemy URL of a seeded database. Seeds a temporary SQLite file if omitted.")
+    parser.add_argument("--rgs-mode", default="plus")
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--sessions-per-patient", type=int, default=20)
+    parser.add_argument("--samples-per-session", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        url = args.url or f"sqlite:///{Path(tmp_dir) / 'rgs_bench.db'}"
+        engine = create_engine(url)
+        if not args.url:
+            scale = SyntheticScale(
+                patients=args.patients,
+                sessions_per_patient=args.sessions_per_patient,
+                samples_per_session=args.samples_per_session,
+            )
+            seed_database(engine, scale, [args.rgs_mode])
+
+        patient_ids = list(range(1, args.patients + 1))
+        default = DatabaseInterface(engine=engine)
+        compact = DatabaseInterface(engine=engine, compact_dtypes=True)
+
+        print(f"{'query':<24} {'rows':>10} {'default MiB':>12} {'compact MiB':>12} {'ratio':>7}")
+        for name, method in (
+            ("query_dm.sql", "fetch_dm_data"),
+            ("query_pe.sql", "fetch_pe_data"),
+            ("timeseries", "fetch_timeseries_data"),
+        ):
+            before = getattr(default, method)(patient_ids, rgs_mode=args.rgs_mode)
+            after = getattr(compact, method)(patient_ids, rgs_mode=args.rgs_mode)
+            if before is None or after is None:
+                raise SystemExit(f"{method} failed, see the log above.")
+            before_bytes, after_bytes = frame_bytes(before), frame_bytes(after)
+            print(
+                f"{name:<24} {len(after):>10,d} {before_bytes / 2**20:>12.1f} "
+                f"{after_bytes / 2**20:>12.1f} {before_bytes / after_bytes:>6.1f}x"
+            )
+
+        print()
+        print(compact.memory_report().to_string())
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Transform-only featurization with a saved ``PreprocessingArtifact`` versus the fitted sklearn pipeline.
+
+Fits ``preprocess_rgs_interaction`` on synthetic interactions once, saves the artifact, then
+times featurizing a single row (the recommender's per-request case) and a batch::
+
+    python -m benchmarks.bench_preprocess_transform
+    python -m benchmarks.bench_preprocess_transform --patients 2000 --batch 50000
+"""
+
+import argparse
+import contextlib
+import io
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import SyntheticScale, generate, interaction_frame
+from rgs_interface.data.preprocess import (
+    build_column_transformer,
+    infer_column_types,
+    load_preprocessing_artifact,
+    preprocess_features,
+    preprocess_rgs_interaction,
+    transform_only,
+)
+
+
+def measure(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=10000)
+    parser.add_argument("--single-repeats", type=int, default=2000)
+    parser.add_argument("--batch-repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    data = interaction_frame(generate(SyntheticScale(patients=args.patients)), "plus")
+    processed = preprocess_features(data)
+    batch = processed.sample(args.batch, replace=len(processed) < args.batch, random_state=0)
+    row = processed.iloc[[0]]
+    record = row.iloc[0].to_dict()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            preprocess_rgs_interaction(data, preprocess_features, Path(tmp_dir), artifact_filename="artifact.joblib")
+        print(f"fit + save: {time.perf_counter() - start:.2f}s on {len(processed):,d} rows")
+
+        artifact_path = Path(tmp_dir) / "artifact.joblib"
+        start = time.perf_counter()
+        artifact = load_preprocessing_artifact(artifact_path)
+        print(f"artifact load: {(time.perf_counter() - start) * 1e3:.1f}ms, {artifact.n_features} features")
+
+        # The baseline: the fitted sklearn ColumnTransformer called per request
+        categorical_cols, numerical_cols = infer_column_types(processed)
+        pipeline = build_column_transformer(numerical_cols, categorical_cols).fit(processed)
+
+        cases = (
+            ("single row", "sklearn pipeline", lambda: pipeline.transform(row), args.single_repeats),
+            ("single row", "transform_only(frame)", lambda: transform_only(row, artifact_path), args.single_repeats),
+            ("single row", "transform_only(record)", lambda: transform_only(record, artifact_path), args.single_repeats),
+            ("single row", "artifact.transform_record", lambda: artifact.transform_record(record), args.single_repeats),
+            (f"batch {args.batch}", "sklearn pipeline", lambda: pipeline.transform(batch), args.batch_repeats),
+            (f"batch {args.batch}", "artifact.transform", lambda: artifact.transform(batch), args.batch_repeats),
+            (f"batch {args.batch}", "artifact.transform(sparse)", lambda: artifact.transform(batch, sparse=True), args.batch_repeats),
+        )
+        print(f"{'input':<12} {'path':<28} {'median us':>12}")
+        for input_name, name, fn, repeats in cases:
+            print(f"{input_name:<12} {name:<28} {measure(fn, repeats) * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
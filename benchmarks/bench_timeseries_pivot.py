@@ -0,0 +1,69 @@
+"""
+Memory and latency of the wide timeseries pivot against the former DM/PE merge.
+
+Builds synthetic long-format DM and PE frames shaped like the results of
+``query_dm.sql`` / ``query_pe.sql`` (no database needed) and compares
+``pivot_timeseries`` with the five-key ``merge`` that ``fetch_timeseries_data``
+used before::
+
+    python -m benchmarks.bench_timeseries_pivot --sessions 2000 --samples-per-session 50
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.synthetic import SyntheticScale, generate
+from rgs_interface.data.timeseries import TIMESERIES_INDEX, pivot_timeseries
+
+
+def legacy_merge(dm, pe):
+    return dm.merge(pe, on=TIMESERIES_INDEX)
+
+
+def long_frames(scale):
+    frames = generate(scale, "plus")
+    dm = frames["difficulty_modulators_plus"].rename(columns={"PARAMETER_KEY": "DM_KEY", "PARAMETER_VALUE": "DM_VALUE"})
+    pe = frames["performance_estimators_plus"].rename(columns={"PARAMETER_KEY": "PE_KEY", "PARAMETER_VALUE": "PE_VALUE"})
+    columns = TIMESERIES_INDEX
+    return (
+        dm[columns + ["DM_KEY", "DM_VALUE"]].convert_dtypes(dtype_backend="numpy_nullable"),
+        pe[columns + ["PE_KEY", "PE_VALUE"]].convert_dtypes(dtype_backend="numpy_nullable"),
+    )
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=40)
+    parser.add_argument("--sessions-per-patient", type=int, default=50)
+    parser.add_argument("--samples-per-session", type=int, default=50)
+    args = parser.parse_args()
+
+    scale = SyntheticScale(
+        patients=args.patients,
+        sessions_per_patient=args.sessions_per_patient,
+        samples_per_session=args.samples_per_session,
+    )
+    dm, pe = long_frames(scale)
+    print(f"DM rows: {len(dm):,d}  PE rows: {len(pe):,d}")
+
+    print(f"{'method':>10} {'rows':>12} {'cols':>6} {'seconds':>9} {'peak MiB':>10} {'result MiB':>11}")
+    for name, fn in (("merge", legacy_merge), ("pivot", pivot_timeseries)):
+        result, elapsed, peak = measure(fn, dm, pe)
+        size = result.memory_usage(deep=True).sum()
+        print(f"{name:>10} {len(result):>12,d} {result.shape[1]:>6d} {elapsed:>9.3f} {peak / 2**20:>10.1f} {size / 2**20:>11.1f}")
+        del result
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 import sys
-sys.path.append("..")
+sys.path.append("../src")
 
 from pathlib import Path
-from recsys_interface.data.interface import DatabaseInterface
+from rgs_interface.data.interface import DatabaseInterface
 from datetime import datetime, date
 
 RGS_MODE = "app"
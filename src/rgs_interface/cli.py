@@ -1,9 +1,15 @@
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional, Union
 
-import pandas as pd
 import typer
-from rgs_interface.data.interface import DatabaseInterface
+from rgs_interface.constants import OUTPUT_FORMATS, RGS_MODES
+
+# pandas, SQLAlchemy and the data modules are imported inside the commands that use them,
+# so --help and the credentials commands don't pay for loading them.
+if TYPE_CHECKING:
+    from rgs_interface.data.cohort import Cohort
+    from rgs_interface.data.interface import DatabaseInterface
+    from rgs_interface.data.output import OutputSink
 
 app = typer.Typer(help="RGS Data CLI")
 
@@ -11,11 +17,33 @@ credentials_app = typer.Typer(help="Manage RGS credentials.")
 app.add_typer(credentials_app, name="credentials")
 
 
-def _save_rgs_data(patient_ids: List[int], rgs_mode: str, output_file: Optional[Path]):
-    db_handler = DatabaseInterface()
-    out_file = output_file or Path(f"rgs_{rgs_mode}.csv")
-    db_handler.fetch_rgs_data(patient_ids, rgs_mode=rgs_mode, output_file=out_file)
-    typer.echo(f"Data saved to {out_file}")
+def _save_rgs_data(
+    patient_ids: Union[List[int], "Cohort"],
+    rgs_mode: str,
+    sink: "OutputSink",
+    chunksize: Optional[int] = None,
+    db_handler: Optional["DatabaseInterface"] = None,
+):
+    if db_handler is None:
+        from rgs_interface.data.interface import DatabaseInterface
+
+        db_handler = DatabaseInterface()
+    if chunksize:
+        try:
+            for _ in db_handler.fetch_rgs_data_iter(
+                patient_ids, rgs_mode=rgs_mode, chunksize=chunksize, output_file=sink
+            ):
+                pass
+        except Exception as e:
+            typer.echo(f"[ERROR] Streaming the RGS data failed: {str(e).splitlines()[0]}")
+            raise typer.Exit(code=1)
+        if sink.n_rows == 0:
+            typer.echo("[WARNING] The query returned no rows; nothing was written.")
+            return
+    elif db_handler.fetch_rgs_data(patient_ids, rgs_mode=rgs_mode, output_file=sink) is None:
+        typer.echo("[ERROR] Fetching the RGS data failed; see the log for details.")
+        raise typer.Exit(code=1)
+    typer.echo(f"Data saved to {sink.path} ({sink.n_rows} rows)")
 
 
 @credentials_app.command("set")
@@ -78,13 +106,58 @@ def fetch(
     study: Optional[str] = typer.Option(
         None, help="Study ID to fetch all patients for a study."
     ),
+    cohort: Optional[str] = typer.Option(
+        None,
+        help="Cohort expression, e.g. 'hospital:7,8 & study:STUDY_001 - file:exclude.txt', resolved by the database.",
+    ),
     rgs_mode: str = typer.Option("app", help="Mode for RGS data (default: 'app')."),
     output_file: Optional[Path] = typer.Option(
         None, "--output-file", "-o", help="Path to save the output file."
     ),
+    chunksize: Optional[int] = typer.Option(
+        None, help="Stream the result to the output file in chunks of this many rows."
+    ),
+    output_format: Optional[str] = typer.Option(
+        None,
+        "--format",
+        help=f"Output format, one of {', '.join(OUTPUT_FORMATS)} (default: inferred from the file extension).",
+    ),
+    compression: Optional[str] = typer.Option(
+        None, help="Compression codec, e.g. zstd, snappy, gzip (default depends on the format)."
+    ),
+    partition_by: Optional[List[str]] = typer.Option(
+        None, help="Partition parquet/feather output by these columns, e.g. PATIENT_ID."
+    ),
+    local_store: Optional[Path] = typer.Option(
+        None, help="Answer the query from a local store created with `rgs-cli sync` instead of the database."
+    ),
 ):
-    """Load RGS data by patient IDs, hospital IDs, or study ID."""
-    db_handler = DatabaseInterface()
+    """Load RGS data by patient IDs, hospital IDs, study ID, or cohort expression."""
+    from rgs_interface.data.cohort import Cohort, CohortSyntaxError
+    from rgs_interface.data.interface import DatabaseInterface
+    from rgs_interface.data.output import OutputSink
+    from rgs_interface.data.store import LocalStore
+
+    try:
+        sink = OutputSink(
+            output_file or Path(f"rgs_{rgs_mode}.{output_format or 'csv'}"),
+            output_format=output_format,
+            compression=compression,
+            partition_cols=partition_by,
+        )
+    except ValueError as e:
+        typer.echo(f"[ERROR] {e}")
+        raise typer.Exit(code=1)
+
+    db_handler = DatabaseInterface(local_store=LocalStore(local_store) if local_store else None)
+    if cohort:
+        try:
+            _save_rgs_data(Cohort(cohort), rgs_mode, sink, chunksize, db_handler)
+        except CohortSyntaxError as e:
+            typer.echo(f"[ERROR] {e}")
+            raise typer.Exit(code=1)
+        return
+
     patient_ids = None
     if patients_file:
         with open(patients_file, "r", encoding="utf-8") as f:
@@ -97,18 +170,44 @@ def fetch(
         patient_ids = db_handler.fetch_patients_by_study(study)
     else:
         typer.echo(
-            "[ERROR] Provide one of --patients, --patients-file, --hospital, or --study."
+            "[ERROR] Provide one of --patients, --patients-file, --hospital, --study, or --cohort."
         )
         raise typer.Exit(code=1)
     unique_patient_ids = normalize_patient_ids(patient_ids)
     if not unique_patient_ids:
         typer.echo("[ERROR] No patient IDs found after deduplication.")
         raise typer.Exit(code=1)
-    _save_rgs_data(unique_patient_ids, rgs_mode, output_file)
+    _save_rgs_data(unique_patient_ids, rgs_mode, sink, chunksize, db_handler)
+
+
+@app.command()
+def sync(
+    store: Path = typer.Option(..., help="Directory of the local store (created if missing)."),
+    rgs_mode: Optional[List[str]] = typer.Option(
+        None, help=f"RGS modes to sync (default: {', '.join(RGS_MODES)})."
+    ),
+):
+    """Pull the sessions added or changed since the last sync into a local store."""
+    from rgs_interface.data.store import LocalStore
+    from rgs_interface.db import get_db_engine
+
+    engine = get_db_engine()
+    if not engine:
+        typer.echo("[ERROR] Database engine could not be obtained.")
+        raise typer.Exit(code=1)
+    try:
+        pulled = LocalStore(store).sync(engine, rgs_mode or RGS_MODES)
+    except ValueError as e:
+        typer.echo(f"[ERROR] {e}")
+        raise typer.Exit(code=1)
+    for table_name, rows in pulled.items():
+        typer.echo(f"{table_name}: {rows} rows")
 
 
 def normalize_patient_ids(patient_ids) -> list[int]:
     """Convert patient_ids (DataFrame, Series, list, or None) to a unique sorted list of ints."""
+    import pandas as pd
+
     if patient_ids is None:
         return []
     if isinstance(patient_ids, pd.DataFrame):
@@ -128,10 +227,24 @@ def normalize_patient_ids(patient_ids) -> list[int]:
 def list_patients(
     hospital: Optional[List[int]] = typer.Option(None, help="List of hospital IDs."),
     study: Optional[str] = typer.Option(None, help="Study ID to list patients for."),
+    cohort: Optional[str] = typer.Option(None, help="Cohort expression to list the patients of."),
 ):
-    """List patient IDs by hospital or study."""
+    """List patient IDs by hospital, study, or cohort expression."""
+    from rgs_interface.data.cohort import CohortSyntaxError
+    from rgs_interface.data.interface import DatabaseInterface
+
     db_handler = DatabaseInterface()
-    if hospital:
+    if cohort:
+        try:
+            unique_patient_ids = db_handler.resolve_cohort(cohort)
+        except CohortSyntaxError as e:
+            typer.echo(f"[ERROR] {e}")
+            raise typer.Exit(code=1)
+        if not unique_patient_ids:
+            typer.echo("[ERROR] No patient IDs found for the given cohort.")
+            raise typer.Exit(code=1)
+        typer.echo(f"Patients in cohort {cohort}: {unique_patient_ids}")
+    elif hospital:
         patient_ids = db_handler.fetch_patients_by_hospital(hospital)
         unique_patient_ids = normalize_patient_ids(patient_ids)
         if not unique_patient_ids:
@@ -146,7 +259,7 @@ def list_patients(
             raise typer.Exit(code=1)
         typer.echo(f"Patients in study {study}: {unique_patient_ids}")
     else:
-        typer.echo("[ERROR] Provide --hospital or --study to list patients.")
+        typer.echo("[ERROR] Provide --hospital, --study, or --cohort to list patients.")
         raise typer.Exit(code=1)
 
 
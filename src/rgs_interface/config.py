@@ -8,6 +8,17 @@ from getpass import getpass
 CONFIG_FILE = Path.home() / ".rgs_config.yaml"  # Store in user home dir
 ENV_FILE = Path(".env")  # Local env file
 
+# Connection pool settings, overridable through the environment or the YAML config file
+POOL_DEFAULTS = {
+    "DB_POOL_SIZE": 5,
+    "DB_MAX_OVERFLOW": 10,
+    "DB_POOL_RECYCLE": 3600,
+    "DB_POOL_TIMEOUT": 30,
+    "DB_POOL_PRE_PING": True,
+}
+
+_loaded_config = None
+
 def is_interactive():
     return sys.stdin.isatty()
 
@@ -26,11 +37,18 @@ def save_to_env(db_user, db_pass, db_host, db_name):
         f.write(f"DB_PASS={db_pass}\n")
         f.write(f"DB_HOST={db_host}\n")
         f.write(f"DB_NAME={db_name}\n")
+    clear_config_cache()
 
 def save_to_yaml(db_user, db_pass, db_host, db_name):
     """Save credentials to YAML config file."""
     with open(CONFIG_FILE, "w") as f:
         yaml.dump({"DB_USER": db_user, "DB_PASS": db_pass, "DB_HOST": db_host, "DB_NAME": db_name}, f)
+    clear_config_cache()
+
+def clear_config_cache():
+    """Forget the credentials memoized by load_config, so the next call reads them again."""
+    global _loaded_config
+    _loaded_config = None
 
 def get_config():
     
@@ -56,7 +74,37 @@ def get_config():
     # If neither source provides the configuration, return None
     return None
 
+def get_pool_config():
+    """
+    Return the connection pool settings. Each of the POOL_DEFAULTS keys is read from the
+    environment (or .env file) first, then from the YAML config file, then falls back to its default.
+    """
+    load_dotenv(ENV_FILE)
+
+    file_config = {}
+    if CONFIG_FILE.exists():
+        with open(CONFIG_FILE, "r") as f:
+            file_config = yaml.safe_load(f) or {}
+
+    pool_config = {}
+    for key, default in POOL_DEFAULTS.items():
+        value = os.getenv(key, file_config.get(key, default))
+        if isinstance(default, bool):
+            if isinstance(value, str):
+                value = value.strip().lower() in ("1", "true", "yes", "on")
+            pool_config[key] = bool(value)
+        else:
+            pool_config[key] = int(value)
+    return pool_config
+
 def load_config():
+    """Return the database credentials, prompting for them if needed. The result is memoized per process."""
+    global _loaded_config
+    if _loaded_config is None:
+        _loaded_config = _load_config()
+    return _loaded_config
+
+def _load_config():
     config = get_config()
     
     if config:
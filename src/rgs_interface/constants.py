@@ -0,0 +1,7 @@
+# Constants needed to build the CLI. This module must not import pandas, SQLAlchemy or
+# anything else heavy, so that `rgs-cli --help` and the credentials commands start quickly.
+
+# Table suffixes of the per-mode RGS tables (prescription_plus, session_app, ...)
+RGS_MODES = ("plus", "app")
+
+OUTPUT_FORMATS = ("csv", "parquet", "feather")
@@ -0,0 +1,115 @@
+from contextlib import nullcontext
+from typing import Iterator, List
+
+import pandas as pd
+import pyarrow as pa
+
+DEFAULT_BATCH_SIZE = 65536
+
+_NUMPY_NULLABLE_TYPES = {
+    pa.int8(): pd.Int8Dtype(),
+    pa.int16(): pd.Int16Dtype(),
+    pa.int32(): pd.Int32Dtype(),
+    pa.int64(): pd.Int64Dtype(),
+    pa.uint8(): pd.UInt8Dtype(),
+    pa.uint16(): pd.UInt16Dtype(),
+    pa.uint32(): pd.UInt32Dtype(),
+    pa.uint64(): pd.UInt64Dtype(),
+    pa.float32(): pd.Float32Dtype(),
+    pa.float64(): pd.Float64Dtype(),
+    pa.bool_(): pd.BooleanDtype(),
+    pa.string(): pd.StringDtype(),
+    pa.large_string(): pd.StringDtype(),
+}
+
+
+def iter_record_batches(
+    connection, query_text, params=None, batch_size: int = DEFAULT_BATCH_SIZE, timer=None
+) -> Iterator[pa.RecordBatch]:
+    """
+    Execute ``query_text`` on ``connection`` and yield its result as Arrow record batches of
+    at most ``batch_size`` rows.
+
+    Rows are fetched from the DBAPI cursor in blocks and transposed into one Arrow array per
+    column, skipping SQLAlchemy Row objects and the per-value conversions ``pd.read_sql``
+    does on object columns. The column types are inferred per batch, so a column that is
+    all NULL in one batch may come out as ``null`` there; :func:`read_table` unifies them.
+    DECIMAL columns are converted to float64, as ``pd.read_sql`` does by default. An empty
+    result yields a single empty batch of ``null`` columns.
+
+    :param timer: Optional QueryEvent (see ``instrumentation``) charged with the time spent in
+        the ``"execute"``, ``"fetch"`` and ``"build"`` phases.
+    """
+    phase = timer.phase if timer is not None else _no_phase
+    with phase("execute"):
+        result = connection.execution_options(stream_results=True, max_row_buffer=batch_size).execute(
+            query_text, params or {}
+        )
+    try:
+        names = list(result.keys())
+        n_batches = 0
+        cursor = None
+        while True:
+            with phase("fetch"):
+                if n_batches == 0:
+                    # With stream_results on a server-side cursor dialect (pymysql), SQLAlchemy has
+                    # already buffered the first row, so the first block is read through the result.
+                    # It empties that buffer; later blocks come straight from the DBAPI cursor
+                    rows = result.fetchmany(batch_size)
+                    cursor = result.cursor
+                else:
+                    rows = cursor.fetchmany(batch_size) if cursor is not None else []
+            if not rows:
+                break
+            with phase("build"):
+                arrays = [_to_array(values) for values in zip(*rows)]
+                batch = pa.RecordBatch.from_arrays(arrays, names=names)
+            yield batch
+            n_batches += 1
+        if n_batches == 0:
+            yield pa.RecordBatch.from_arrays([pa.array([], pa.null()) for _ in names], names=names)
+    finally:
+        result.close()
+
+
+def read_table(connection, query_text, params=None, batch_size: int = DEFAULT_BATCH_SIZE, timer=None) -> pa.Table:
+    """
+    Execute ``query_text`` on ``connection`` and return the whole result as an Arrow table.
+    See :func:`iter_record_batches`.
+    """
+    batches = iter_record_batches(connection, query_text, params, batch_size, timer)
+    tables = [pa.Table.from_batches([batch]) for batch in batches]
+    with (timer.phase if timer is not None else _no_phase)("build"):
+        return concat_tables(tables)
+
+
+def concat_tables(tables: List[pa.Table]) -> pa.Table:
+    """
+    Concatenate tables whose column types may differ (e.g. ``null`` vs ``int64``, or
+    ``int64`` vs ``double``), promoting them to a common type.
+    """
+    schema = pa.unify_schemas([table.schema for table in tables], promote_options="permissive")
+    return pa.concat_tables([table.cast(schema) for table in tables])
+
+
+def to_pandas(table: pa.Table, dtype_backend: str = "numpy_nullable") -> pd.DataFrame:
+    """
+    Convert an Arrow table to a DataFrame with the same ``dtype_backend`` semantics as ``pd.read_sql``:
+    ``"numpy_nullable"`` (pandas masked dtypes), ``"pyarrow"`` (ArrowDtype) or ``"numpy"``.
+    """
+    if dtype_backend == "pyarrow":
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    types_mapper = _NUMPY_NULLABLE_TYPES.get if dtype_backend == "numpy_nullable" else None
+    return table.to_pandas(types_mapper=types_mapper, coerce_temporal_nanoseconds=True)
+
+
+def _no_phase(name):
+    return nullcontext()
+
+
+def _to_array(values) -> pa.Array:
+    array = pa.array(values)
+    if pa.types.is_decimal(array.type):
+        array = array.cast(pa.float64())
+    return array
+
@@ -0,0 +1,325 @@
+import asyncio
+import itertools
+import logging
+from typing import Iterable, Optional, Union
+
+import pandas as pd
+from sqlalchemy import exc, insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from rgs_interface.data.interface import (
+    CLINICAL_DATA_QUERY,
+    CLINICAL_SCORES_QUERY,
+    PATIENT_IDS_PARAM,
+    PATIENTS_BY_HOSPITAL_QUERY,
+    PATIENTS_BY_NAME_QUERY,
+    PATIENTS_BY_STUDY_QUERY,
+    PATIENTS_QUERY,
+    PRESCRIPTION_STAGING_INSERT,
+    PRESCRIPTION_STAGING_TABLE,
+    RECSYS_METRICS_INSERT,
+    RECSYS_METRICS_TABLE,
+    DatabaseInterface,
+    first_inserted_id,
+    plan_cohort_query,
+    prepare_bulk_rows,
+)
+from rgs_interface.data.clinical import ClinicalScoresCache, flatten_clinical_scores, pivot_clinical_scores
+from rgs_interface.data.cohort import Cohort
+from rgs_interface.data.output import write_frame
+from rgs_interface.data.queries import registry as queries
+from rgs_interface.data.schemas import BulkInsertResult, PrescriptionStagingRow, RecsysMetricsRow
+from rgs_interface.data.timeseries import pivot_timeseries
+from rgs_interface.db import get_async_db_engine
+
+logger = logging.getLogger(__name__)
+
+
+def _to_frame(batches, dtype_backend="numpy_nullable") -> pd.DataFrame:
+    """
+    Build a DataFrame the way ``pd.read_sql`` does from the ``(rows, columns)`` fetched for
+    each part of a query, concatenating their rows.
+    """
+    rows = list(itertools.chain.from_iterable(batch_rows for batch_rows, _ in batches))
+    df = pd.DataFrame.from_records(rows, columns=list(batches[0][1]), coerce_float=True)
+    if dtype_backend != "numpy":
+        df = df.convert_dtypes(dtype_backend=dtype_backend)
+    return df
+
+
+class AsyncDatabaseInterface:
+    """
+    asyncio counterpart of :class:`DatabaseInterface`, for use from event-loop based services.
+
+    Queries run on a SQLAlchemy AsyncEngine (aiomysql by default), so awaiting a fetch does
+    not block the event loop. Building the DataFrame, pivoting and writing output files happen
+    in a worker thread via ``asyncio.to_thread``. Long patient ID lists are split into batches
+    like in DatabaseInterface, and a Cohort passed as ``patient_ids`` is resolved by the database
+    the same way. The temporary table path and the result cache are not available.
+
+    :param engine: AsyncEngine to use instead of the one built from the stored credentials
+        (e.g. ``create_async_engine("sqlite+aiosqlite:///rgs.db")`` for local testing).
+    :param max_concurrency: Maximum number of queries this interface runs against the database at once.
+    :param patient_batch_size: Patient ID lists longer than this are split into batches of this size.
+    """
+
+    def __init__(
+        self,
+        engine: Optional[AsyncEngine] = None,
+        max_concurrency: int = 4,
+        patient_batch_size: int = 1000,
+    ):
+        self.engine = engine if engine is not None else get_async_db_engine()
+        self.max_concurrency = max(1, max_concurrency)
+        self._query_slots = asyncio.Semaphore(self.max_concurrency)
+        self.patient_batch_size = patient_batch_size
+        self.clinical_scores_cache = ClinicalScoresCache()
+        if not self.engine:
+            logger.critical("Database engine could not be obtained during AsyncDatabaseInterface initialization.")
+
+    ###########################
+    ### ---- Get Data ---- ####
+    ###########################
+
+    async def fetch_rgs_data(self, patient_ids, rgs_mode="plus", output_file=None):
+        """
+        Fetch RGS interaction data for given patient IDs. See :meth:`DatabaseInterface.fetch_rgs_data`.
+        """
+        return await self._fetch(
+            query="query.sql",
+            params=DatabaseInterface._patient_params(patient_ids),
+            rgs_mode=rgs_mode,
+            output_file=output_file,
+        )
+
+    async def fetch_timeseries_data(self, patient_ids, rgs_mode="plus", output_file=None):
+        """
+        Fetch timeseries RGS interaction data for given patient IDs as a wide frame.
+        See :meth:`DatabaseInterface.fetch_timeseries_data`.
+        """
+        params = DatabaseInterface._patient_params(patient_ids)
+        dm, pe = await asyncio.gather(
+            self._fetch(query="query_dm.sql", params=params, rgs_mode=rgs_mode),
+            self._fetch(query="query_pe.sql", params=params, rgs_mode=rgs_mode),
+        )
+        if dm is None or pe is None:
+            return None
+
+        df = await asyncio.to_thread(pivot_timeseries, dm, pe)
+        if output_file:
+            await asyncio.to_thread(write_frame, df, output_file)
+        return df
+
+    async def fetch_clinical_data(self, patient_ids, output_file=None):
+        """
+        Fetch clinical data for given patient IDs, from the `clinical_trials` table.
+        See :meth:`DatabaseInterface.fetch_clinical_data`.
+        """
+        return await self._fetch(
+            query=CLINICAL_DATA_QUERY,
+            params={PATIENT_IDS_PARAM: DatabaseInterface._patient_ids(patient_ids)},
+            output_file=output_file,
+        )
+
+    async def fetch_clinical_scores(self, patient_ids, wide=False, output_file=None):
+        """
+        Fetch the clinical scores of given patient IDs as a columnar frame.
+        See :meth:`DatabaseInterface.fetch_clinical_scores`.
+        """
+        trials = await self._fetch(
+            query=CLINICAL_SCORES_QUERY, params={PATIENT_IDS_PARAM: DatabaseInterface._patient_ids(patient_ids)}
+        )
+        if trials is None:
+            return None
+
+        def flatten():
+            df = flatten_clinical_scores(trials, self.clinical_scores_cache)
+            df = pivot_clinical_scores(df) if wide else df
+            if output_file:
+                write_frame(df, output_file)
+            return df
+
+        return await asyncio.to_thread(flatten)
+
+    ### ---- Get IDs ---- ####
+
+    async def fetch_patients_by_hospital(self, hospital_ids):
+        """
+        Fetch list of patient IDs from a given list of hospital IDs.
+        """
+        if not isinstance(hospital_ids, (list, tuple)):
+            hospital_ids = [hospital_ids]
+        return await self._fetch(query=PATIENTS_BY_HOSPITAL_QUERY, params={"h_ids": tuple(hospital_ids)})
+
+    async def fetch_patients_by_name(self, pattern):
+        """
+        Fetch patient IDs based on a pattern match in the PATIENT_USER field.
+        """
+        return await self._fetch(query=PATIENTS_BY_NAME_QUERY, params={"pattern": f"%{pattern}%"})
+
+    async def fetch_patients_by_study(self, study_ids):
+        """
+        Fetch patient IDs based on which study
+        """
+        return await self._fetch(query=PATIENTS_BY_STUDY_QUERY, params={"study_id": tuple(study_ids)})
+
+    async def fetch_patients(self):
+        return await self._fetch(query=PATIENTS_QUERY)
+
+    ### ---- Read Handler ---- ####
+
+    async def _fetch(self, query, params=None, rgs_mode=None, output_file=None, dtype_backend="numpy_nullable"):
+        """
+        Async counterpart of :meth:`DatabaseInterface._fetch`.
+        :return: DataFrame with query results, or None if the query failed.
+        """
+        if not self.engine:
+            logger.error("Query execution failed: Database engine not available.")
+            return None
+
+        try:
+            batches = await asyncio.gather(*(
+                self._read(*part) for part in self._plan_query(query, params, rgs_mode)
+            ))
+            # The rows are concatenated in the worker thread too, off the event loop
+            df = await asyncio.to_thread(_to_frame, batches, dtype_backend)
+
+            if output_file:
+                await asyncio.to_thread(write_frame, df, output_file)
+            return df
+        except Exception as e:
+            logger.exception("Query execution failed with exception.")
+            return None
+
+    async def _read(self, query_text, params=None, setup=()):
+        async with self._query_slots:
+            async with self.engine.connect() as connection:
+                for statement, statement_params in setup:
+                    await connection.execute(statement, statement_params)
+                if setup:
+                    await connection.commit()
+                result = await connection.execute(query_text, params)
+                return result.fetchall(), list(result.keys())
+
+    def _plan_query(self, query, params=None, rgs_mode=None):
+        """
+        Split a query into ``(query_text, params, setup)`` parts like :meth:`DatabaseInterface._plan_query`:
+        one per batch of at most ``patient_batch_size`` patient IDs, or a single one filtering on a Cohort.
+        """
+        patient_ids = (params or {}).get(PATIENT_IDS_PARAM)
+        if isinstance(patient_ids, Cohort):
+            return [plan_cohort_query(queries.render(query, rgs_mode), params)]
+        query_text = queries.get(query, rgs_mode)
+        if patient_ids is None or len(patient_ids) <= self.patient_batch_size:
+            return [(query_text, params, ())]
+
+        patient_ids = sorted(set(patient_ids))
+        batch_size = self.patient_batch_size
+        return [
+            (query_text, {**params, PATIENT_IDS_PARAM: tuple(patient_ids[i:i + batch_size])}, ())
+            for i in range(0, len(patient_ids), batch_size)
+        ]
+
+    ### ---- Write Operations ---- ###
+
+    async def add_prescription_staging_entry(self, entry: PrescriptionStagingRow) -> Union[int, None]:
+        """
+        Adds a new entry to the prescription_staging table and returns the new ID.
+        """
+        if not isinstance(entry, PrescriptionStagingRow):
+            logger.error("Error: entry must be an instance of PrescriptionStagingRow.")
+            return None
+        return await self._insert_one(PRESCRIPTION_STAGING_INSERT, entry, "prescription staging")
+
+    async def add_recsys_metric_entry(self, entry: RecsysMetricsRow) -> Union[int, None]:
+        """
+        Adds a new entry to the recsys_metrics table and returns the new ID.
+        """
+        if not isinstance(entry, RecsysMetricsRow):
+            logger.error("Error: entry must be an instance of RecsysMetricsRow.")
+            return None
+        return await self._insert_one(RECSYS_METRICS_INSERT, entry, "recsys metric")
+
+    async def add_prescription_staging_entries(
+        self, entries: Iterable[Union[PrescriptionStagingRow, dict]], batch_size: int = 500
+    ) -> Union[BulkInsertResult, None]:
+        """
+        Adds many entries to the prescription_staging table in a single transaction.
+        See :meth:`DatabaseInterface.add_prescription_staging_entries`.
+        """
+        return await self._bulk_insert(PRESCRIPTION_STAGING_TABLE, PrescriptionStagingRow, entries, batch_size)
+
+    async def add_recsys_metric_entries(
+        self, entries: Iterable[Union[RecsysMetricsRow, dict]], batch_size: int = 500
+    ) -> Union[BulkInsertResult, None]:
+        """
+        Adds many entries to the recsys_metrics table in a single transaction.
+        See :meth:`DatabaseInterface.add_prescription_staging_entries`.
+        """
+        return await self._bulk_insert(RECSYS_METRICS_TABLE, RecsysMetricsRow, entries, batch_size)
+
+    ### ---- Write Handler ---- ####
+
+    async def _insert_one(self, sql_query, entry, description):
+        if not self.engine:
+            logger.error(f"Cannot add {description} entry: Database engine not available.")
+            return None
+
+        try:
+            params = entry.to_params_dict()
+            async with self._query_slots:
+                async with self.engine.begin() as connection:
+                    result = await connection.execute(queries.get(sql_query), params)
+                    return result.lastrowid if result.rowcount == 1 else None
+
+        except (TypeError, ValueError) as ve:
+            logger.error(f"Data validation error for {description} entry: {ve}")
+            return None
+        except exc.SQLAlchemyError as e:
+            logger.error(f"Failed to add {description} entry (SQLAlchemyError): {e}")
+            return None
+        except Exception as e:
+            logger.exception(f"An unexpected error occurred while adding {description} entry.")
+            return None
+
+    async def _bulk_insert(self, target_table, row_type, entries, batch_size=500):
+        if not self.engine:
+            logger.error("Cannot add %s entries: Database engine not available.", target_table.name)
+            return None
+
+        result, rows, positions = prepare_bulk_rows(target_table, row_type, entries)
+
+        try:
+            async with self._query_slots:
+                async with self.engine.begin() as connection:
+                    for start in range(0, len(rows), batch_size):
+                        batch = rows[start:start + batch_size]
+                        cursor = await connection.execute(insert(target_table).values(batch))
+                        first_id = first_inserted_id(connection.dialect.name, cursor, len(batch))
+                        if first_id is not None:
+                            for offset, position in enumerate(positions[start:start + batch_size]):
+                                result.ids[position] = first_id + offset
+            logger.info("Inserted %d rows into %s.", len(rows), target_table.name)
+            return result
+
+        except exc.SQLAlchemyError as e:
+            logger.error(f"Failed to add {target_table.name} entries (SQLAlchemyError): {e}")
+            return None
+        except Exception as e:
+            logger.exception(f"An unexpected error occurred while adding {target_table.name} entries.")
+            return None
+
+    async def close(self):
+        """
+        Disposes of the async engine and its connection pool.
+        """
+        if self.engine:
+            await self.engine.dispose()
+            logger.info("Async database engine closed")
+            self.engine = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
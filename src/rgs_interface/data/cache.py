@@ -0,0 +1,229 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Sequence, Union
+
+import pandas as pd
+from rgs_interface.data.dtypes import concat_frames
+from rgs_interface.data.queries import registry as queries
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 2
+HIGH_WATER_MARK_COLUMN = "SESSION_ID"
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    incremental_refreshes: int = 0
+    evictions: int = 0
+    bytes_written: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses + self.incremental_refreshes
+        return self.hits / lookups if lookups else 0.0
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "hit_rate": self.hit_rate}
+
+
+def query_hash(query_files: Iterable[str]) -> str:
+    """Hash the contents of packaged SQL files, so cache entries are invalidated when a query changes."""
+    return queries.digest(query_files)
+
+
+class ResultCache:
+    """
+    On-disk cache of fetch results, stored as Parquet files.
+
+    Entries are keyed on the hash of the SQL files that produced them, the ``rgs_mode`` and
+    the sorted patient IDs. An entry is served as-is while younger than ``ttl`` seconds.
+    Once expired it is either re-fetched in full or, with ``incremental=True``, refreshed by
+    fetching only sessions at or above the cached high-water mark (the largest ``SESSION_ID``)
+    and appending them. The session at the mark is re-fetched because it may still have been
+    in progress when cached. Sessions that were still open below the mark are only picked up
+    by a full refresh, so keep ``ttl`` short relative to session length if that matters.
+
+    When the total size exceeds ``max_bytes`` the least recently used entries are evicted.
+
+    :param cache_dir: Directory holding the Parquet files and the ``index.json`` metadata.
+    :param ttl: Seconds an entry is served without contacting the database.
+    :param max_bytes: Size bound for all cached files together.
+    :param incremental: Refresh expired entries incrementally instead of re-fetching them.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path],
+        ttl: float = 3600,
+        max_bytes: int = 1024**3,
+        incremental: bool = False,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.incremental = incremental
+        self.stats = CacheStats()
+
+        self._index_path = self.cache_dir / "index.json"
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+
+    def key(self, query_files: Sequence[str], rgs_mode: Optional[str], patient_ids) -> str:
+        payload = json.dumps(
+            {
+                "version": CACHE_VERSION,
+                "query": query_hash(query_files),
+                "rgs_mode": rgs_mode,
+                "patient_ids": sorted({int(pid) for pid in patient_ids}),
+            }
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def fetch(
+        self,
+        query_files: Sequence[str],
+        rgs_mode: Optional[str],
+        patient_ids,
+        loader: Callable[[int], Optional[pd.DataFrame]],
+        sort_by: Optional[List[str]] = None,
+    ) -> Optional[pd.DataFrame]:
+        """
+        Return the cached result for the given queries and cohort, calling ``loader`` on a miss.
+
+        :param loader: Callable taking the minimum ``SESSION_ID`` to fetch (0 for everything)
+            and returning a DataFrame, or None on failure.
+        :param sort_by: Columns to restore the query's ordering after an incremental append.
+        """
+        key = self.key(query_files, rgs_mode, patient_ids)
+        with self._lock:
+            entry = self._index.get(key)
+        cached = self._read(key) if entry else None
+
+        if cached is not None and time.time() - entry["created"] <= self.ttl:
+            self.stats.hits += 1
+            self._touch(key)
+            logger.debug("Cache hit for %s", key[:12])
+            return cached
+
+        high_water_mark = entry.get("high_water_mark") if entry else None
+        if cached is not None and self.incremental and high_water_mark is not None:
+            new = loader(high_water_mark)
+            if new is None:
+                return None
+            self.stats.incremental_refreshes += 1
+            keep = cached[HIGH_WATER_MARK_COLUMN].notna() & (cached[HIGH_WATER_MARK_COLUMN] < high_water_mark)
+            df = concat_frames([cached[keep], new])
+            if sort_by:
+                df = df.sort_values(sort_by, kind="stable", na_position="first", ignore_index=True)
+            logger.debug("Cache incremental refresh for %s: %d new rows", key[:12], len(new))
+        else:
+            df = loader(0)
+            if df is None:
+                return None
+            self.stats.misses += 1
+            logger.debug("Cache miss for %s", key[:12])
+
+        self._write(key, df)
+        return df
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._index):
+                self._remove(key)
+            self._save_index()
+
+    @property
+    def size_bytes(self) -> int:
+        with self._lock:
+            return sum(entry["size"] for entry in self._index.values())
+
+    ### ---- Storage ---- ####
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.parquet"
+
+    def _read(self, key: str) -> Optional[pd.DataFrame]:
+        try:
+            return pd.read_parquet(self._path(key), dtype_backend="numpy_nullable")
+        except (OSError, ValueError):
+            logger.warning("Dropping unreadable cache entry %s", key[:12])
+            with self._lock:
+                self._remove(key)
+                self._save_index()
+            return None
+
+    def _write(self, key: str, df: pd.DataFrame) -> None:
+        path = self._path(key)
+        # A unique temporary file per write, since several threads may write the same key
+        with tempfile.NamedTemporaryFile(dir=self.cache_dir, prefix=f"{key}.", suffix=".tmp", delete=False) as f:
+            tmp_path = Path(f.name)
+        try:
+            df.to_parquet(tmp_path, index=False)
+            size = tmp_path.stat().st_size
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+        high_water_mark = None
+        if HIGH_WATER_MARK_COLUMN in df.columns and df[HIGH_WATER_MARK_COLUMN].notna().any():
+            high_water_mark = int(df[HIGH_WATER_MARK_COLUMN].max())
+
+        now = time.time()
+        with self._lock:
+            self._index[key] = {
+                "created": now,
+                "accessed": now,
+                "size": size,
+                "high_water_mark": high_water_mark,
+            }
+            self.stats.bytes_written += size
+            self._evict()
+            self._save_index()
+
+    def _touch(self, key: str) -> None:
+        with self._lock:
+            if key in self._index:
+                self._index[key]["accessed"] = time.time()
+                self._save_index()
+
+    def _evict(self) -> None:
+        total = sum(entry["size"] for entry in self._index.values())
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1]["accessed"]):
+            if total <= self.max_bytes:
+                break
+            total -= entry["size"]
+            self._remove(key)
+            self.stats.evictions += 1
+            logger.debug("Evicted cache entry %s", key[:12])
+
+    def _remove(self, key: str) -> None:
+        self._index.pop(key, None)
+        self._path(key).unlink(missing_ok=True)
+
+    def _load_index(self) -> dict:
+        if not self._index_path.exists():
+            return {}
+        try:
+            with open(self._index_path, "r") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            logger.warning("Cache index %s is unreadable, starting empty.", self._index_path)
+            return {}
+        return {key: entry for key, entry in index.items() if self._path(key).exists()}
+
+    def _save_index(self) -> None:
+        tmp_path = self._index_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
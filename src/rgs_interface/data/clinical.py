@@ -0,0 +1,185 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Columns of the tidy clinical scores frame, one row per scored item
+CLINICAL_SCORE_COLUMNS = [
+    "CLINICAL_TRIAL_ID", "PATIENT_ID", "STUDY_ID", "EVALUATION_DATE", "CONDITION", "SCALE", "ITEM", "VALUE",
+]
+# Keys of an evaluation that describe it rather than hold a scale
+EVALUATION_KEYS = ("evaluation_date", "condition")
+
+# Columns (evaluation_date, condition, scale, item, value) of the scored items of one CLINICAL_SCORES document
+ParsedScores = Tuple[list, list, list, list, list]
+
+
+def checksum(document: str) -> str:
+    return hashlib.blake2b(document.encode(), digest_size=16).hexdigest()
+
+
+def parse_clinical_scores(document: Optional[str]) -> ParsedScores:
+    """Flatten one CLINICAL_SCORES document. See :func:`flatten_clinical_scores`."""
+    if document is None:
+        return _empty()
+    return _flatten(json.loads(document))
+
+
+def _empty() -> ParsedScores:
+    return [], [], [], [], []
+
+
+def _flatten(evaluations) -> ParsedScores:
+    if isinstance(evaluations, dict):
+        evaluations = [evaluations]
+    dates, conditions, scales, items, values = columns = _empty()
+    for evaluation in evaluations or ():
+        evaluation_date, condition = evaluation.get("evaluation_date"), evaluation.get("condition")
+        for scale, scores in evaluation.items():
+            if scale in EVALUATION_KEYS:
+                continue
+            if isinstance(scores, dict):
+                items.extend(scores.keys())
+                values.extend(scores.values())
+                n = len(scores)
+            else:  # A scale reported as a single total
+                items.append(scale)
+                values.append(scores)
+                n = 1
+            dates.extend([evaluation_date] * n)
+            conditions.extend([condition] * n)
+            scales.extend([scale] * n)
+    return columns
+
+
+@dataclass
+class ClinicalScoresCacheStats:
+    hits: int = 0
+    misses: int = 0
+    parse_errors: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class ClinicalScoresCache:
+    """
+    In-memory LRU cache of parsed CLINICAL_SCORES documents, keyed by the checksum of the JSON
+    text, so trials whose scores haven't changed since the last fetch aren't parsed again.
+
+    :param max_entries: Documents kept before the least recently used are evicted.
+    """
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self.stats = ClinicalScoresCacheStats()
+        self._entries: "OrderedDict[str, ParsedScores]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def parse_many(self, documents: Iterable[Optional[str]]) -> List[ParsedScores]:
+        """
+        Parsed rows for each document. The cache misses are parsed in one ``json.loads``
+        call over a JSON array built from them, rather than one call per document.
+        """
+        documents = list(documents)
+        keys = [checksum(document) if document is not None else None for document in documents]
+        parsed: dict = {}
+        with self._lock:
+            for key in keys:
+                if key is not None and key in self._entries:
+                    self._entries.move_to_end(key)
+                    parsed[key] = self._entries[key]
+            self.stats.hits += sum(key in parsed for key in keys if key is not None)
+
+        missing = {key: document for key, document in zip(keys, documents) if key is not None and key not in parsed}
+        if missing:
+            parsed.update(self._parse_batch(missing))
+            with self._lock:
+                self.stats.misses += len(missing)
+                for key in missing:
+                    self._entries[key] = parsed[key]
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return [parsed[key] if key is not None else _empty() for key in keys]
+
+    def _parse_batch(self, documents: dict) -> dict:
+        try:
+            batch = json.loads("[" + ",".join(documents.values()) + "]")
+            # A document that isn't a single JSON value (e.g. '{"a": 1}, {"b": 2}' or '') still
+            # makes a valid array, but with the elements shifted against the documents
+            if len(batch) == len(documents):
+                return {key: _flatten(evaluations) for key, evaluations in zip(documents, batch)}
+        except (ValueError, TypeError, AttributeError):
+            pass
+        # Some document is malformed: parse them one by one to isolate it
+        parsed = {}
+        for key, document in documents.items():
+            try:
+                parsed[key] = parse_clinical_scores(document)
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.warning("Could not parse CLINICAL_SCORES (checksum %s): %s", key, e)
+                with self._lock:
+                    self.stats.parse_errors += 1
+                parsed[key] = _empty()
+        return parsed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def flatten_clinical_scores(trials: pd.DataFrame, cache: Optional[ClinicalScoresCache] = None) -> pd.DataFrame:
+    """
+    Tidy frame of the CLINICAL_SCORES JSON of ``clinical_trials`` rows: one row per
+    (trial, evaluation, scale, item) with the columns of ``CLINICAL_SCORE_COLUMNS``.
+    SCALE, ITEM and CONDITION are categoricals; missing or malformed documents produce no rows.
+
+    :param trials: Frame with CLINICAL_TRIAL_ID, PATIENT_ID, STUDY_ID and CLINICAL_SCORES columns.
+    :param cache: Cache of parsed documents. A throwaway one is used if omitted.
+    """
+    documents = trials["CLINICAL_SCORES"].astype(object).where(trials["CLINICAL_SCORES"].notna(), None)
+    parsed = (cache or ClinicalScoresCache()).parse_many(documents)
+
+    counts = [len(columns[0]) for columns in parsed]
+    evaluation_date, condition, scale, item, value = ([] for _ in range(5))
+    for dates, conditions, scales, items, values in parsed:
+        evaluation_date += dates
+        condition += conditions
+        scale += scales
+        item += items
+        value += values
+    df = pd.DataFrame({
+        "CLINICAL_TRIAL_ID": trials["CLINICAL_TRIAL_ID"].to_numpy().repeat(counts),
+        "PATIENT_ID": trials["PATIENT_ID"].to_numpy().repeat(counts),
+        "STUDY_ID": trials["STUDY_ID"].to_numpy().repeat(counts),
+        "EVALUATION_DATE": pd.to_datetime(pd.Series(evaluation_date, dtype=object), errors="coerce"),
+        "CONDITION": pd.Categorical(condition),
+        "SCALE": pd.Categorical(scale),
+        "ITEM": pd.Categorical(item),
+        "VALUE": pd.to_numeric(pd.Series(value, dtype=object), errors="coerce").astype("Float64"),
+    })
+    return df
+
+
+def pivot_clinical_scores(scores: pd.DataFrame) -> pd.DataFrame:
+    """
+    Wide form of :func:`flatten_clinical_scores`: one row per trial evaluation and one
+    ``<SCALE>_<ITEM>`` column per scored item.
+    """
+    index = ["CLINICAL_TRIAL_ID", "PATIENT_ID", "STUDY_ID", "EVALUATION_DATE", "CONDITION"]
+    columns = scores["SCALE"].astype(str) + "_" + scores["ITEM"].astype(str)
+    wide = (
+        scores.assign(COLUMN=columns)
+        .groupby(index + ["COLUMN"], observed=True, dropna=False)["VALUE"]
+        .first()
+        .unstack("COLUMN")
+    )
+    wide.columns.name = None
+    return wide.reset_index()
@@ -0,0 +1,274 @@
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Tuple, Union
+
+import pandas as pd
+from sqlalchemy import text
+
+from rgs_interface.data.directory import like_to_regex
+
+# Selector kind -> query of the patients it selects. Each binds its values as :{param}
+SELECTOR_QUERIES = {
+    "patient": "SELECT PATIENT_ID FROM patient WHERE PATIENT_ID IN :{param}",
+    "hospital": "SELECT PATIENT_ID FROM patient WHERE HOSPITAL_ID IN :{param}",
+    "study": "SELECT PATIENT_ID FROM clinical_trials WHERE STUDY_ID IN :{param} AND PATIENT_ID IS NOT NULL",
+    "name": "SELECT PATIENT_ID FROM patient WHERE {condition}",
+    "file": "SELECT PATIENT_ID FROM {table}",
+}
+INTEGER_SELECTORS = ("patient", "hospital")
+COHORT_TABLE_PREFIX = "_rgs_cohort_"
+
+_TOKEN = re.compile(
+    r"""\s*(?:
+        (?P<op>[&|()])
+        | (?P<minus>-)(?=[\s(])
+        | (?P<kind>[A-Za-z]+):(?P<value>"[^"]*"|'[^']*'|[^\s()&|]+)
+    )""",
+    re.VERBOSE,
+)
+
+
+class CohortSyntaxError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Selector:
+    """Patients matching one ``kind:value,value`` term."""
+
+    kind: str
+    values: Tuple[Union[int, str], ...]
+
+
+@dataclass(frozen=True)
+class SetOperation:
+    """``&`` (intersection), ``|`` (union) or ``-`` (difference) of two sub-expressions."""
+
+    op: str
+    left: Union[Selector, "SetOperation"]
+    right: Union[Selector, "SetOperation"]
+
+
+@dataclass
+class CompiledCohort:
+    """
+    A cohort as a SQL subquery selecting PATIENT_ID, with its bind parameters and the
+    ``(statement, params)`` setup steps that load the ``file:`` selectors into temporary tables.
+    """
+
+    sql: str
+    params: dict = field(default_factory=dict)
+    setup: Tuple[tuple, ...] = ()
+
+
+class Cohort:
+    """
+    A set of patients described by an expression such as
+    ``hospital:7,8 & study:STUDY_001 - file:exclude.txt``.
+
+    Selectors are ``patient:<ids>``, ``hospital:<ids>``, ``study:<ids>``, ``name:<pattern>``
+    (a ``PATIENT_USER LIKE '%pattern%'`` match; several comma-separated patterns are OR-ed)
+    and ``file:<path>`` (a text file with one patient ID per line). ``study:`` selects every
+    patient enrolled in the studies, i.e. with any ``clinical_trials`` row, unlike
+    ``fetch_patients_by_study`` (``--study``), which only returns the trials whose weekly
+    recommendation is due today. Values containing spaces
+    or commas can be quoted. ``&`` binds tighter than ``|`` and ``-``, which are evaluated left
+    to right; ``-`` must be surrounded by spaces. Use parentheses to group.
+
+    Pass a Cohort wherever ``DatabaseInterface`` takes ``patient_ids``: the packaged queries
+    then filter on the cohort's subquery (see :meth:`compile`) instead of a list of IDs, so
+    the IDs are never fetched to the client.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.root = _Parser(expression).parse()
+
+    def __repr__(self):
+        return f"Cohort({self.expression!r})"
+
+    def selectors(self) -> List[Selector]:
+        """The selectors of the expression, from left to right."""
+        return list(_selectors(self.root))
+
+    def compile(self, reference: int = 0) -> CompiledCohort:
+        """
+        SQL subquery selecting the PATIENT_ID of the cohort, possibly with duplicates.
+        Intersections and differences become ``IN``/``NOT IN`` filters and unions ``UNION``,
+        which run on MySQL/MariaDB and SQLite alike. Each ``file:`` selector is read here and
+        loaded into its own temporary table by the setup steps, since MySQL can't refer to a
+        temporary table twice in one statement.
+
+        :param reference: Number of this subquery within the statement. A statement that filters
+            on the cohort in several places compiles it once per place, so that each gets its own
+            temporary tables.
+        """
+        compiled = CompiledCohort(sql="")
+        compiled.sql = self._compile(self.root, compiled, [0], reference)
+        return compiled
+
+    def _compile(self, node, compiled: CompiledCohort, counter: List[int], reference: int) -> str:
+        i = counter[0]
+        counter[0] += 1
+        if isinstance(node, SetOperation):
+            left = self._compile(node.left, compiled, counter, reference)
+            right = self._compile(node.right, compiled, counter, reference)
+            if node.op == "|":
+                return f"SELECT PATIENT_ID FROM ({left}) AS c{i}l UNION SELECT PATIENT_ID FROM ({right}) AS c{i}r"
+            negate = "NOT " if node.op == "-" else ""
+            return f"SELECT PATIENT_ID FROM ({left}) AS c{i} WHERE PATIENT_ID {negate}IN ({right})"
+
+        param = f"cohort_{i}"
+        if node.kind == "file":
+            table_name = f"{COHORT_TABLE_PREFIX}{reference}_{i}"
+            patient_ids = sorted(read_patient_ids(node.values[0]))
+            compiled.setup += (
+                (text(f"CREATE TEMPORARY TABLE IF NOT EXISTS {table_name} (PATIENT_ID INT PRIMARY KEY)"), None),
+                (text(f"DELETE FROM {table_name}"), None),
+            )
+            if patient_ids:
+                compiled.setup += ((
+                    text(f"INSERT INTO {table_name} (PATIENT_ID) VALUES (:patient_id)"),
+                    [{"patient_id": pid} for pid in patient_ids],
+                ),)
+            return SELECTOR_QUERIES["file"].format(table=table_name)
+        if node.kind == "name":
+            conditions = []
+            for j, pattern in enumerate(node.values):
+                compiled.params[f"{param}_{j}"] = f"%{pattern}%"
+                conditions.append(f"PATIENT_USER LIKE :{param}_{j}")
+            return SELECTOR_QUERIES["name"].format(condition=" OR ".join(conditions))
+        compiled.params[param] = node.values
+        return SELECTOR_QUERIES[node.kind].format(param=param)
+
+    def evaluate(self, patients: pd.DataFrame, trials: Optional[pd.DataFrame] = None) -> List[int]:
+        """
+        Resolve the cohort in memory against the ``patient`` and ``clinical_trials`` tables
+        (the latter is only needed for ``study:`` selectors), as sorted unique patient IDs.
+        """
+        return sorted(self._evaluate(self.root, patients, trials))
+
+    def _evaluate(self, node, patients: pd.DataFrame, trials: Optional[pd.DataFrame]) -> Set[int]:
+        if isinstance(node, SetOperation):
+            left = self._evaluate(node.left, patients, trials)
+            right = self._evaluate(node.right, patients, trials)
+            return left & right if node.op == "&" else left | right if node.op == "|" else left - right
+
+        if node.kind == "study":
+            if trials is None:
+                raise ValueError("study: selectors need the clinical_trials table to be evaluated.")
+            ids = trials.loc[trials["STUDY_ID"].isin(node.values), "PATIENT_ID"]
+        elif node.kind == "name":
+            users = patients["PATIENT_USER"].astype(object).where(patients["PATIENT_USER"].notna(), "")
+            regexes = [like_to_regex(f"%{pattern}%") for pattern in node.values]
+            ids = patients.loc[[any(regex.fullmatch(user) for regex in regexes) for user in users], "PATIENT_ID"]
+        elif node.kind == "file":
+            return read_patient_ids(node.values[0])
+        else:
+            column = "PATIENT_ID" if node.kind == "patient" else "HOSPITAL_ID"
+            ids = patients.loc[patients[column].isin(node.values), "PATIENT_ID"]
+        return {int(pid) for pid in ids.dropna()}
+
+
+def read_patient_ids(path: Union[str, Path]) -> Set[int]:
+    """Patient IDs of a text file with one ID per line; other lines are ignored."""
+    with open(path, "r", encoding="utf-8") as f:
+        return {int(line.strip()) for line in f if line.strip().isdigit()}
+
+
+def _selectors(node) -> Iterable[Selector]:
+    if isinstance(node, SetOperation):
+        yield from _selectors(node.left)
+        yield from _selectors(node.right)
+    else:
+        yield node
+
+
+class _Parser:
+    """
+    Recursive descent parser of cohort expressions::
+
+        expression := term (("|" | "-") term)*
+        term       := atom ("&" atom)*
+        atom       := selector | "(" expression ")"
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.tokens = self._tokenize(expression)
+        self.position = 0
+
+    def _tokenize(self, expression: str) -> List[tuple]:
+        tokens, position = [], 0
+        while expression[position:].strip():
+            match = _TOKEN.match(expression, position)
+            if not match:
+                raise CohortSyntaxError(
+                    f"Unexpected input at position {position} of cohort {expression!r}: {expression[position:].strip()!r}"
+                )
+            if match["op"] or match["minus"]:
+                tokens.append(("op", match["op"] or match["minus"]))
+            else:
+                tokens.append(("selector", self._selector(match["kind"].lower(), match["value"]), match.group().strip()))
+            position = match.end()
+        if not tokens:
+            raise CohortSyntaxError("Empty cohort expression.")
+        return tokens
+
+    def _selector(self, kind: str, value: str) -> Selector:
+        if kind not in SELECTOR_QUERIES:
+            raise CohortSyntaxError(f"Unknown selector {kind!r}. Expected one of {', '.join(SELECTOR_QUERIES)}.")
+        if value[0] in "\"'":
+            values = [value[1:-1]]
+        else:
+            values = [part for part in value.split(",") if part]
+        if kind == "file":
+            if len(values) != 1:
+                raise CohortSyntaxError(f"file: takes a single path, got {value!r}.")
+            return Selector(kind, tuple(values))
+        if kind in INTEGER_SELECTORS:
+            try:
+                return Selector(kind, tuple(int(part) for part in values))
+            except ValueError:
+                raise CohortSyntaxError(f"{kind}: takes comma-separated integer IDs, got {value!r}.") from None
+        return Selector(kind, tuple(values))
+
+    def parse(self):
+        node = self._expression()
+        if self.position < len(self.tokens):
+            raise CohortSyntaxError(f"Unexpected {self.tokens[self.position][-1]!r} in cohort {self.expression!r}.")
+        return node
+
+    def _peek(self) -> Optional[tuple]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _expression(self):
+        node = self._term()
+        while self._peek() in (("op", "|"), ("op", "-")):
+            op = self.tokens[self.position][1]
+            self.position += 1
+            node = SetOperation(op, node, self._term())
+        return node
+
+    def _term(self):
+        node = self._atom()
+        while self._peek() == ("op", "&"):
+            self.position += 1
+            node = SetOperation("&", node, self._atom())
+        return node
+
+    def _atom(self):
+        token = self._peek()
+        if token is None:
+            raise CohortSyntaxError(f"Cohort {self.expression!r} ends unexpectedly.")
+        self.position += 1
+        if token[0] == "selector":
+            return token[1]
+        if token == ("op", "("):
+            node = self._expression()
+            if self._peek() != ("op", ")"):
+                raise CohortSyntaxError(f"Missing ')' in cohort {self.expression!r}.")
+            self.position += 1
+            return node
+        raise CohortSyntaxError(f"Unexpected {token[-1]!r} in cohort {self.expression!r}.")
@@ -0,0 +1,220 @@
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Engine, text
+
+from rgs_interface.db import get_db_engine
+
+logger = logging.getLogger(__name__)
+
+NEW_PATIENTS_QUERY = "SELECT * FROM patient WHERE PATIENT_ID > :after_id ORDER BY PATIENT_ID"
+CLINICAL_TRIALS_QUERY = "SELECT * FROM clinical_trials"
+
+
+def recommendation_due(trials: pd.DataFrame, today: Optional[pd.Timestamp] = None) -> np.ndarray:
+    """
+    Rows of ``clinical_trials`` that ``fetch_patients_by_study`` returns today: recommended,
+    not yet ended, and on one of their weekly recommendation days.
+    """
+    today = (today or pd.Timestamp.now()).normalize()
+    start = pd.to_datetime(trials["START_DATE"], format="ISO8601").dt.normalize()
+    end = pd.to_datetime(trials["END_DATE"], format="ISO8601").dt.normalize()
+    due = (trials["RECOMMEND"] == 1) & (today <= end) & ((today - start).dt.days % 7 == 0)
+    return due.fillna(False).to_numpy(dtype=bool)
+
+
+def like_to_regex(pattern: str) -> "re.Pattern":
+    """Case-insensitive regex equivalent of a SQL ``LIKE`` pattern (``%`` and ``_`` wildcards)."""
+    parts = (".*" if char == "%" else "." if char == "_" else re.escape(char) for char in pattern)
+    return re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
+
+
+@dataclass
+class DirectoryStats:
+    lookups: int = 0
+    full_refreshes: int = 0
+    delta_refreshes: int = 0
+    patients_added: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class PatientDirectory:
+    """
+    In-memory copy of the ``patient`` table with hash indexes by hospital and study and an
+    n-gram index on ``PATIENT_USER``, answering the ``fetch_patients*`` lookups without a query.
+
+    Lookups made more than ``refresh_interval`` seconds after the last refresh first load the
+    patients added since (``PATIENT_ID`` above the largest one loaded) and re-read
+    ``clinical_trials``. Changes to existing patients are picked up by the full reload done every
+    ``full_refresh_interval`` seconds, or by calling ``refresh(full=True)``. ``clinical_trials``
+    is only loaded once a study lookup is made.
+
+    Pass it to ``DatabaseInterface(patient_directory=...)`` to route the lookups to it.
+
+    :param engine: Engine of the source database. The shared engine is used if omitted.
+    :param refresh_interval: Seconds a refresh is served before the next delta refresh.
+    :param full_refresh_interval: Seconds between full reloads of the patient table.
+    :param ngram: Length of the ``PATIENT_USER`` substrings indexed.
+    """
+
+    def __init__(
+        self,
+        engine: Optional[Engine] = None,
+        refresh_interval: float = 300,
+        full_refresh_interval: float = 86400,
+        ngram: int = 3,
+    ):
+        self.engine = engine if engine is not None else get_db_engine()
+        self.refresh_interval = refresh_interval
+        self.full_refresh_interval = full_refresh_interval
+        self.ngram = max(1, ngram)
+        self.stats = DirectoryStats()
+
+        self._lock = threading.RLock()
+        self._patients: Optional[pd.DataFrame] = None
+        self._trials: Optional[pd.DataFrame] = None
+        self._by_hospital: Dict[object, List[int]] = defaultdict(list)
+        self._by_study: Dict[object, List[int]] = defaultdict(list)
+        self._by_ngram: Dict[str, Set[int]] = defaultdict(set)
+        self._users: List[str] = []
+        self._refreshed_at = 0.0
+        self._full_refreshed_at = 0.0
+
+    ### ---- Refresh ---- ####
+
+    def refresh(self, full: bool = False) -> int:
+        """
+        Load the patients added since the last refresh, or all of them with ``full=True``,
+        and re-read ``clinical_trials`` if it has been loaded.
+
+        :return: Number of patients loaded.
+        """
+        with self._lock:
+            full = full or self._patients is None
+            after_id = -1 if full else int(self._patients["PATIENT_ID"].max()) if len(self._patients) else -1
+            with self.engine.connect() as connection:
+                new = pd.read_sql(
+                    text(NEW_PATIENTS_QUERY), connection, params={"after_id": after_id}, dtype_backend="numpy_nullable"
+                )
+                trials = None
+                if self._trials is not None:
+                    trials = pd.read_sql(text(CLINICAL_TRIALS_QUERY), connection, dtype_backend="numpy_nullable")
+
+            if full:
+                self._patients = new.reset_index(drop=True)
+                self._by_hospital.clear()
+                self._by_ngram.clear()
+                self._users = []
+                self._index_patients(self._patients, 0)
+                self._full_refreshed_at = time.time()
+                self.stats.full_refreshes += 1
+            else:
+                offset = len(self._patients)
+                if len(new):
+                    self._patients = pd.concat([self._patients, new], ignore_index=True)
+                    self._index_patients(new, offset)
+                self.stats.delta_refreshes += 1
+            if trials is not None:
+                self._index_trials(trials)
+            self.stats.patients_added += len(new)
+            self._refreshed_at = time.time()
+            logger.debug("Loaded %d patients into the directory (%s refresh)", len(new), "full" if full else "delta")
+            return len(new)
+
+    def _ensure_fresh(self, trials: bool = False):
+        now = time.time()
+        if self._patients is None or now - self._full_refreshed_at > self.full_refresh_interval:
+            self.refresh(full=True)
+        elif now - self._refreshed_at > self.refresh_interval:
+            self.refresh()
+        if trials and self._trials is None:
+            with self.engine.connect() as connection:
+                self._index_trials(pd.read_sql(text(CLINICAL_TRIALS_QUERY), connection, dtype_backend="numpy_nullable"))
+
+    def _index_patients(self, patients: pd.DataFrame, offset: int):
+        for position, hospital_id in enumerate(patients["HOSPITAL_ID"].tolist(), start=offset):
+            self._by_hospital[hospital_id].append(position)
+        users = ["" if pd.isna(user) else str(user).lower() for user in patients["PATIENT_USER"].tolist()]
+        n = self.ngram
+        for position, user in enumerate(users, start=offset):
+            for i in range(len(user) - n + 1):
+                self._by_ngram[user[i:i + n]].add(position)
+        self._users.extend(users)
+
+    def _index_trials(self, trials: pd.DataFrame):
+        self._trials = trials.reset_index(drop=True)
+        self._by_study = defaultdict(list)
+        for position, study_id in enumerate(self._trials["STUDY_ID"].tolist()):
+            self._by_study[study_id].append(position)
+
+    ### ---- Lookups ---- ####
+
+    def patients(self) -> pd.DataFrame:
+        """All patients, like ``SELECT * FROM patient``."""
+        with self._lock:
+            self._ensure_fresh()
+            self.stats.lookups += 1
+            return self._patients.copy()
+
+    def by_hospital(self, hospital_ids: Iterable) -> pd.DataFrame:
+        """PATIENT_ID of the patients of the given hospitals."""
+        with self._lock:
+            self._ensure_fresh()
+            self.stats.lookups += 1
+            positions = sorted(p for hospital_id in set(hospital_ids) for p in self._by_hospital.get(hospital_id, ()))
+            return pd.DataFrame({"PATIENT_ID": self._patients["PATIENT_ID"].array.take(np.asarray(positions, dtype=np.intp))})
+
+    def by_name(self, pattern: str) -> pd.DataFrame:
+        """
+        Patients whose PATIENT_USER contains ``pattern``, case-insensitively, like
+        ``PATIENT_USER LIKE '%pattern%'``. ``%`` and ``_`` in the pattern are wildcards.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            self.stats.lookups += 1
+            positions = self._match(pattern)
+            return self._patients.iloc[positions].reset_index(drop=True)
+
+    def _match(self, pattern: str) -> List[int]:
+        needle = pattern.lower()
+        n = self.ngram
+        # Every match contains the n-grams of the pattern's literal runs between wildcards
+        grams = {
+            literal[i:i + n] for literal in re.split("[%_]", needle) for i in range(len(literal) - n + 1)
+        }
+        if grams:
+            # Intersect from the rarest n-gram up
+            grams = sorted(grams, key=lambda gram: len(self._by_ngram.get(gram, ())))
+            candidates = set(self._by_ngram.get(grams[0], ()))
+            for gram in grams[1:]:
+                if not candidates:
+                    break
+                candidates &= self._by_ngram.get(gram, set())
+            candidates = sorted(candidates)
+        else:
+            candidates = range(len(self._users))
+        # The n-grams only narrow the candidates down; each one is still checked against the pattern
+        if "%" in needle or "_" in needle:
+            regex = like_to_regex(needle)
+            return [position for position in candidates if regex.search(self._users[position])]
+        return [position for position in candidates if needle in self._users[position]]
+
+    def by_study(self, study_ids) -> pd.DataFrame:
+        """``clinical_trials`` rows of the given studies that are due for a recommendation today."""
+        if not isinstance(study_ids, (list, tuple, set)):
+            study_ids = [study_ids]
+        with self._lock:
+            self._ensure_fresh(trials=True)
+            self.stats.lookups += 1
+            positions = sorted(p for study_id in set(study_ids) for p in self._by_study.get(study_id, ()))
+            trials = self._trials.iloc[positions]
+            return trials[recommendation_due(trials)].reset_index(drop=True)
@@ -0,0 +1,175 @@
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Compact dtypes per packaged query, applied by DatabaseInterface(compact_dtypes=True).
+# Integer widths are minimums: a column whose values don't fit is widened instead.
+# Integer columns with missing values get the matching nullable dtype (e.g. UInt32).
+_TIMESERIES_INDEX_SCHEMA = {
+    "SESSION_ID": "uint32",
+    "PATIENT_ID": "uint32",
+    "PROTOCOL_ID": "uint16",
+    "GAME_MODE": "category",
+    "SECONDS_FROM_START": "uint32",
+}
+
+_SESSION_SCHEMA = {
+    "PATIENT_ID": "uint32",
+    "PRESCRIPTION_ID": "uint32",
+    "SESSION_ID": "uint32",
+    "PROTOCOL_ID": "uint16",
+    "PRESCRIPTION_STARTING_DATE": "datetime64[ns]",
+    "PRESCRIPTION_ENDING_DATE": "datetime64[ns]",
+    "SESSION_DATE": "datetime64[ns]",
+    "STATUS": "category",
+    "WEEKDAY_INDEX": "uint8",
+    "REAL_SESSION_DURATION": "int32",
+    "PRESCRIBED_SESSION_DURATION": "uint32",
+    "SESSION_DURATION": "int32",
+    "DM_VALUE": "float32",
+}
+
+QUERY_SCHEMAS: Dict[str, Dict[str, str]] = {
+    "query.sql": _SESSION_SCHEMA,
+    "query_patient.sql": _SESSION_SCHEMA,
+    "query_dm.sql": {**_TIMESERIES_INDEX_SCHEMA, "DM_KEY": "category", "DM_VALUE": "float32"},
+    "query_pe.sql": {**_TIMESERIES_INDEX_SCHEMA, "PE_KEY": "category", "PE_VALUE": "float32"},
+    "timeseries": _TIMESERIES_INDEX_SCHEMA,
+}
+
+# Arrow types of the result columns of the streamed queries. OutputSink fixes the schema of the
+# output with them, instead of inferring it from the first chunk, where a column may be all NULL
+_TIMESERIES_COLUMN_TYPES = {
+    "SESSION_ID": "int64",
+    "PATIENT_ID": "int64",
+    "PROTOCOL_ID": "int64",
+    "GAME_MODE": "string",
+    "SECONDS_FROM_START": "double",
+}
+
+_SESSION_COLUMN_TYPES = {
+    "PATIENT_ID": "int64",
+    "PRESCRIPTION_ID": "int64",
+    "SESSION_ID": "int64",
+    "PROTOCOL_ID": "int64",
+    "PRESCRIPTION_STARTING_DATE": "timestamp[ns]",
+    "PRESCRIPTION_ENDING_DATE": "timestamp[ns]",
+    "SESSION_DATE": "timestamp[ns]",
+    "STATUS": "string",
+    "WEEKDAY_INDEX": "int64",
+    "REAL_SESSION_DURATION": "int64",
+    "PRESCRIBED_SESSION_DURATION": "int64",
+    "SESSION_DURATION": "int64",
+    "ADHERENCE": "double",
+    "DM_VALUE": "double",
+}
+
+QUERY_COLUMN_TYPES: Dict[str, Dict[str, str]] = {
+    "query.sql": _SESSION_COLUMN_TYPES,
+    "query_patient.sql": {
+        **_SESSION_COLUMN_TYPES,
+        "CLINICAL_TRIAL_START_DATE": "timestamp[ns]",
+        "CLINICAL_TRIAL_END_DATE": "timestamp[ns]",
+        "TOTAL_SUCCESS": "int64",
+        "TOTAL_ERRORS": "int64",
+        "GAME_SCORE": "int64",
+    },
+    "query_dm.sql": {**_TIMESERIES_COLUMN_TYPES, "DM_KEY": "string", "DM_VALUE": "double"},
+    "query_pe.sql": {**_TIMESERIES_COLUMN_TYPES, "PE_KEY": "string", "PE_VALUE": "double"},
+}
+
+_INT_WIDENING = {
+    "uint8": ("uint8", "uint16", "uint32", "uint64"),
+    "uint16": ("uint16", "uint32", "uint64"),
+    "uint32": ("uint32", "uint64"),
+    "uint64": ("uint64",),
+    "int8": ("int8", "int16", "int32", "int64"),
+    "int16": ("int16", "int32", "int64"),
+    "int32": ("int32", "int64"),
+    "int64": ("int64",),
+}
+
+
+def apply_schema(df: pd.DataFrame, schema: Optional[Dict[str, str]]) -> pd.DataFrame:
+    """
+    Cast the columns of ``df`` named in ``schema`` to compact dtypes, in place.
+    Columns missing from ``df`` are ignored.
+
+    :param schema: Column name to ``"category"``, ``"datetime64[ns]"``, a float dtype, or a
+        minimum integer dtype (e.g. ``"uint16"``).
+    :return: ``df``, for chaining.
+    """
+    for column, dtype in (schema or {}).items():
+        if column in df.columns:
+            df[column] = _cast(df[column], dtype)
+    return df
+
+
+def _cast(series: pd.Series, dtype: str) -> pd.Series:
+    if dtype == "category":
+        return series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype("category")
+    if dtype.startswith("datetime64"):
+        return pd.to_datetime(series, errors="coerce").astype(dtype)
+    if dtype.startswith("float"):
+        return pd.Series(series.to_numpy(dtype=dtype, na_value=np.nan), index=series.index, name=series.name)
+    return _cast_int(series, dtype)
+
+
+def _cast_int(series: pd.Series, dtype: str) -> pd.Series:
+    values = pd.to_numeric(series, errors="coerce")
+    has_na = bool(values.isna().any())
+    non_na = values.dropna()
+    if len(non_na):
+        low, high = non_na.min(), non_na.max()
+        if low != np.floor(low) or high != np.floor(high):
+            return series
+    for candidate in _INT_WIDENING[dtype]:
+        info = np.iinfo(candidate)
+        if not len(non_na) or (info.min <= low and high <= info.max):
+            return values.astype(_nullable(candidate) if has_na else candidate)
+    logger.debug("Column %s does not fit %s, keeping %s", series.name, dtype, series.dtype)
+    return series
+
+
+def _nullable(dtype: str) -> str:
+    """Nullable pandas dtype name for a numpy integer dtype name, e.g. uint32 -> UInt32."""
+    return "UInt" + dtype[4:] if dtype.startswith("uint") else "Int" + dtype[3:]
+
+
+def concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate frames like ``pd.concat(..., ignore_index=True)``, but keep categorical
+    columns categorical by unifying their categories first (pandas falls back to object
+    when the categories of the parts differ).
+    """
+    if len(frames) > 1:
+        categorical = [
+            column for column, dtype in frames[0].dtypes.items()
+            if isinstance(dtype, pd.CategoricalDtype)
+            and all(column in df.columns and isinstance(df[column].dtype, pd.CategoricalDtype) for df in frames)
+        ]
+        if categorical:
+            frames = [df.copy(deep=False) for df in frames]
+            for column in categorical:
+                categories = frames[0][column].cat.categories
+                for df in frames[1:]:
+                    categories = categories.union(df[column].cat.categories, sort=False)
+                for df in frames:
+                    df[column] = df[column].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+def memory_report(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-column memory usage of ``df`` (including the contents of object columns),
+    with a final ``TOTAL`` row.
+    """
+    usage = df.memory_usage(index=False, deep=True)
+    report = pd.DataFrame({"dtype": df.dtypes.astype(str), "bytes": usage})
+    report.loc["TOTAL"] = ["", int(usage.sum())]
+    report["bytes_per_row"] = report["bytes"] / max(len(df), 1)
+    return report
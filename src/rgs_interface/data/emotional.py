@@ -0,0 +1,53 @@
+import pandas as pd
+
+# Emotional answers joined to their patient and question key, as pulled for the daily rollup
+EMOTIONAL_ANSWER_COLUMNS = [
+    "EMOTIONAL_ANSWER_ID", "PATIENT_ID", "CREATION_TIME", "EMOTIONAL_QUESTION_KEY", "EMOTIONAL_ANSWER",
+]
+NEW_EMOTIONAL_ANSWERS_QUERY = """
+SELECT ea.EMOTIONAL_ANSWER_ID, eqp.PATIENT_ID, ea.CREATION_TIME, eq.EMOTIONAL_QUESTION_KEY, ea.EMOTIONAL_ANSWER
+FROM emotional_answer ea
+JOIN emotional_question_patient eqp
+    ON eqp.EMOTIONAL_QUESTION_PATIENT_ID = ea.EMOTIONAL_QUESTION_PATIENT_ID
+JOIN emotional_question eq
+    ON eq.EMOTIONAL_QUESTION_ID = eqp.EMOTIONAL_QUESTION_ID
+WHERE ea.EMOTIONAL_ANSWER_ID > :after_id
+"""
+# Answers per (patient, day) kept as EMOTIONAL_KEY_<n> / EMOTIONAL_ANSWER_<n>, as in query_emotional.sql
+RANKED_ANSWERS = 3
+ROLLUP_KEYS = ["PATIENT_ID", "ANSWER_DATE"]
+
+
+def rollup_emotional_answers(answers: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-(patient, day) summary of emotional answers, with the columns of ``EMOTIONAL_ANSWER_COLUMNS``
+    as input. Each day gets its first and last answer time, the number and mean of its answers,
+    the highest EMOTIONAL_ANSWER_ID rolled into it, and its first ``RANKED_ANSWERS`` answers in
+    EMOTIONAL_ANSWER_ID order as EMOTIONAL_KEY_<n> / EMOTIONAL_ANSWER_<n> (the ranks
+    ``query_emotional.sql`` computes with ``ROW_NUMBER()``).
+    """
+    created = pd.to_datetime(answers["CREATION_TIME"], format="ISO8601")
+    df = answers.assign(CREATION_TIME=created, ANSWER_DATE=created.dt.normalize()).sort_values("EMOTIONAL_ANSWER_ID")
+    df["RANK"] = df.groupby(ROLLUP_KEYS).cumcount() + 1
+
+    summary = df.groupby(ROLLUP_KEYS).agg(
+        FIRST_ANSWER_TIME=("CREATION_TIME", "min"),
+        LAST_ANSWER_TIME=("CREATION_TIME", "max"),
+        N_ANSWERS=("EMOTIONAL_ANSWER", "size"),
+        MEAN_ANSWER=("EMOTIONAL_ANSWER", "mean"),
+        LAST_EMOTIONAL_ANSWER_ID=("EMOTIONAL_ANSWER_ID", "max"),
+    )
+    ranked = df[df["RANK"] <= RANKED_ANSWERS].pivot(
+        index=ROLLUP_KEYS, columns="RANK", values=["EMOTIONAL_QUESTION_KEY", "EMOTIONAL_ANSWER"]
+    )
+    ranked.columns = [
+        f"{'EMOTIONAL_KEY' if name == 'EMOTIONAL_QUESTION_KEY' else name}_{rank}" for name, rank in ranked.columns
+    ]
+    ranked_columns = [
+        f"{name}_{rank}" for rank in range(1, RANKED_ANSWERS + 1) for name in ("EMOTIONAL_KEY", "EMOTIONAL_ANSWER")
+    ]
+    rollup = summary.join(ranked.reindex(columns=ranked_columns)).reset_index()
+    for rank in range(1, RANKED_ANSWERS + 1):
+        rollup[f"EMOTIONAL_KEY_{rank}"] = rollup[f"EMOTIONAL_KEY_{rank}"].astype(object)
+        rollup[f"EMOTIONAL_ANSWER_{rank}"] = pd.to_numeric(rollup[f"EMOTIONAL_ANSWER_{rank}"]).astype("Int64")
+    return rollup.sort_values(ROLLUP_KEYS, ignore_index=True)
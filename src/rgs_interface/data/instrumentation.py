@@ -0,0 +1,255 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+# Phases of a query, in the order they happen. With fetch_backend="pandas", pd.read_sql
+# executes the query, transfers the rows and builds the DataFrame in one call, timed as
+# "read"; the Arrow backend times those steps separately as "execute", "fetch" and "build".
+PHASES = ("plan", "checkout", "setup", "execute", "fetch", "build", "read", "write")
+
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def query_label(query: str) -> str:
+    """Short, stable name for a query: the packaged file name, or the whitespace-collapsed start of a raw SQL string."""
+    if query.endswith(".sql"):
+        return query
+    return " ".join(query.split())[:80]
+
+
+def result_size(result) -> Tuple[int, int]:
+    """
+    Rows and bytes of a DataFrame or Arrow table. DataFrame sizes are shallow: the
+    contents of object columns are not counted, which would require scanning them.
+    """
+    if isinstance(result, pa.Table):
+        return result.num_rows, result.nbytes
+    if isinstance(result, pd.DataFrame):
+        return len(result), int(result.memory_usage(index=False).sum())
+    return 0, 0
+
+
+@dataclass
+class QueryEvent:
+    """
+    Timings and sizes of one fetch or write, as passed to the Instrumentation callbacks.
+
+    ``phases`` holds the seconds spent per phase (see ``PHASES``). When a query is split
+    into batches that run concurrently, the phase times of the batches are added up, so
+    their sum may exceed the wall-clock ``seconds``.
+    """
+
+    query: str
+    operation: str = "read"
+    rgs_mode: Optional[str] = None
+    cohort_size: Optional[int] = None
+    parts: int = 0
+    phases: Dict[str, float] = field(default_factory=lambda: dict.fromkeys(PHASES, 0.0))
+    rows: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+    slow: bool = False
+    explain: Optional[List[dict]] = None
+    started_at: float = field(default_factory=time.time)
+    _start: float = field(default_factory=time.perf_counter, repr=False, compare=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the enclosed block and add it to ``phases[name]``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start)
+
+    def add_phase(self, name: str, seconds: float):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_result(self, result):
+        """Count the rows and bytes of a DataFrame or Arrow table returned by the query."""
+        rows, n_bytes = result_size(result)
+        with self._lock:
+            self.rows += rows
+            self.bytes += n_bytes
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self._start
+
+    def to_dict(self) -> dict:
+        return {f.name: getattr(self, f.name) for f in fields(self) if not f.name.startswith("_")}
+
+
+class Instrumentation:
+    """
+    Receives a QueryEvent for every fetch and write of a DatabaseInterface and passes it
+    to the registered callbacks. Exceptions raised by a callback are logged and ignored.
+
+    Queries taking ``slow_query_seconds`` or longer are logged as warnings. With
+    ``explain_slow_queries=True`` the interface also runs ``EXPLAIN`` on a slow query (its
+    first batch, if it was split) and attaches the plan to the event before it is emitted.
+
+    :param callbacks: Callables taking a QueryEvent, e.g. a PrometheusExporter.
+    :param slow_query_seconds: Threshold for the slow-query log. None disables it.
+    :param explain_slow_queries: Capture the query plan of slow queries.
+    """
+
+    def __init__(
+        self,
+        callbacks: Iterable[Callable[[QueryEvent], None]] = (),
+        slow_query_seconds: Optional[float] = None,
+        explain_slow_queries: bool = False,
+    ):
+        self.callbacks = list(callbacks)
+        self.slow_query_seconds = slow_query_seconds
+        self.explain_slow_queries = explain_slow_queries
+
+    def add_callback(self, callback: Callable[[QueryEvent], None]):
+        self.callbacks.append(callback)
+
+    def is_slow(self, event: QueryEvent) -> bool:
+        return self.slow_query_seconds is not None and event.seconds >= self.slow_query_seconds
+
+    def emit(self, event: QueryEvent):
+        if event.slow:
+            phases = ", ".join(f"{name}={seconds:.3f}s" for name, seconds in event.phases.items() if seconds)
+            logger.warning(
+                "Slow %s of %s (rgs_mode=%s, cohort=%s): %.3fs, %d rows [%s]",
+                event.operation, event.query, event.rgs_mode, event.cohort_size, event.seconds, event.rows, phases
+            )
+            if event.explain:
+                logger.warning("Query plan of %s:\n%s", event.query, pd.DataFrame(event.explain).to_string())
+        for callback in self.callbacks:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("Instrumentation callback %r failed.", callback)
+
+
+class PrometheusExporter:
+    """
+    Instrumentation callback aggregating QueryEvents into Prometheus metrics, labelled by
+    query, operation and rgs_mode:
+
+    - ``rgs_query_duration_seconds`` (histogram)
+    - ``rgs_query_phase_seconds_total`` (additionally labelled by phase)
+    - ``rgs_query_rows_total``, ``rgs_query_bytes_total``
+    - ``rgs_query_errors_total``, ``rgs_query_slow_total``
+
+    :meth:`render` returns the OpenMetrics (or classic Prometheus) text exposition, to serve
+    from an HTTP endpoint; :meth:`write` writes it atomically to a file, e.g. for the
+    node_exporter textfile collector.
+
+    :param buckets: Upper bounds of the duration histogram buckets, in seconds.
+    :param namespace: Prefix of the metric names.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, namespace: str = "rgs"):
+        self.buckets = tuple(sorted(buckets))
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._durations: Dict[tuple, List[float]] = {}
+        self._counters: Dict[str, Dict[tuple, float]] = {
+            name: {} for name in ("phase_seconds", "rows", "bytes", "errors", "slow")
+        }
+
+    def __call__(self, event: QueryEvent):
+        labels = (("query", event.query), ("operation", event.operation), ("rgs_mode", event.rgs_mode or ""))
+        with self._lock:
+            # Per bucket counts, then sum and count
+            histogram = self._durations.setdefault(labels, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if event.seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += event.seconds
+            histogram[-1] += 1
+            for phase, seconds in event.phases.items():
+                if seconds:
+                    self._increment("phase_seconds", labels + (("phase", phase),), seconds)
+            self._increment("rows", labels, event.rows)
+            self._increment("bytes", labels, event.bytes)
+            self._increment("errors", labels, int(event.error is not None))
+            self._increment("slow", labels, int(event.slow))
+
+    def _increment(self, name, labels, value):
+        counter = self._counters[name]
+        counter[labels] = counter.get(labels, 0) + value
+
+    def render(self, openmetrics: bool = True) -> str:
+        """
+        Text exposition of the metrics. OpenMetrics by default (serve it with
+        ``OPENMETRICS_CONTENT_TYPE``); ``openmetrics=False`` gives the classic Prometheus
+        text format (``PROMETHEUS_CONTENT_TYPE``).
+        """
+        prefix = f"{self.namespace}_query"
+        lines = []
+        with self._lock:
+            lines.append(f"# HELP {prefix}_duration_seconds Wall-clock time of fetches and writes.")
+            lines.append(f"# TYPE {prefix}_duration_seconds histogram")
+            for labels, histogram in sorted(self._durations.items()):
+                for bound, count in zip(self.buckets + (float("inf"),), histogram[:-2] + [histogram[-1]]):
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f"{prefix}_duration_seconds_bucket{_labels(labels + (('le', le),))} {_number(count)}")
+                lines.append(f"{prefix}_duration_seconds_sum{_labels(labels)} {_number(histogram[-2])}")
+                lines.append(f"{prefix}_duration_seconds_count{_labels(labels)} {_number(histogram[-1])}")
+
+            for name, description in (
+                ("phase_seconds", "Time spent per query phase."),
+                ("rows", "Rows fetched or written."),
+                ("bytes", "In-memory size of fetched results."),
+                ("errors", "Failed fetches and writes."),
+                ("slow", "Queries above the slow-query threshold."),
+            ):
+                family = f"{prefix}_{name}" if openmetrics else f"{prefix}_{name}_total"
+                lines.append(f"# HELP {family} {description}")
+                lines.append(f"# TYPE {family} counter")
+                for labels, value in sorted(self._counters[name].items()):
+                    lines.append(f"{prefix}_{name}_total{_labels(labels)} {_number(value)}")
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Union[str, Path], openmetrics: bool = False):
+        """Write :meth:`render` to ``path`` atomically (classic text format by default, as the textfile collector expects)."""
+        path = Path(path)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.render(openmetrics=openmetrics))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            for counter in self._counters.values():
+                counter.clear()
+
+
+def _labels(labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) and not float(value).is_integer() else str(int(value))
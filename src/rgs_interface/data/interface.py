@@ -1,22 +1,246 @@
 # %%
 import pandas as pd
-from sqlalchemy import text, exc
-from typing import Union 
-import importlib.resources
-from rgs_interface import sql 
-from rgs_interface.db import get_db_engine
-from rgs_interface.data.schemas import PrescriptionStagingRow, RecsysMetricsRow
+import pyarrow as pa
+from sqlalchemy import Engine, column, exc, insert, table, text
+from typing import Callable, Dict, Iterable, Optional, Sequence, Union
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from rgs_interface.db import get_db_engine, get_pool_metrics, is_shared_engine
+from rgs_interface.data.cache import ResultCache
+from rgs_interface.data.cohort import Cohort
+from rgs_interface.data.clinical import ClinicalScoresCache, flatten_clinical_scores, pivot_clinical_scores
+from rgs_interface.data import arrow
+from rgs_interface.data.directory import PatientDirectory
+from rgs_interface.data.emotional import EMOTIONAL_ANSWER_COLUMNS, rollup_emotional_answers
+from rgs_interface.data.dtypes import QUERY_COLUMN_TYPES, QUERY_SCHEMAS, apply_schema, concat_frames
+from rgs_interface.data.instrumentation import Instrumentation, QueryEvent, query_label
+from rgs_interface.data.output import open_sink, write_frame
+from rgs_interface.data.queries import compile_query, registry as queries
+from rgs_interface.data.store import LocalStore
+from rgs_interface.data.schemas import BulkInsertResult, PrescriptionStagingRow, RecsysMetricsRow
+from rgs_interface.data.timeseries import pivot_timeseries
 import logging
 
 logger = logging.getLogger(__name__)
 
+FETCH_BACKENDS = ("pandas", "arrow")
+PATIENT_IDS_PARAM = "patient_ids"
+PATIENT_IDS_TABLE = "_rgs_patient_ids"
+_PATIENT_IDS_IN = re.compile(rf"IN\s*:{PATIENT_IDS_PARAM}\b")
+
+PRESCRIPTION_STAGING_TABLE = table(
+    "prescription_staging",
+    *(column(name) for name in (
+        "PATIENT_ID", "PROTOCOL_ID", "STARTING_DATE", "ENDING_DATE", "WEEKDAY",
+        "SESSION_DURATION", "RECOMMENDATION_ID", "WEEKS_SINCE_START", "STATUS",
+    )),
+)
+RECSYS_METRICS_TABLE = table(
+    "recsys_metrics",
+    *(column(name) for name in (
+        "PATIENT_ID", "PROTOCOL_ID", "RECOMMENDATION_ID", "METRIC_DATE", "METRIC_KEY", "METRIC_VALUE",
+    )),
+)
+
+CLINICAL_DATA_QUERY = """
+SELECT *,
+    START_DATE AS CLINICAL_TRIAL_START_DATE,
+    END_DATE AS CLINICAL_TRIAL_END_DATE
+FROM `clinical_trials`
+WHERE `PATIENT_ID` IN :patient_ids;
+"""
+CLINICAL_SCORES_QUERY = """
+SELECT CLINICAL_TRIAL_ID, PATIENT_ID, STUDY_ID, CLINICAL_SCORES
+FROM `clinical_trials`
+WHERE `PATIENT_ID` IN :patient_ids;
+"""
+EMOTIONAL_ANSWERS_QUERY = """
+SELECT ea.EMOTIONAL_ANSWER_ID, eqp.PATIENT_ID, ea.CREATION_TIME, eq.EMOTIONAL_QUESTION_KEY, ea.EMOTIONAL_ANSWER
+FROM emotional_answer ea
+JOIN emotional_question_patient eqp
+    ON eqp.EMOTIONAL_QUESTION_PATIENT_ID = ea.EMOTIONAL_QUESTION_PATIENT_ID
+JOIN emotional_question eq
+    ON eq.EMOTIONAL_QUESTION_ID = eqp.EMOTIONAL_QUESTION_ID
+WHERE eqp.PATIENT_ID IN :patient_ids
+  AND ea.CREATION_TIME >= :start_time
+  AND ea.CREATION_TIME < :end_time;
+"""
+# Name under which the LocalStore answers fetch_emotional_data from its daily rollup
+EMOTIONAL_DAILY_QUERY = "emotional_daily"
+PATIENTS_BY_HOSPITAL_QUERY = """
+SELECT PATIENT_ID
+FROM patient
+WHERE HOSPITAL_ID IN :h_ids;
+"""
+PATIENTS_BY_NAME_QUERY = "SELECT * FROM patient WHERE PATIENT_USER LIKE :pattern;"
+PATIENTS_BY_STUDY_QUERY = """
+SELECT * 
+FROM `clinical_trials` 
+WHERE `STUDY_ID` = :study_id 
+  AND `RECOMMEND` = 1
+  AND CURDATE() <= END_DATE
+  AND DATEDIFF(CURDATE(), START_DATE) % 7 = 0;
+"""
+PATIENTS_QUERY = "SELECT * FROM patient"
+COHORT_QUERY = "SELECT PATIENT_ID FROM patient WHERE PATIENT_ID IN :patient_ids ORDER BY PATIENT_ID"
+
+# Names under which the LocalStore answers the inline queries
+LOCAL_QUERY_NAMES = {
+    CLINICAL_DATA_QUERY: "clinical_data",
+    CLINICAL_SCORES_QUERY: "clinical_scores",
+    PATIENTS_BY_HOSPITAL_QUERY: "patients_by_hospital",
+    PATIENTS_BY_NAME_QUERY: "patients_by_name",
+    PATIENTS_BY_STUDY_QUERY: "patients_by_study",
+    PATIENTS_QUERY: "patients",
+}
+
+PRESCRIPTION_STAGING_INSERT = """
+INSERT INTO prescription_staging (
+    PRESCRIPTION_STAGING_ID, PATIENT_ID, PROTOCOL_ID, STARTING_DATE, ENDING_DATE, WEEKDAY,
+    SESSION_DURATION, RECOMMENDATION_ID, WEEKS_SINCE_START, STATUS
+) VALUES (
+    NULL, :patient_id, :protocol_id, :starting_date, :ending_date, :weekday,
+    :session_duration, :recommendation_id, :weeks_since_start, :status
+)
+"""
+RECSYS_METRICS_INSERT = """
+INSERT INTO recsys_metrics (
+    RECSYS_METRICS_ID, PATIENT_ID, PROTOCOL_ID, RECOMMENDATION_ID, METRIC_DATE, METRIC_KEY, METRIC_VALUE
+) VALUES (
+    NULL, :patient_id, :protocol_id, :recommendation_id, :metric_date, :metric_key, :metric_value
+)
+"""
+
+
+def prepare_bulk_rows(target_table, row_type, entries):
+    """
+    Validate bulk insert ``entries`` (``row_type`` instances or params dicts) against the
+    columns of ``target_table``. Dicts are checked like ``row_type`` instances, through
+    ``row_type.from_params_dict``.
+
+    :return: The BulkInsertResult to fill in, with the validation errors already recorded,
+        the valid rows keyed by column name, and their positions in ``entries``.
+    """
+    result = BulkInsertResult()
+    required = {name.lower() for name in target_table.columns.keys()}
+    rows = []
+    positions = []
+    for i, entry in enumerate(entries):
+        result.ids.append(None)
+        try:
+            if isinstance(entry, row_type):
+                params = entry.to_params_dict()
+            elif isinstance(entry, dict):
+                params = entry
+            else:
+                raise TypeError(f"entry must be an instance of {row_type.__name__} or a params dict.")
+            missing = required - params.keys()
+            if missing:
+                raise ValueError(f"missing fields {sorted(missing)}.")
+            if not isinstance(entry, row_type):
+                # Dicts get the same type and value checks as row_type instances
+                params = row_type.from_params_dict(params).to_params_dict()
+        except (TypeError, ValueError) as ve:
+            result.errors[i] = str(ve)
+            continue
+        rows.append({name.upper(): params[name] for name in required})
+        positions.append(i)
+
+    if result.errors:
+        logger.error("%d of %d %s entries failed validation.", len(result.errors), len(result.ids), target_table.name)
+    return result, rows, positions
+
+
+def plan_cohort_query(sql_query, params):
+    """
+    The ``(query_text, params, setup)`` part running ``sql_query`` on the Cohort bound as
+    ``:patient_ids`` in ``params``: every ``IN :patient_ids`` is replaced with the cohort's
+    subquery, whose setup steps must run on the same connection first. Each occurrence gets its
+    own compilation, so a ``file:`` temporary table is never referenced twice in the statement.
+    """
+    cohort = params[PATIENT_IDS_PARAM]
+    compilations = []
+
+    def subquery(_):
+        compilations.append(cohort.compile(reference=len(compilations)))
+        return f"IN ({compilations[-1].sql})"
+
+    sql_query = _PATIENT_IDS_IN.sub(subquery, sql_query)
+    part_params = {key: value for key, value in params.items() if key != PATIENT_IDS_PARAM}
+    for compiled in compilations:
+        part_params.update(compiled.params)
+    setup = tuple(step for compiled in compilations for step in compiled.setup)
+    logger.debug("Filtering on cohort %s", cohort.expression)
+    return compile_query(sql_query), part_params, setup
+
+
+def first_inserted_id(dialect_name, cursor, n_rows):
+    """
+    ID of the first row of a multi-row INSERT. MySQL reports it as ``lastrowid`` and assigns
+    consecutive IDs within a single statement; SQLite reports the last one instead.
+    """
+    if cursor.rowcount != n_rows or not cursor.lastrowid:
+        return None
+    if dialect_name == "sqlite":
+        return cursor.lastrowid - n_rows + 1
+    return cursor.lastrowid
+
+
 class DatabaseInterface:
-    def __init__(self):
+    def __init__(
+        self,
+        engine: Optional[Engine] = None,
+        cache: Optional[ResultCache] = None,
+        max_concurrency: int = 4,
+        patient_batch_size: int = 1000,
+        temp_table_threshold: Optional[int] = None,
+        compact_dtypes: bool = False,
+        fetch_backend: str = "pandas",
+        instrumentation: Optional[Instrumentation] = None,
+        local_store: Optional[LocalStore] = None,
+        patient_directory: Optional[PatientDirectory] = None,
+    ):
         """
         Initializes the DatabaseInterface, obtaining a database engine.
+
+        :param engine: SQLAlchemy engine to use instead of the one built from the stored credentials.
+        :param cache: Optional ResultCache used by fetch_rgs_data and fetch_timeseries_data.
+        :param max_concurrency: Maximum number of queries this interface runs against the database at once.
+        :param patient_batch_size: Patient ID lists longer than this are split into batches of this size.
+        :param temp_table_threshold: From this many patient IDs on, load them into a temporary table
+            instead of batching. None disables the temporary table path.
+        :param compact_dtypes: Cast the results of the packaged queries to the compact dtypes declared
+            in ``dtypes.QUERY_SCHEMAS`` (categoricals, narrow integers, float32, datetimes).
+        :param fetch_backend: ``"pandas"`` reads results with ``pd.read_sql``; ``"arrow"`` accumulates
+            them column-wise into Arrow record batches straight from the cursor and converts those.
+        :param instrumentation: Optional Instrumentation receiving per-phase timings, row counts and
+            sizes of every fetch and write, with an optional slow-query log and EXPLAIN capture.
+        :param local_store: Optional LocalStore answering the packaged DM/PE and session queries and
+            the patient/clinical lookups instead of the database. Other queries and all writes still
+            go to the database; without ``engine``, none is created and those fail.
+        :param patient_directory: Optional PatientDirectory answering the ``fetch_patients*`` lookups
+            from memory. It takes precedence over ``local_store`` for them.
         """
-        self.engine = get_db_engine()
-        if not self.engine:
+        if fetch_backend not in FETCH_BACKENDS:
+            raise ValueError(f"Unsupported fetch_backend '{fetch_backend}'. Expected one of {FETCH_BACKENDS}.")
+        self.local_store = local_store
+        self.patient_directory = patient_directory
+        self.engine = engine if engine is not None or local_store is not None else get_db_engine()
+        self.cache = cache
+        self.max_concurrency = max(1, max_concurrency)
+        self._query_slots = threading.BoundedSemaphore(self.max_concurrency)
+        self.patient_batch_size = patient_batch_size
+        self.temp_table_threshold = temp_table_threshold
+        self.compact_dtypes = compact_dtypes
+        self.fetch_backend = fetch_backend
+        self.memory_usage: Dict[str, dict] = {}
+        self.instrumentation = instrumentation
+        self.clinical_scores_cache = ClinicalScoresCache()
+        if not self.engine and local_store is None:
             logger.critical("Database engine could not be obtained during DatabaseInterface initialization.")
 
     ###########################
@@ -29,47 +253,184 @@ class DatabaseInterface:
         
         :param patients_ids: List of patient IDs to filter data. (Original typo in param name)
         :param rgs_mode: RGS mode to filter data.
-        :param output_file: Name of the CSV file to save th
+        :param output_file: Output path (.csv, .parquet, .feather) or OutputSink to save the results.
         :return: DataFrame containing the RGS interaction data.
         """
 
         query_file="query.sql"
+        if self.cache:
+            patient_ids = self._cache_patient_ids(patient_ids)
+            if patient_ids is None:
+                return None
+            df = self.cache.fetch(
+                (query_file,),
+                rgs_mode,
+                patient_ids,
+                loader=lambda min_session_id: self._fetch(
+                    query=query_file,
+                    params=self._patient_params(patient_ids, min_session_id),
+                    rgs_mode=rgs_mode
+                ),
+                sort_by=["PATIENT_ID", "SESSION_DATE"]
+            )
+            if df is not None and output_file:
+                write_frame(df, output_file)
+            return df
+
         return self._fetch(
             query=query_file,
-            params={"patient_ids": tuple(patient_ids)},
+            params=self._patient_params(patient_ids),
             rgs_mode=rgs_mode,
             output_file=output_file
         )
 
     def fetch_timeseries_data(self, patient_ids, rgs_mode="plus", output_file=None):
         """
-        Fetch timeseries RGS interaction data for given patient IDs.
+        Fetch timeseries RGS interaction data for given patient IDs as a wide frame.
+
+        Returns one row per (SESSION_ID, PATIENT_ID, PROTOCOL_ID, GAME_MODE, SECONDS_FROM_START)
+        with one column per difficulty modulator and performance estimator key. Keys not
+        sampled at a timestamp are NaN. Use fetch_dm_data / fetch_pe_data for the long format.
         """
-        # Hack as there is no multiindex in across tables
-        dm = self.fetch_dm_data(patient_ids, rgs_mode)
-        pe = self.fetch_pe_data(patient_ids, rgs_mode)
-    
-        if dm.empty or pe.empty:
+        if self.cache:
+            patient_ids = self._cache_patient_ids(patient_ids)
+            if patient_ids is None:
+                return None
+            df = self.cache.fetch(
+                ("query_dm.sql", "query_pe.sql"),
+                rgs_mode,
+                patient_ids,
+                loader=lambda min_session_id: self._fetch_timeseries(patient_ids, rgs_mode, min_session_id),
+            )
+        else:
+            df = self._fetch_timeseries(patient_ids, rgs_mode)
+
+        if df is not None and output_file:
+            write_frame(df, output_file)
+        return df
+
+    def _fetch_timeseries(self, patient_ids, rgs_mode="plus", min_session_id=0):
+        params = self._patient_params(patient_ids, min_session_id)
+        results = self.fetch_concurrently({
+            "dm": lambda: self._fetch(query="query_dm.sql", params=params, rgs_mode=rgs_mode),
+            "pe": lambda: self._fetch(query="query_pe.sql", params=params, rgs_mode=rgs_mode),
+        })
+        dm, pe = results["dm"], results["pe"]
+
+        if dm is None or pe is None:
             logger.error("Failed to retrieve DM or PE data in fetch_timeseries_data().")
             return None
 
-        return dm.merge(
-            pe,
-            on=["SESSION_ID", "PATIENT_ID", "PROTOCOL_ID", "GAME_MODE", "SECONDS_FROM_START"],
+        df = pivot_timeseries(dm, pe)
+        if self.compact_dtypes:
+            apply_schema(df, QUERY_SCHEMAS["timeseries"])
+            self._record_memory_usage("timeseries", df)
+        return df
+
+    def fetch_rgs_data_by_mode(self, patient_ids, rgs_modes: Sequence[str] = ("plus", "app")):
+        """
+        Fetch RGS interaction data for several RGS modes concurrently.
+
+        :param patient_ids: List of patient IDs to filter data.
+        :param rgs_modes: RGS modes to fetch.
+        :return: Dictionary mapping each RGS mode to its DataFrame (None if that fetch failed).
+        """
+        return self.fetch_concurrently({
+            rgs_mode: (lambda rgs_mode=rgs_mode: self.fetch_rgs_data(patient_ids, rgs_mode=rgs_mode))
+            for rgs_mode in rgs_modes
+        })
+
+    def fetch_rgs_and_clinical_data(self, patient_ids, rgs_mode="plus"):
+        """
+        Fetch RGS interaction data and clinical data for given patient IDs concurrently.
+
+        :return: Tuple of (RGS DataFrame, clinical DataFrame); either is None if its fetch failed.
+        """
+        results = self.fetch_concurrently({
+            "rgs": lambda: self.fetch_rgs_data(patient_ids, rgs_mode=rgs_mode),
+            "clinical": lambda: self.fetch_clinical_data(patient_ids),
+        })
+        return results["rgs"], results["clinical"]
+
+    def fetch_concurrently(self, calls: Dict[str, Callable[[], object]]) -> Dict[str, object]:
+        """
+        Run independent fetches in parallel over the connection pool, so the wall-clock time
+        approaches that of the slowest one rather than the sum. At most ``max_concurrency``
+        queries hit the database at any time, including those issued by nested calls.
+
+        :param calls: Dictionary mapping a name to a zero-argument callable, e.g. a ``functools.partial``
+            of a ``fetch_*`` method.
+        :return: Dictionary mapping each name to the callable's result.
+        """
+        if len(calls) <= 1 or self.max_concurrency == 1:
+            return {name: call() for name, call in calls.items()}
+
+        with ThreadPoolExecutor(max_workers=min(len(calls), self.max_concurrency), thread_name_prefix="rgs-fetch") as executor:
+            futures = {name: executor.submit(call) for name, call in calls.items()}
+            return {name: future.result() for name, future in futures.items()}
+
+    def fetch_rgs_data_iter(self, patient_ids, rgs_mode="plus", chunksize=10000, output_file=None):
+        """
+        Stream RGS interaction data for given patient IDs in chunks of at most ``chunksize`` rows.
+
+        Uses a server-side cursor, so neither the driver nor pandas hold the full result set.
+        If ``output_file`` is given, each chunk is appended to it as it is yielded. If the query
+        fails, the exception is raised from the iterator and the partial ``output_file`` is deleted.
+
+        :param patient_ids: List of patient IDs to filter data.
+        :param rgs_mode: RGS mode to filter data.
+        :param chunksize: Maximum number of rows per yielded DataFrame.
+        :param output_file: Output path or OutputSink to stream the results to.
+        :return: Iterator of DataFrames.
+        """
+        return self._fetch_iter(
+            query="query.sql",
+            params=self._patient_params(patient_ids),
+            rgs_mode=rgs_mode,
+            chunksize=chunksize,
+            output_file=output_file
         )
 
-    def fetch_dm_data(self, patient_ids, rgs_mode="plus", output_file=None):
+    def fetch_dm_data(self, patient_ids, rgs_mode="plus", output_file=None, dtype_backend="numpy_nullable"):
         """
         Fetch timeseries RGS interaction data for given patient IDs.
+
+        :param dtype_backend: ``"numpy_nullable"`` (pandas masked dtypes, the default), ``"pyarrow"``
+            (``pd.ArrowDtype`` columns, cheapest to build with ``fetch_backend="arrow"``) or ``"numpy"``.
         """
         query_file="query_dm.sql"
         return self._fetch(
             query=query_file,
-            params={"patient_ids": tuple(patient_ids)},
+            params=self._patient_params(patient_ids),
             rgs_mode=rgs_mode,
-            output_file=output_file
+            output_file=output_file,
+            dtype_backend=dtype_backend
         )
     
+    def fetch_dm_data_iter(self, patient_ids, rgs_mode="plus", chunksize=100000, output_file=None):
+        """
+        Stream timeseries difficulty modulator data for given patient IDs in chunks.
+        See :meth:`fetch_rgs_data_iter`.
+        """
+        return self._fetch_iter(
+            query="query_dm.sql",
+            params=self._patient_params(patient_ids),
+            rgs_mode=rgs_mode,
+            chunksize=chunksize,
+            output_file=output_file
+        )
+
+    def fetch_dm_table(self, patient_ids, rgs_mode="plus"):
+        """
+        Fetch timeseries difficulty modulator data for given patient IDs as a ``pyarrow.Table``,
+        built column-wise from the cursor without going through pandas.
+        """
+        return self._fetch_arrow(
+            query="query_dm.sql",
+            params=self._patient_params(patient_ids),
+            rgs_mode=rgs_mode
+        )
+
     def fetch_clinical_data(self, patient_ids, output_file=None):
         """
         Fetch clinical data for given patient IDs, from the `clinical_trials` table.
@@ -109,30 +470,110 @@ class DatabaseInterface:
             }
         ]
         """
-        sql_query_string = """
-        SELECT *,
-            START_DATE AS CLINICAL_TRIAL_START_DATE,
-            END_DATE AS CLINICAL_TRIAL_END_DATE
-        FROM `clinical_trials`
-        WHERE `PATIENT_ID` IN :patient_ids;
-        """
         return self._fetch(
-            query=sql_query_string,
-            params={"patient_ids": tuple(patient_ids)}
+            query=CLINICAL_DATA_QUERY,
+            params={PATIENT_IDS_PARAM: self._patient_ids(patient_ids)},
+            output_file=output_file
         )
 
-    def fetch_pe_data(self, patient_ids, rgs_mode="plus", output_file=None):
+    def fetch_clinical_scores(self, patient_ids, wide=False, output_file=None):
+        """
+        Fetch the clinical scores of given patient IDs as a columnar frame, flattened from the
+        CLINICAL_SCORES JSON described in :meth:`fetch_clinical_data`.
+
+        Returns one row per scored item with CLINICAL_TRIAL_ID, PATIENT_ID, STUDY_ID,
+        EVALUATION_DATE, CONDITION, SCALE, ITEM and VALUE, or with ``wide=True`` one row per
+        evaluation and one ``<SCALE>_<ITEM>`` column per item. Parsed documents are cached by
+        checksum in ``clinical_scores_cache``, so unchanged trials aren't parsed again.
+
+        :param patient_ids: List of patient IDs to filter data.
+        :param wide: Return the wide frame instead of the tidy one.
+        :param output_file: Output path or OutputSink to save the results.
+        """
+        trials = self._fetch(query=CLINICAL_SCORES_QUERY, params={PATIENT_IDS_PARAM: self._patient_ids(patient_ids)})
+        if trials is None:
+            return None
+        df = flatten_clinical_scores(trials, self.clinical_scores_cache)
+        if wide:
+            df = pivot_clinical_scores(df)
+        if output_file:
+            write_frame(df, output_file)
+        return df
+
+    def fetch_emotional_data(self, patient_ids, start_date=None, end_date=None, output_file=None):
+        """
+        Fetch the daily emotional answer summary of given patient IDs: one row per (PATIENT_ID,
+        ANSWER_DATE) with FIRST_ANSWER_TIME, LAST_ANSWER_TIME, N_ANSWERS, MEAN_ANSWER,
+        LAST_EMOTIONAL_ANSWER_ID and the day's first three answers as EMOTIONAL_KEY_<n> /
+        EMOTIONAL_ANSWER_<n> (the columns query_emotional.sql joins to sessions).
+
+        With a ``local_store``, the rollup it maintains on every sync is read; otherwise the
+        answers in the date range are fetched and rolled up.
+
+        :param patient_ids: List of patient IDs to filter data.
+        :param start_date: First day to include (inclusive), or None for no lower bound.
+        :param end_date: Last day to include (inclusive), or None for no upper bound.
+        :param output_file: Output path or OutputSink to save the results.
+        """
+        start = pd.Timestamp(start_date).normalize() if start_date is not None else None
+        end = pd.Timestamp(end_date).normalize() if end_date is not None else None
+        if self._is_local(EMOTIONAL_DAILY_QUERY):
+            params = {PATIENT_IDS_PARAM: self._patient_ids(patient_ids), "start_date": start, "end_date": end}
+            return self._fetch_local(EMOTIONAL_DAILY_QUERY, params, output_file=output_file)
+
+        params = {
+            PATIENT_IDS_PARAM: self._patient_ids(patient_ids),
+            "start_time": (start if start is not None else pd.Timestamp("1970-01-01")).to_pydatetime(),
+            "end_time": (end + pd.Timedelta(days=1) if end is not None else pd.Timestamp("9999-12-31")).to_pydatetime(),
+        }
+        answers = self._fetch(query=EMOTIONAL_ANSWERS_QUERY, params=params)
+        if answers is None:
+            return None
+        df = rollup_emotional_answers(answers[EMOTIONAL_ANSWER_COLUMNS])
+        if output_file:
+            write_frame(df, output_file)
+        return df
+
+    def fetch_pe_data(self, patient_ids, rgs_mode="plus", output_file=None, dtype_backend="numpy_nullable"):
         """
         Fetch timeseries RGS interaction data for given patient IDs.
+
+        :param dtype_backend: ``"numpy_nullable"`` (pandas masked dtypes, the default), ``"pyarrow"``
+            (``pd.ArrowDtype`` columns, cheapest to build with ``fetch_backend="arrow"``) or ``"numpy"``.
         """
         query_file="query_pe.sql"
         return self._fetch(
             query=query_file,
-            params={"patient_ids": tuple(patient_ids)},
+            params=self._patient_params(patient_ids),
             rgs_mode=rgs_mode,
+            output_file=output_file,
+            dtype_backend=dtype_backend
+        )
+
+    def fetch_pe_data_iter(self, patient_ids, rgs_mode="plus", chunksize=100000, output_file=None):
+        """
+        Stream timeseries performance estimator data for given patient IDs in chunks.
+        See :meth:`fetch_rgs_data_iter`.
+        """
+        return self._fetch_iter(
+            query="query_pe.sql",
+            params=self._patient_params(patient_ids),
+            rgs_mode=rgs_mode,
+            chunksize=chunksize,
             output_file=output_file
         )
 
+    def fetch_pe_table(self, patient_ids, rgs_mode="plus"):
+        """
+        Fetch timeseries performance estimator data for given patient IDs as a ``pyarrow.Table``.
+        See :meth:`fetch_dm_table`.
+        """
+        return self._fetch_arrow(
+            query="query_pe.sql",
+            params=self._patient_params(patient_ids),
+            rgs_mode=rgs_mode
+        )
+
     ### ---- Get IDs ---- ####
 
     def fetch_patients_by_hospital(self, hospital_ids):
@@ -141,14 +582,11 @@ class DatabaseInterface:
         """
         if not isinstance(hospital_ids, (list, tuple)):
             hospital_ids = [hospital_ids]
+        if self.patient_directory is not None:
+            return self._lookup_directory("by_hospital", hospital_ids)
 
-        sql_query_string = """
-        SELECT PATIENT_ID
-        FROM patient
-        WHERE HOSPITAL_ID IN :h_ids;
-        """
         return self._fetch(
-            query=sql_query_string,
+            query=PATIENTS_BY_HOSPITAL_QUERY,
             params={"h_ids": tuple(hospital_ids)}
         )
 
@@ -156,8 +594,10 @@ class DatabaseInterface:
         """
         Fetch patient IDs based on a pattern match in the PATIENT_USER field.
         """
+        if self.patient_directory is not None:
+            return self._lookup_directory("by_name", pattern)
         return self._fetch(
-            query="SELECT * FROM patient WHERE PATIENT_USER LIKE :pattern;",
+            query=PATIENTS_BY_NAME_QUERY,
             params={"pattern": f"%{pattern}%"}
         )
     
@@ -165,61 +605,429 @@ class DatabaseInterface:
         """
         Fetch patient IDs based on which study
         """
+        if self.patient_directory is not None:
+            return self._lookup_directory("by_study", study_ids)
         return self._fetch(
-            query="""
-            SELECT * 
-            FROM `clinical_trials` 
-            WHERE `STUDY_ID` = :study_id 
-              AND `RECOMMEND` = 1
-              AND CURDATE() <= END_DATE
-              AND DATEDIFF(CURDATE(), START_DATE) % 7 = 0;
-            """,
+            query=PATIENTS_BY_STUDY_QUERY,
             params={"study_id": tuple(study_ids)}
         )
 
     def fetch_patients(self):
+        if self.patient_directory is not None:
+            return self._lookup_directory("patients")
         return self._fetch(
-            query="SELECT * FROM patient"
+            query=PATIENTS_QUERY
         )
 
+    def _lookup_directory(self, lookup, *args):
+        try:
+            return getattr(self.patient_directory, lookup)(*args)
+        except Exception:
+            logger.exception("Patient directory lookup failed with exception.")
+            return None
+
+    def resolve_cohort(self, cohort) -> Optional[list]:
+        """
+        Sorted unique patient IDs of a cohort expression or Cohort, resolved against the local
+        store's ``patient``/``clinical_trials`` tables if there is one, else with a single query.
+        Only IDs of the ``patient`` table are returned when resolving with the query.
+
+        :raises CohortSyntaxError: If the expression is malformed.
+        :return: List of patient IDs, or None if the query failed.
+        """
+        cohort = cohort if isinstance(cohort, Cohort) else Cohort(cohort)
+        if self.local_store is not None:
+            patients = self.local_store.read("patient", columns=["PATIENT_ID", "HOSPITAL_ID", "PATIENT_USER"])
+            trials = None
+            if any(selector.kind == "study" for selector in cohort.selectors()):
+                trials = self.local_store.read("clinical_trials", columns=["PATIENT_ID", "STUDY_ID"]).to_pandas()
+            return cohort.evaluate(patients.to_pandas(), trials)
+
+        df = self._fetch(query=COHORT_QUERY, params={PATIENT_IDS_PARAM: cohort})
+        return None if df is None else [int(pid) for pid in df["PATIENT_ID"]]
+
+    def _cache_patient_ids(self, patient_ids):
+        """Cache entries are keyed by patient IDs, so a Cohort is resolved before looking one up."""
+        return self.resolve_cohort(patient_ids) if isinstance(patient_ids, Cohort) else patient_ids
+
     ### ---- Read Handler ---- ####
 
+    @staticmethod
+    def _patient_params(patient_ids, min_session_id=0):
+        """
+        Bind parameters shared by the per-patient queries. ``min_session_id`` restricts the
+        result to sessions with an ID at or above it (used for incremental cache refreshes).
+        """
+        return {PATIENT_IDS_PARAM: DatabaseInterface._patient_ids(patient_ids), "min_session_id": min_session_id}
+
+    @staticmethod
+    def _patient_ids(patient_ids):
+        """Bind value of ``:patient_ids``: a Cohort is passed through to :meth:`_plan_query`, anything else is a tuple."""
+        return patient_ids if isinstance(patient_ids, Cohort) else tuple(patient_ids)
+
     def _fetch(self, query, params=None, rgs_mode=None, output_file=None, dtype_backend="numpy_nullable"):
         """
         Generalized function to fetch data from the database using either a SQL file name or a raw query string 
         :param query: SQL file name (string ending with '.sql') OR raw SQL query as a string.
         :param params: Dictionary of parameters to safely format the query.
-        :param output_file: CSV file to save the results.
+        :param output_file: Output path (format inferred from the extension) or OutputSink to save the results.
         :param dtype_backend: Backend for pandas DataFrame dtype (default: numpy_nullable).
 
         :return: DataFrame with query results.
         """
+        if self._is_local(query):
+            return self._fetch_local(query, params, rgs_mode, output_file, dtype_backend)
         if not self.engine:
             logger.error("Query execution failed: Database engine not available.")
             return None
 
+        event = self._new_event("read", query, params, rgs_mode)
+        parts = []
         try:
-            if query.endswith(".sql"):
-                sql_path = importlib.resources.files(sql) / query
-                with sql_path.open("r") as file:
-                    sql_query = file.read()
+            with event.phase("plan"):
+                parts = self._plan_query(query, params, rgs_mode)
+                schema = self._schema(query)
+            event.parts = len(parts)
+            if len(parts) == 1:
+                df = self._read(*parts[0], dtype_backend=dtype_backend, schema=schema, event=event)
             else:
-                sql_query = query
-            
-            if rgs_mode: 
-                sql_query = sql_query.format(rgs_mode=rgs_mode)
-            
-            query_text = text(sql_query)
-            with self.engine.connect() as connection:
-                df = pd.read_sql(query_text, connection, params=params, dtype_backend=dtype_backend)
+                results = self.fetch_concurrently({
+                    i: partial(self._read, *part, dtype_backend=dtype_backend, schema=schema, event=event)
+                    for i, part in enumerate(parts)
+                })
+                with event.phase("build"):
+                    df = concat_frames([results[i] for i in range(len(parts))])
+            event.add_result(df)
+            if schema:
+                self._record_memory_usage(query, df)
 
             if output_file:
-                df.to_csv(output_file, index=False)
-                logger.info("Data successfully saved to %s", output_file)
+                with event.phase("write"):
+                    write_frame(df, output_file)
             return df
         except Exception as e:
+            event.error = repr(e)
+            logger.exception("Query execution failed with exception.")
+            return None
+        finally:
+            self._emit(event, parts[0] if parts else None)
+
+    def _fetch_iter(self, query, params=None, rgs_mode=None, chunksize=10000, output_file=None, dtype_backend="numpy_nullable"):
+        """
+        Streaming counterpart of :meth:`_fetch`. Executes the query on a server-side
+        (unbuffered) cursor and yields DataFrames of at most ``chunksize`` rows.
+        :param query: SQL file name (string ending with '.sql') OR raw SQL query as a string.
+        :param params: Dictionary of parameters to safely format the query.
+        :param chunksize: Maximum number of rows per yielded DataFrame.
+        :param output_file: Output path or OutputSink the chunks are appended to as they arrive.
+        :param dtype_backend: Backend for pandas DataFrame dtype (default: numpy_nullable).
+
+        :return: Iterator of DataFrames with query results. Unlike :meth:`_fetch`, a failure is raised
+            from the iterator after being logged, and a partially written ``output_file`` is deleted,
+            so an interrupted stream can't pass for a complete result.
+        """
+        if self._is_local(query):
+            df = self._fetch_local(query, params, rgs_mode, output_file, dtype_backend)
+            if df is None:
+                raise RuntimeError(f"Local store query {query!r} failed.")
+            for start in range(0, len(df), chunksize):
+                yield df.iloc[start:start + chunksize]
+            return
+        if not self.engine:
+            logger.error("Query execution failed: Database engine not available.")
+            raise RuntimeError("Database engine not available.")
+
+        event = self._new_event("stream", query, params, rgs_mode)
+        parts = []
+        try:
+            with event.phase("plan"):
+                parts = self._plan_query(query, params, rgs_mode)
+                schema = self._schema(query)
+            event.parts = len(parts)
+            sink = open_sink(output_file, QUERY_COLUMN_TYPES.get(query))
+            n_rows = 0
+            try:
+                for query_text, part_params, setup in parts:
+                    with self._connect(event, query_slot=False) as connection:
+                        with event.phase("setup"):
+                            self._run_setup(connection, setup)
+                        for chunk in self._iter_chunks(connection, query_text, part_params, chunksize, dtype_backend, event):
+                            with event.phase("build"):
+                                apply_schema(chunk, schema)
+                            event.add_result(chunk)
+                            if sink:
+                                with event.phase("write"):
+                                    sink.write_chunk(chunk)
+                            n_rows += len(chunk)
+                            yield chunk
+            except Exception:
+                if sink:
+                    with event.phase("write"):
+                        sink.abort()
+                raise
+            finally:
+                if sink:
+                    with event.phase("write"):
+                        sink.close()
+
+            if sink:
+                logger.info("Data successfully streamed to %s (%d rows)", sink.path, n_rows)
+        except Exception as e:
+            event.error = repr(e)
+            logger.exception("Streaming query execution failed with exception.")
+            raise
+        finally:
+            self._emit(event, parts[0] if parts else None)
+
+    def _iter_chunks(self, connection, query_text, params, chunksize, dtype_backend, event):
+        """
+        Yield the result of ``query_text`` in DataFrames of at most ``chunksize`` rows, read from a
+        server-side cursor. Only the time spent producing each chunk is charged to ``event``.
+        """
+        if self.fetch_backend == "arrow":
+            for batch in arrow.iter_record_batches(connection, query_text, params, chunksize, timer=event):
+                with event.phase("build"):
+                    chunk = arrow.to_pandas(pa.Table.from_batches([batch]), dtype_backend)
+                yield chunk
+            return
+
+        connection.execution_options(stream_results=True, max_row_buffer=chunksize)
+        chunks = pd.read_sql(query_text, connection, params=params, chunksize=chunksize, dtype_backend=dtype_backend)
+        while True:
+            with event.phase("read"):
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    def _fetch_arrow(self, query, params=None, rgs_mode=None):
+        """
+        Counterpart of :meth:`_fetch` returning a ``pyarrow.Table`` built column-wise from the cursor,
+        regardless of ``fetch_backend``.
+        :return: Arrow table with query results, or None if the query failed.
+        """
+        if self._is_local(query):
+            return self._fetch_local(query, params, rgs_mode, as_table=True)
+        if not self.engine:
+            logger.error("Query execution failed: Database engine not available.")
+            return None
+
+        event = self._new_event("read", query, params, rgs_mode)
+        parts = []
+        try:
+            with event.phase("plan"):
+                parts = self._plan_query(query, params, rgs_mode)
+            event.parts = len(parts)
+            if len(parts) == 1:
+                table = self._read_table(*parts[0], event=event)
+            else:
+                results = self.fetch_concurrently({
+                    i: partial(self._read_table, *part, event=event) for i, part in enumerate(parts)
+                })
+                with event.phase("build"):
+                    table = arrow.concat_tables([results[i] for i in range(len(parts))])
+            event.add_result(table)
+            return table
+        except Exception as e:
+            event.error = repr(e)
             logger.exception("Query execution failed with exception.")
             return None
+        finally:
+            self._emit(event, parts[0] if parts else None)
+
+    def _is_local(self, query):
+        return self.local_store is not None and self.local_store.supports(LOCAL_QUERY_NAMES.get(query, query))
+
+    def _fetch_local(self, query, params=None, rgs_mode=None, output_file=None, dtype_backend="numpy_nullable", as_table=False):
+        """
+        Answer ``query`` from the local store, with the same result as :meth:`_fetch`
+        (or :meth:`_fetch_arrow` if ``as_table``). The store read is charged to the ``"read"`` phase.
+        """
+        event = self._new_event("read", query, params, rgs_mode)
+        try:
+            if isinstance((params or {}).get(PATIENT_IDS_PARAM), Cohort):
+                with event.phase("plan"):
+                    params = {**params, PATIENT_IDS_PARAM: self.resolve_cohort(params[PATIENT_IDS_PARAM])}
+            with event.phase("read"):
+                table = self.local_store.fetch(LOCAL_QUERY_NAMES.get(query, query), params, rgs_mode)
+            if as_table:
+                event.add_result(table)
+                return table
+            schema = self._schema(query)
+            with event.phase("build"):
+                df = apply_schema(arrow.to_pandas(table, dtype_backend), schema)
+            event.add_result(df)
+            if schema:
+                self._record_memory_usage(query, df)
+            if output_file:
+                with event.phase("write"):
+                    write_frame(df, output_file)
+            return df
+        except Exception as e:
+            event.error = repr(e)
+            logger.exception("Local store query failed with exception.")
+            return None
+        finally:
+            self._emit(event)
+
+    def _read(self, query_text, params=None, setup=(), dtype_backend="numpy_nullable", schema=None, event=None):
+        """
+        Execute a single query on a pooled connection and return its result as a DataFrame.
+        Runs the ``setup`` statements on the same connection first, and casts the result to ``schema``.
+        Phase timings are added to ``event``, if given.
+        """
+        event = event if event is not None else QueryEvent(query="")
+        if self.fetch_backend == "arrow":
+            table = self._read_table(query_text, params, setup, event=event)
+            with event.phase("build"):
+                df = arrow.to_pandas(table, dtype_backend)
+        else:
+            with self._connect(event) as connection:
+                with event.phase("setup"):
+                    self._run_setup(connection, setup)
+                with event.phase("read"):
+                    df = pd.read_sql(query_text, connection, params=params, dtype_backend=dtype_backend)
+        with event.phase("build"):
+            return apply_schema(df, schema)
+
+    def _read_table(self, query_text, params=None, setup=(), event=None):
+        """
+        Arrow counterpart of :meth:`_read`, returning a ``pyarrow.Table``.
+        """
+        event = event if event is not None else QueryEvent(query="")
+        with self._connect(event) as connection:
+            with event.phase("setup"):
+                self._run_setup(connection, setup)
+            return arrow.read_table(connection, query_text, params, timer=event)
+
+    @contextmanager
+    def _connect(self, event, query_slot=True):
+        """
+        Check out a pooled connection, holding one of the ``max_concurrency`` query slots unless
+        ``query_slot`` is False. The time spent waiting for both is charged to ``event`` as ``"checkout"``.
+        """
+        start = time.perf_counter()
+        with (self._query_slots if query_slot else nullcontext()), self.engine.connect() as connection:
+            event.add_phase("checkout", time.perf_counter() - start)
+            yield connection
+
+    def _new_event(self, operation, query, params=None, rgs_mode=None):
+        patient_ids = (params or {}).get(PATIENT_IDS_PARAM)
+        return QueryEvent(
+            query=query_label(query),
+            operation=operation,
+            rgs_mode=rgs_mode,
+            cohort_size=len(patient_ids) if patient_ids is not None and not isinstance(patient_ids, Cohort) else None,
+        )
+
+    def _emit(self, event, part=None):
+        """
+        Finish ``event`` and pass it to the instrumentation. If it was slow and plan capture is
+        enabled, ``part`` (a ``(query_text, params, setup)`` tuple) is EXPLAINed first.
+        """
+        if not self.instrumentation:
+            return
+        event.finish()
+        event.slow = self.instrumentation.is_slow(event)
+        if event.slow and self.instrumentation.explain_slow_queries and part is not None and event.error is None:
+            event.explain = self._explain(*part)
+        self.instrumentation.emit(event)
+
+    def _explain(self, query_text, params=None, setup=()):
+        """
+        Query plan of ``query_text`` as a list of row dicts, or None if it can't be obtained.
+        Uses ``EXPLAIN QUERY PLAN`` on SQLite and ``EXPLAIN`` elsewhere.
+        """
+        prefix = "EXPLAIN QUERY PLAN " if self.engine.dialect.name == "sqlite" else "EXPLAIN "
+        try:
+            with self._query_slots, self.engine.connect() as connection:
+                self._run_setup(connection, setup)
+                result = connection.execute(compile_query(prefix + query_text.text), params or {})
+                return [dict(row._mapping) for row in result]
+        except Exception as e:
+            logger.warning("Could not capture the query plan: %s", e)
+            return None
+
+    def _schema(self, query):
+        """Compact dtype schema for ``query``, if enabled and declared."""
+        return QUERY_SCHEMAS.get(query) if self.compact_dtypes else None
+
+    def _record_memory_usage(self, query, df):
+        n_bytes = int(df.memory_usage(index=False, deep=True).sum())
+        self.memory_usage[query] = {"rows": len(df), "bytes": n_bytes, "bytes_per_row": n_bytes / max(len(df), 1)}
+        logger.debug("%s: %d rows, %.1f MiB", query, len(df), n_bytes / 2**20)
+
+    def memory_report(self) -> pd.DataFrame:
+        """
+        Memory used by the last result of each packaged query fetched with ``compact_dtypes=True``
+        (rows, bytes, bytes per row). Use ``dtypes.memory_report(df)`` for a per-column breakdown.
+        """
+        return pd.DataFrame.from_dict(self.memory_usage, orient="index", columns=["rows", "bytes", "bytes_per_row"])
+
+    @staticmethod
+    def _run_setup(connection, setup):
+        for statement, statement_params in setup:
+            connection.execute(statement, statement_params)
+        if setup:
+            connection.commit()
+
+    def _plan_query(self, query, params=None, rgs_mode=None):
+        """
+        Split a query into the parts that are actually executed, as a list of
+        ``(query_text, params, setup)`` tuples whose results are concatenated in order.
+
+        A Cohort bound as ``:patient_ids`` replaces every ``IN :patient_ids`` with its subquery,
+        run after its setup steps (see :meth:`Cohort.compile`), in a single part.
+        Patient ID lists longer than ``patient_batch_size`` are deduplicated, sorted and
+        split into batches, one query per batch. From ``temp_table_threshold`` IDs on, they
+        are instead loaded into a temporary table on the query's connection and every
+        ``IN :patient_ids`` is rewritten into a join against it. MySQL can't reference a
+        temporary table twice in one statement, so that path is meant for the queries that
+        bind ``:patient_ids`` once (query.sql, query_dm.sql, query_pe.sql).
+        """
+        patient_ids = (params or {}).get(PATIENT_IDS_PARAM)
+        if isinstance(patient_ids, Cohort):
+            return [plan_cohort_query(self._load_query_string(query, rgs_mode), params)]
+        if patient_ids is None or len(patient_ids) <= self.patient_batch_size:
+            return [(self._load_query(query, rgs_mode), params, ())]
+
+        patient_ids = sorted(set(patient_ids))
+        if self.temp_table_threshold and len(patient_ids) >= self.temp_table_threshold:
+            sql_query = _PATIENT_IDS_IN.sub(
+                f"IN (SELECT PATIENT_ID FROM {PATIENT_IDS_TABLE})", self._load_query_string(query, rgs_mode)
+            )
+            setup = (
+                (text(f"CREATE TEMPORARY TABLE IF NOT EXISTS {PATIENT_IDS_TABLE} (PATIENT_ID INT PRIMARY KEY)"), None),
+                (text(f"DELETE FROM {PATIENT_IDS_TABLE}"), None),
+                (
+                    text(f"INSERT INTO {PATIENT_IDS_TABLE} (PATIENT_ID) VALUES (:patient_id)"),
+                    [{"patient_id": int(pid)} for pid in patient_ids],
+                ),
+            )
+            part_params = {key: value for key, value in params.items() if key != PATIENT_IDS_PARAM}
+            logger.debug("Loading %d patient IDs into %s", len(patient_ids), PATIENT_IDS_TABLE)
+            return [(compile_query(sql_query), part_params, setup)]
+
+        query_text = self._load_query(query, rgs_mode)
+        batch_size = self.patient_batch_size
+        logger.debug("Splitting %d patient IDs into batches of %d", len(patient_ids), batch_size)
+        return [
+            (query_text, {**params, PATIENT_IDS_PARAM: tuple(patient_ids[i:i + batch_size])}, ())
+            for i in range(0, len(patient_ids), batch_size)
+        ]
+
+    def _load_query_string(self, query, rgs_mode=None):
+        """
+        Resolve a SQL file name or raw SQL string into the SQL to execute.
+        """
+        return queries.render(query, rgs_mode)
+
+    def _load_query(self, query, rgs_mode=None):
+        """
+        Resolve a SQL file name or raw SQL string into an executable text clause.
+        Compiled clauses are cached by the query registry.
+        """
+        return queries.get(query, rgs_mode)
 
     ### ---- Write Operations ---- ###
 
@@ -231,15 +1039,6 @@ class DatabaseInterface:
             logger.error("Error: entry must be an instance of PrescriptionStagingRow.")
             return None
 
-        sql_query = """
-        INSERT INTO prescription_staging (
-            PRESCRIPTION_STAGING_ID, PATIENT_ID, PROTOCOL_ID, STARTING_DATE, ENDING_DATE, WEEKDAY,
-            SESSION_DURATION, RECOMMENDATION_ID, WEEKS_SINCE_START, STATUS
-        ) VALUES (
-            NULL, :patient_id, :protocol_id, :starting_date, :ending_date, :weekday,
-            :session_duration, :recommendation_id, :weeks_since_start, :status
-        )
-        """
         if not self.engine:
             logger.error("Cannot add prescription staging entry: Database engine not available.")
             return None
@@ -249,7 +1048,7 @@ class DatabaseInterface:
             params = entry.to_params_dict()
             with self.engine.connect() as connection:
                 with connection.begin() as transaction:
-                    result = connection.execute(text(sql_query), parameters=params)
+                    result = connection.execute(queries.get(PRESCRIPTION_STAGING_INSERT), parameters=params)
                     if result.rowcount == 1:
                         new_id = result.lastrowid  
                     transaction.commit()            
@@ -273,13 +1072,6 @@ class DatabaseInterface:
             logger.error("Error: entry must be an instance of RecsysMetricsRow.")
             return None
 
-        sql_query = """
-       INSERT INTO recsys_metrics (
-            RECSYS_METRICS_ID, PATIENT_ID, PROTOCOL_ID, RECOMMENDATION_ID, METRIC_DATE, METRIC_KEY, METRIC_VALUE
-        ) VALUES (
-            NULL, :patient_id, :protocol_id, :recommendation_id, :metric_date, :metric_key, :metric_value
-        )
-        """
         if not self.engine:
             logger.error("Cannot add recsys metric entry: Database engine not available.")
             return None
@@ -289,7 +1081,7 @@ class DatabaseInterface:
             params = entry.to_params_dict() 
             with self.engine.connect() as connection:
                 with connection.begin() as transaction:
-                    result = connection.execute(text(sql_query), parameters=params)
+                    result = connection.execute(queries.get(RECSYS_METRICS_INSERT), parameters=params)
                     if result.rowcount == 1:
                         new_id = result.lastrowid  
                     transaction.commit()            
@@ -305,7 +1097,72 @@ class DatabaseInterface:
             logger.exception("An unexpected error occurred while adding recsys metric entry.")
             return None
 
+    def add_prescription_staging_entries(
+        self, entries: Iterable[Union[PrescriptionStagingRow, dict]], batch_size: int = 500
+    ) -> Union[BulkInsertResult, None]:
+        """
+        Adds many entries to the prescription_staging table in a single transaction, using
+        multi-row INSERT statements of at most ``batch_size`` rows.
+
+        :param entries: PrescriptionStagingRow instances, or their ``to_params_dict()`` form.
+        :param batch_size: Maximum number of rows per INSERT statement.
+        :return: BulkInsertResult with the new IDs and the per-entry validation errors,
+            or None if the database rejected the insert (nothing is written then).
+        """
+        return self._bulk_insert(PRESCRIPTION_STAGING_TABLE, PrescriptionStagingRow, entries, batch_size)
+
+    def add_recsys_metric_entries(
+        self, entries: Iterable[Union[RecsysMetricsRow, dict]], batch_size: int = 500
+    ) -> Union[BulkInsertResult, None]:
+        """
+        Adds many entries to the recsys_metrics table in a single transaction.
+        See :meth:`add_prescription_staging_entries`.
+        """
+        return self._bulk_insert(RECSYS_METRICS_TABLE, RecsysMetricsRow, entries, batch_size)
+
     ### ---- Write Handler ---- ####
+
+    def _bulk_insert(self, target_table, row_type, entries, batch_size=500):
+        """
+        Validate ``entries`` one by one, then insert the valid ones in batches within one transaction.
+        Invalid entries are reported in the result without aborting the insert.
+        """
+        if not self.engine:
+            logger.error("Cannot add %s entries: Database engine not available.", target_table.name)
+            return None
+
+        event = QueryEvent(query=target_table.name, operation="write")
+        with event.phase("plan"):
+            result, rows, positions = prepare_bulk_rows(target_table, row_type, entries)
+
+        try:
+            with self._connect(event, query_slot=False) as connection:
+                with connection.begin() as transaction:
+                    with event.phase("execute"):
+                        for start in range(0, len(rows), batch_size):
+                            batch = rows[start:start + batch_size]
+                            cursor = connection.execute(insert(target_table).values(batch))
+                            first_id = first_inserted_id(connection.dialect.name, cursor, len(batch))
+                            if first_id is not None:
+                                for offset, position in enumerate(positions[start:start + batch_size]):
+                                    result.ids[position] = first_id + offset
+                            event.parts += 1
+                        transaction.commit()
+            logger.info("Inserted %d rows into %s.", len(rows), target_table.name)
+            event.rows = len(rows)
+            return result
+
+        except exc.SQLAlchemyError as e:
+            event.error = repr(e)
+            logger.error(f"Failed to add {target_table.name} entries (SQLAlchemyError): {e}")
+            return None
+        except Exception as e:
+            event.error = repr(e)
+            logger.exception(f"An unexpected error occurred while adding {target_table.name} entries.")
+            return None
+        finally:
+            self._emit(event)
+
     def _execute_write(self, query, params=None): 
         """
         Generalized private method to execute a write operation (INSERT, UPDATE, DELETE).
@@ -319,43 +1176,59 @@ class DatabaseInterface:
             return None
 
         rows_affected = None
-        sql_query_str = ""
+        event = self._new_event("write", query, params)
+        query_obj = None
         try:
-            if query.endswith(".sql"):
-                sql_path = importlib.resources.files(sql) / query
-                with sql_path.open("r") as file:
-                    sql_query_str = file.read()
-            else:
-                sql_query_str = query
-            
-            query_obj = text(sql_query_str) 
+            with event.phase("plan"):
+                query_obj = queries.get(query)
 
-            with self.engine.connect() as connection:
+            with self._connect(event, query_slot=False) as connection:
                 with connection.begin() as transaction: 
-                    result = connection.execute(query_obj, parameters=params)
-                    if result.is_insert or result.is_update or result.is_delete:
-                        rows_affected = result.rowcount
-                    transaction.commit()
+                    with event.phase("execute"):
+                        result = connection.execute(query_obj, parameters=params)
+                        if result.is_insert or result.is_update or result.is_delete:
+                            rows_affected = result.rowcount
+                        transaction.commit()
                 logger.info(f"Write operation successful. Rows affected: {rows_affected}") 
+            event.rows = rows_affected or 0
             return rows_affected
-        except FileNotFoundError:
+        except FileNotFoundError as e:
+            event.error = repr(e)
             logger.error(f"Database write operation failed: SQL file '{query}' not found.")
             return None
         except exc.SQLAlchemyError as e:
-            logger.error(f"Database write operation failed (SQLAlchemyError) for query '{sql_query_str[:100]}...': {e}")
+            event.error = repr(e)
+            logger.error(f"Database write operation failed (SQLAlchemyError) for query '{query[:100]}...': {e}")
             return None
         except Exception as e:
-            logger.exception(f"Database write operation failed (General Exception) for query '{sql_query_str[:100]}...': {e}")
+            event.error = repr(e)
+            logger.exception(f"Database write operation failed (General Exception) for query '{query[:100]}...': {e}")
             return None
+        finally:
+            self._emit(event, (query_obj, params, ()) if query_obj is not None else None)
         
+    def pool_metrics(self) -> Optional[dict]:
+        """
+        Returns the connection pool counters of the engine (checked-out connections, checkouts,
+        connections created, wait times), or None if the engine is not instrumented.
+        """
+        if not self.engine:
+            return None
+        return get_pool_metrics(self.engine)
+
     def close(self):
         """
         Disposes of the database engine and its connection pool.
         This should be called when the DatabaseInterface object is no longer needed.
+        The process-wide engine returned by get_db_engine() is shared with other
+        instances and only released by this one.
         """
         if self.engine:
-            self.engine.dispose()
-            logger.info("Database engine closed")
+            if is_shared_engine(self.engine):
+                logger.debug("Released shared database engine")
+            else:
+                self.engine.dispose()
+                logger.info("Database engine closed")
             self.engine = None
 
     def __enter__(self):
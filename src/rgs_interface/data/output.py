@@ -0,0 +1,244 @@
+import logging
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from rgs_interface.constants import OUTPUT_FORMATS
+
+logger = logging.getLogger(__name__)
+
+_EXTENSION_FORMATS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+    ".ipc": "feather",
+}
+
+_DEFAULT_COMPRESSION = {
+    "csv": "infer",
+    "parquet": "zstd",
+    "feather": "lz4",
+}
+
+
+def infer_format(path: Union[str, Path]) -> str:
+    """
+    Infer the output format from a file extension, ignoring a trailing compression
+    suffix (e.g. ``data.csv.gz`` -> ``csv``). Unknown extensions fall back to CSV.
+    """
+    for suffix in reversed(Path(path).suffixes):
+        output_format = _EXTENSION_FORMATS.get(suffix.lower())
+        if output_format:
+            return output_format
+    return "csv"
+
+
+class OutputSink:
+    """
+    Writes DataFrames to CSV, Parquet or Arrow IPC (Feather) files.
+
+    A sink can write a whole frame at once with :meth:`write`, or be fed chunk by chunk
+    with :meth:`write_chunk` and closed afterwards, in which case Parquet row groups and
+    IPC record batches are appended as they arrive instead of buffering the full result.
+
+    :param path: Output file, or output directory when ``partition_cols`` is given.
+    :param output_format: One of ``OUTPUT_FORMATS``. Inferred from ``path`` if omitted.
+    :param compression: Codec name (e.g. ``"zstd"``, ``"snappy"``, ``"gzip"``). Uses a per-format default if omitted.
+    :param partition_cols: Columns to partition by (e.g. ``["PATIENT_ID"]``). Writes a hive-style dataset directory.
+    :param column_types: Arrow type names (e.g. ``"int64"``, ``"timestamp[ns]"``) of the columns, so the
+        schema of the output doesn't depend on the first chunk (where a column may be all NULL).
+        See ``dtypes.QUERY_COLUMN_TYPES``.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        output_format: Optional[str] = None,
+        compression: Optional[str] = None,
+        partition_cols: Optional[List[str]] = None,
+        column_types: Optional[Dict[str, str]] = None,
+    ):
+        self.path = Path(path)
+        self.output_format = output_format or infer_format(self.path)
+        if self.output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format '{self.output_format}'. Expected one of {OUTPUT_FORMATS}.")
+        if partition_cols and self.output_format == "csv":
+            raise ValueError("Partitioned output is only supported for parquet and feather formats.")
+        self.compression = compression or _DEFAULT_COMPRESSION[self.output_format]
+        self.partition_cols = list(partition_cols) if partition_cols else None
+        self.column_types = dict(column_types or {})
+
+        self.n_chunks = 0
+        self.n_rows = 0
+        self._schema = None
+        self._writer = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        """Write a complete DataFrame, replacing any previous output."""
+        with self:
+            self.write_chunk(df)
+
+    def write_chunk(self, df: pd.DataFrame) -> None:
+        """Append a chunk to the output. The first chunk replaces any previous output."""
+        if self.n_chunks == 0:
+            self.n_rows = 0
+
+        if self.output_format == "csv":
+            df.to_csv(
+                self.path,
+                mode="a" if self.n_chunks else "w",
+                header=self.n_chunks == 0,
+                index=False,
+                compression=self.compression,
+            )
+        else:
+            table = self._to_table(df)
+            if self.partition_cols:
+                self._write_partitioned(table)
+            else:
+                if self._writer is None:
+                    self._writer = self._open_writer(table.schema)
+                self._writer.write_table(table)
+
+        self.n_chunks += 1
+        self.n_rows += len(df)
+
+    def close(self) -> None:
+        """Finalize the output. A closed sink can be reused; its next chunk starts a new file."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._schema = None
+        self.n_chunks = 0
+
+    def abort(self) -> None:
+        """Close the sink and delete the partial output of a stream that failed midway."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self.n_chunks:
+            if self.partition_cols:
+                shutil.rmtree(self.path, ignore_errors=True)
+            else:
+                self.path.unlink(missing_ok=True)
+            logger.warning("Removed the partial output %s", self.path)
+        self._schema = None
+        self.n_chunks = 0
+        self.n_rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _to_table(self, df: pd.DataFrame) -> pa.Table:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.output_format == "feather":
+            table = _decode_dictionaries(table)
+        if self._schema is None:
+            self._schema = self._file_schema(table)
+        # Every chunk is cast to the schema fixed by the first, so the file stays homogeneous
+        # without rewriting what was already written
+        return table.select(self._schema.names).cast(self._schema)
+
+    def _file_schema(self, table: pa.Table) -> pa.Schema:
+        """
+        Schema of the output, fixed from the first chunk. Columns named in ``column_types`` get
+        that type, and the others the type of the first chunk, with integers widened to int64
+        (compact dtypes may pick a wider type for a later chunk). Dictionary columns stay
+        dictionaries, with int32 indices. Undeclared columns that are all NULL become strings.
+        """
+        fields = []
+        for column_field in table.schema:
+            column_type = column_field.type
+            value_type = column_type.value_type if pa.types.is_dictionary(column_type) else column_type
+            if column_field.name in self.column_types:
+                value_type = pa.type_for_alias(self.column_types[column_field.name])
+            elif pa.types.is_null(value_type):
+                logger.warning(
+                    "Column %s is all NULL in the first chunk and has no declared type, writing it as strings",
+                    column_field.name,
+                )
+                value_type = pa.string()
+            elif pa.types.is_integer(value_type) and value_type != pa.uint64():
+                value_type = pa.int64()
+            if pa.types.is_dictionary(column_type):
+                value_type = pa.dictionary(pa.int32(), value_type)
+            fields.append(pa.field(column_field.name, value_type))
+        # The pandas metadata of the first chunk would turn the columns back into its dtypes on read
+        return pa.schema(fields)
+
+    def _open_writer(self, schema: pa.Schema):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.output_format == "parquet":
+            return pq.ParquetWriter(self.path, schema, compression=self.compression)
+        options = pa.ipc.IpcWriteOptions(compression=None if self.compression == "uncompressed" else self.compression)
+        return pa.ipc.new_file(self.path, schema, options=options)
+
+    def _write_partitioned(self, table: pa.Table) -> None:
+        if self.n_chunks == 0 and self.path.is_dir():
+            shutil.rmtree(self.path)
+        # Partition columns come back as dictionaries, which the stored pandas dtypes can't describe
+        table = table.replace_schema_metadata(None)
+
+        if self.output_format == "parquet":
+            file_format = ds.ParquetFileFormat()
+            file_options = file_format.make_write_options(compression=self.compression)
+        else:
+            file_format = ds.IpcFileFormat()
+            file_options = file_format.make_write_options(
+                compression=None if self.compression == "uncompressed" else self.compression
+            )
+
+        ds.write_dataset(
+            table,
+            self.path,
+            format=file_format,
+            file_options=file_options,
+            partitioning=self.partition_cols,
+            partitioning_flavor="hive",
+            basename_template=f"part-{self.n_chunks}-{{i}}.{self.output_format}",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+
+
+def _decode_dictionaries(table: pa.Table) -> pa.Table:
+    """
+    Replace dictionary (categorical) columns with their values. The IPC file format can't
+    replace a dictionary between record batches, and each chunk brings its own categories.
+    """
+    for i, column_field in enumerate(table.schema):
+        if pa.types.is_dictionary(column_field.type):
+            value_type = column_field.type.value_type
+            table = table.set_column(i, pa.field(column_field.name, value_type), table.column(i).cast(value_type))
+    return table
+
+
+def open_sink(output_file, column_types: Optional[Dict[str, str]] = None) -> Optional[OutputSink]:
+    """
+    Return an :class:`OutputSink` for ``output_file``, which may be a path (format inferred
+    from the extension), an existing sink, or None. ``column_types`` are added to the sink's
+    own, which take precedence.
+    """
+    if output_file is None:
+        return None
+    if isinstance(output_file, OutputSink):
+        output_file.column_types = {**(column_types or {}), **output_file.column_types}
+        return output_file
+    return OutputSink(output_file, column_types=column_types)
+
+
+def write_frame(df: pd.DataFrame, output_file) -> None:
+    """
+    Write ``df`` to ``output_file`` (a path or an :class:`OutputSink`).
+    """
+    sink = open_sink(output_file)
+    sink.write(df)
+    logger.info("Data successfully saved to %s", sink.path)
@@ -1,35 +1,79 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
-from sklearn.pipeline import Pipeline
-from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import FunctionTransformer
+
+try:
+    import joblib
+    import scipy.sparse as sp
+    import sklearn
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+    from sklearn.pipeline import Pipeline
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import FunctionTransformer
+except ImportError as e:
+    raise ImportError(
+        "rgs_interface.data.preprocess needs scikit-learn, install the ml extra: pip install 'rgs-interface[ml]'"
+    ) from e
 
 def preprocess_features(df):
     """
     Function to preprocess dataframe before applying transformations.
     - Drops unnecessary columns
     """
-    df = df.copy()
-
-    # Convert Boolean Flags
-    df["COMPUTER_EXP"] = df["COMPUTER_EXP"] > 0
-    df["VIDEOGAME_EXP"] = df["VIDEOGAME_EXP"] > 0
-    df["HAS_HEMINEGLIGENCE"] = df["HAS_HEMINEGLIGENCE"] > 0
-
     # Drop Unnecessary Columns
     drop_cols = ["PATIENT_ID", "PATIENT_USER",
                  "SESSION_ID", "DEVICE", "PRESCRIBED_SESSION_DURATION",
                  "SESSION_DURATION", "PLATFORM", "STATUS", "COMMENTS",
                  "PROTOCOL_ID", "BIRTH_DATE", "HOUR"]
 
-    # Remove rows with missing AGE
-    df = df.dropna(subset=["SESSION_DURATION"])
-    df = df.drop(columns=drop_cols, errors="ignore")
+    # Remove rows with missing SESSION_DURATION and select the kept columns in one copy
+    keep = df["SESSION_DURATION"].notna()
+    df = df.loc[keep, df.columns.difference(drop_cols, sort=False)]
+
+    # Convert Boolean Flags
+    df["COMPUTER_EXP"] = df["COMPUTER_EXP"] > 0
+    df["VIDEOGAME_EXP"] = df["VIDEOGAME_EXP"] > 0
+    df["HAS_HEMINEGLIGENCE"] = df["HAS_HEMINEGLIGENCE"] > 0
 
     return df
 
-def preprocess_rgs_interaction(data: pd.DataFrame, preprocess_features, data_path: Path, output_filename: str = "rgs_interaction_processed.csv") -> pd.DataFrame:
+
+def infer_column_types(df: pd.DataFrame):
+    """Categorical and numerical columns of a preprocessed frame, as used by the pipelines below."""
+    categorical_cols = df.select_dtypes(include=["object", "category"]).columns.tolist()
+    numerical_cols = df.select_dtypes(include=["int64", "float64"]).columns.tolist()
+    return categorical_cols, numerical_cols
+
+def categorical_values(df: pd.DataFrame, categorical_cols: List[str]) -> pd.DataFrame:
+    """
+    The categorical columns as objects, with every missing value (NaN, NA, None) as None, so
+    that all the pipelines below encode it as one category of its own (``<col>_None``).
+    """
+    values = df[categorical_cols].astype(object)
+    return values.where(values.notna(), None)
+
+def build_column_transformer(numerical_cols: List[str], categorical_cols: List[str]) -> ColumnTransformer:
+    """Unfitted scaler/one-hot ColumnTransformer used by ``preprocess_rgs_interaction``."""
+    # Define Transformers
+    categorical_transformer = OneHotEncoder(sparse_output=False, handle_unknown="ignore")
+    numerical_transformer = StandardScaler()
+
+    # Define Column Transformer
+    return ColumnTransformer([
+        ("num", numerical_transformer, numerical_cols),
+        ("cat", categorical_transformer, categorical_cols)
+    ])
+
+def preprocess_rgs_interaction(data: pd.DataFrame, preprocess_features, data_path: Path, output_filename: str = "rgs_interaction_processed.csv", artifact_filename: Optional[str] = None) -> pd.DataFrame:
     """
     Preprocesses the RGS interaction dataset by applying feature transformations,
     detecting column types dynamically, and saving the transformed data.
@@ -38,6 +82,8 @@ def preprocess_rgs_interaction(data: pd.DataFrame, preprocess_features, data_pat
     - data (pd.DataFrame): Raw dataset.
     - preprocess_features (Callable): Function to preprocess features.
     - data_path (Path): Path where the processed data will be saved.
+    - artifact_filename (str): If given, the fitted transformation is also saved there as a
+      PreprocessingArtifact, for ``transform_only``.
 
     Returns:
     - pd.DataFrame: Transformed dataset.
@@ -47,18 +93,10 @@ def preprocess_rgs_interaction(data: pd.DataFrame, preprocess_features, data_pat
     data_processed = preprocess_features(data)  # Ensure this returns a DataFrame
 
     # Infer Column Types Dynamically
-    categorical_cols = data_processed.select_dtypes(include=["object", "category"]).columns.tolist()
-    numerical_cols = data_processed.select_dtypes(include=["int64", "float64"]).columns.tolist()
-
-    # Define Transformers
-    categorical_transformer = OneHotEncoder(sparse_output=False, handle_unknown="ignore")
-    numerical_transformer = StandardScaler()
+    categorical_cols, numerical_cols = infer_column_types(data_processed)
+    data_processed = data_processed.assign(**categorical_values(data_processed, categorical_cols))
 
-    # Define Column Transformer
-    column_transformer = ColumnTransformer([
-        ("num", numerical_transformer, numerical_cols),
-        ("cat", categorical_transformer, categorical_cols)
-    ])
+    column_transformer = build_column_transformer(numerical_cols, categorical_cols)
 
     # Define Preprocessing Pipeline
     preprocessing_pipeline = Pipeline([
@@ -78,6 +116,9 @@ def preprocess_rgs_interaction(data: pd.DataFrame, preprocess_features, data_pat
     # Save Cleaned Data
     save_path = data_path / output_filename
     df_transformed.to_csv(save_path, index=False)
+    if artifact_filename:
+        PreprocessingArtifact.from_column_transformer(column_transformer).save(data_path / artifact_filename)
+        print(f"Preprocessing artifact saved to: {data_path / artifact_filename}")
 
     # Print Column Summary
     print(f"Processed data saved to: {save_path}")
@@ -87,6 +128,345 @@ def preprocess_rgs_interaction(data: pd.DataFrame, preprocess_features, data_pat
 
     return df_transformed
 
+
+class IncrementalPreprocessor:
+    """
+    Out-of-core counterpart of the pipeline fitted by ``preprocess_rgs_interaction``: the
+    same standard scaling of the numerical columns and one-hot encoding of the categorical
+    columns, fitted chunk by chunk so the full dataset never has to be in memory.
+
+    :meth:`partial_fit` updates the scaler's running mean/variance and accumulates the
+    categories seen per column; column types are inferred from the first chunk. After the
+    last chunk, :meth:`transform` returns a sparse CSR matrix (numerical columns first,
+    then the one-hot columns, as in ``preprocess_rgs_interaction``). Missing values are a
+    category of their own, and unknown categories encode as all zeros. The fitted preprocessor is saved with :meth:`save` and restored
+    with :meth:`load`, so later batches are transformed without refitting.
+
+    :param preprocess_features: Function applied to each raw chunk before fitting/transforming.
+    """
+
+    def __init__(self, preprocess_features: Callable[[pd.DataFrame], pd.DataFrame] = preprocess_features):
+        self.preprocess_features = preprocess_features
+        self.categorical_cols: Optional[List[str]] = None
+        self.numerical_cols: Optional[List[str]] = None
+        self.scaler = StandardScaler()
+        self.encoder: Optional[OneHotEncoder] = None
+        self.n_rows_fitted = 0
+        self._categories = None
+
+    def partial_fit(self, chunk: pd.DataFrame) -> "IncrementalPreprocessor":
+        processed = self.preprocess_features(chunk)
+        if self.numerical_cols is None:
+            self.categorical_cols, self.numerical_cols = infer_column_types(processed)
+            self._categories = {col: set() for col in self.categorical_cols}
+        if len(processed) == 0:
+            return self
+
+        self.scaler.partial_fit(self._numerical(processed))
+        categorical = categorical_values(processed, self.categorical_cols)
+        for col in self.categorical_cols:
+            self._categories[col].update(categorical[col].unique())
+        self.encoder = None
+        self.n_rows_fitted += len(processed)
+        return self
+
+    def fit(self, chunks: Iterable[pd.DataFrame]) -> "IncrementalPreprocessor":
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        self._build_encoder()
+        return self
+
+    def transform(self, chunk: pd.DataFrame) -> sp.csr_matrix:
+        if self.encoder is None:
+            self._build_encoder()
+        processed = self.preprocess_features(chunk)
+        numerical = sp.csr_matrix(self.scaler.transform(self._numerical(processed)))
+        categorical = self.encoder.transform(categorical_values(processed, self.categorical_cols))
+        return sp.hstack([numerical, categorical], format="csr")
+
+    def transform_frame(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """:meth:`transform` as a DataFrame with sparse columns."""
+        return pd.DataFrame.sparse.from_spmatrix(self.transform(chunk), columns=self.feature_names_out)
+
+    @property
+    def feature_names_out(self) -> List[str]:
+        if self.encoder is None:
+            self._build_encoder()
+        return self.numerical_cols + list(self.encoder.get_feature_names_out(self.categorical_cols))
+
+    def _numerical(self, processed: pd.DataFrame) -> np.ndarray:
+        return processed[self.numerical_cols].to_numpy(dtype=float, na_value=np.nan)
+
+    def _build_encoder(self):
+        if self.numerical_cols is None or self.n_rows_fitted == 0:
+            raise ValueError("IncrementalPreprocessor has not been fitted on any rows.")
+        # Sorted like OneHotEncoder does, with the missing value (None) last. Every column has
+        # at least one category, if only None when it was all missing
+        categories = [
+            sorted(self._categories[col] - {None}, key=str) + [None] * (None in self._categories[col])
+            for col in self.categorical_cols
+        ]
+        self.encoder = OneHotEncoder(categories=categories, sparse_output=True, handle_unknown="ignore")
+        # With explicit categories, fitting only validates the column count
+        self.encoder.fit(pd.DataFrame(
+            {col: [values[0]] for col, values in zip(self.categorical_cols, categories)}, dtype=object,
+        ))
+
+    def to_artifact(self) -> "PreprocessingArtifact":
+        if self.encoder is None:
+            self._build_encoder()
+        return PreprocessingArtifact(
+            numerical_cols=list(self.numerical_cols),
+            categorical_cols=list(self.categorical_cols),
+            mean=self.scaler.mean_,
+            scale=self.scaler.scale_,
+            categories=[list(values) for values in self.encoder.categories_],
+        )
+
+    def save(self, path: Union[str, Path]):
+        if self.encoder is None:
+            self._build_encoder()
+        tmp_path = Path(f"{path}.tmp")
+        joblib.dump(self, tmp_path)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path: Union[str, Path]) -> "IncrementalPreprocessor":
+        return joblib.load(path)
+
+
+def preprocess_rgs_interaction_chunked(
+    chunks: Callable[[], Iterable[pd.DataFrame]],
+    preprocess_features,
+    data_path: Path,
+    output_dirname: str = "rgs_interaction_processed",
+    pipeline_filename: Optional[str] = "preprocessing_pipeline.joblib",
+    artifact_filename: Optional[str] = None,
+    preprocessor: Optional[IncrementalPreprocessor] = None,
+    max_workers: int = 4,
+) -> IncrementalPreprocessor:
+    """
+    Streaming variant of ``preprocess_rgs_interaction`` for datasets that don't fit in memory.
+
+    Fits an IncrementalPreprocessor over one pass of ``chunks`` (skipped if a fitted
+    ``preprocessor`` is given), then transforms a second pass in parallel and writes one
+    Parquet file per chunk to ``data_path / output_dirname``. Only about ``2 * max_workers``
+    chunks are held in memory at a time.
+
+    Parameters:
+    - chunks (Callable): Returns a fresh iterator of raw DataFrame chunks on each call, e.g.
+      ``lambda: pd.read_csv(path, chunksize=100_000)`` or
+      ``lambda: db_handler.fetch_rgs_data_iter(patient_ids, chunksize=100_000)``.
+    - preprocess_features (Callable): Function to preprocess features.
+    - data_path (Path): Path where the processed data and the fitted pipeline will be saved.
+    - pipeline_filename (str): File name of the saved preprocessor. None skips saving.
+    - artifact_filename (str): If given, the fitted transformation is also saved there as a
+      PreprocessingArtifact, for ``transform_only``.
+    - preprocessor (IncrementalPreprocessor): Already fitted preprocessor to transform with.
+    - max_workers (int): Number of chunks transformed and written concurrently.
+
+    Returns:
+    - IncrementalPreprocessor: The fitted preprocessor.
+    """
+    if preprocessor is None:
+        preprocessor = IncrementalPreprocessor(preprocess_features).fit(chunks())
+        if pipeline_filename:
+            preprocessor.save(data_path / pipeline_filename)
+            print(f"Fitted pipeline saved to: {data_path / pipeline_filename}")
+    if artifact_filename:
+        preprocessor.to_artifact().save(data_path / artifact_filename)
+        print(f"Preprocessing artifact saved to: {data_path / artifact_filename}")
+
+    output_dir = data_path / output_dirname
+    output_dir.mkdir(parents=True, exist_ok=True)
+    feature_names = preprocessor.feature_names_out
+
+    def write_part(i, chunk):
+        # Densified one chunk at a time: Parquet has no sparse encoding, but compresses the zeros well
+        dense = preprocessor.transform(chunk).toarray()
+        table = pa.Table.from_arrays([pa.array(dense[:, j]) for j in range(dense.shape[1])], names=feature_names)
+        pq.write_table(table, output_dir / f"part-{i:05d}.parquet", compression="zstd")
+        return dense.shape[0]
+
+    n_rows = 0
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="rgs-preprocess") as executor:
+        pending = []
+        for i, chunk in enumerate(chunks()):
+            pending.append(executor.submit(write_part, i, chunk))
+            if len(pending) >= 2 * max(1, max_workers):
+                n_rows += pending.pop(0).result()
+        n_rows += sum(future.result() for future in pending)
+
+    print(f"Processed data saved to: {output_dir} ({n_rows} rows)")
+    print(f"Categorical Columns Processed: {preprocessor.categorical_cols}")
+    print(f"Numerical Columns Processed: {preprocessor.numerical_cols}")
+    print(f"Final Feature Count: {len(feature_names)}")
+    return preprocessor
+
+
+PREPROCESSING_ARTIFACT_VERSION = 1
+
+
+@dataclass
+class PreprocessingArtifact:
+    """
+    Fitted scaling/one-hot transformation as plain arrays and lists, saved as a versioned
+    file: the column lists, the scaler's mean and scale, the categories per column and the
+    output feature names. :meth:`transform` and :meth:`transform_record` apply it with numpy
+    and dict lookups, without sklearn's per-call validation, so featurizing a single row
+    takes microseconds. The output matches the fitted pipeline's: numerical columns scaled,
+    then one indicator column per category. A missing value (None, NaN or NA) sets the
+    ``<col>_None`` column if the fitted data had missing values there; unknown categories,
+    and missing values otherwise, are all zeros.
+
+    Only the column transformation is captured. Inputs must already have the columns of
+    ``numerical_cols`` and ``categorical_cols``; rows are not filtered.
+    """
+
+    numerical_cols: List[str]
+    categorical_cols: List[str]
+    mean: np.ndarray
+    scale: np.ndarray
+    categories: List[list]
+    version: int = PREPROCESSING_ARTIFACT_VERSION
+    sklearn_version: str = sklearn.__version__
+    created_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+
+    def __post_init__(self):
+        self.mean = np.asarray(self.mean, dtype=float)
+        self.scale = np.asarray(self.scale, dtype=float)
+        self.feature_names = self.numerical_cols + [
+            f"{col}_{value}" for col, values in zip(self.categorical_cols, self.categories) for value in values
+        ]
+        # Output column of each category, per categorical column
+        offset = len(self.numerical_cols)
+        self._positions: List[Dict[object, int]] = []
+        self._indexes = [pd.Index(values, dtype=object) for values in self.categories]
+        for values in self.categories:
+            self._positions.append({value: offset + i for i, value in enumerate(values)})
+            offset += len(values)
+
+    @classmethod
+    def from_column_transformer(cls, column_transformer: ColumnTransformer) -> "PreprocessingArtifact":
+        """Artifact of a ColumnTransformer fitted by ``preprocess_rgs_interaction``."""
+        scaler = column_transformer.named_transformers_["num"]
+        encoder = column_transformer.named_transformers_["cat"]
+        columns = dict((name, cols) for name, _, cols in column_transformer.transformers_)
+        numerical_cols, categorical_cols = list(columns["num"]), list(columns["cat"])
+        return cls(
+            numerical_cols=numerical_cols,
+            categorical_cols=categorical_cols,
+            mean=scaler.mean_ if numerical_cols else [],
+            scale=scaler.scale_ if numerical_cols else [],
+            categories=[list(values) for values in encoder.categories_] if categorical_cols else [],
+        )
+
+    @property
+    def n_features(self) -> int:
+        return len(self.feature_names)
+
+    def transform(self, df: pd.DataFrame, sparse: bool = False) -> Union[np.ndarray, sp.csr_matrix]:
+        """Feature matrix of ``df`` (dense by default, or CSR with ``sparse=True``)."""
+        n_rows, n_numerical = len(df), len(self.numerical_cols)
+        numerical = (df[self.numerical_cols].to_numpy(dtype=float, na_value=np.nan) - self.mean) / self.scale
+
+        rows, cols = [], []
+        categorical = categorical_values(df, self.categorical_cols)
+        for col, index, positions in zip(self.categorical_cols, self._indexes, self._positions):
+            codes = index.get_indexer(categorical[col].to_numpy()) if len(index) else np.full(n_rows, -1)
+            hit = np.flatnonzero(codes >= 0)
+            rows.append(hit)
+            cols.append(codes[hit] + (positions[index[0]] if len(index) else 0))
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=int)
+        cols = np.concatenate(cols) if cols else np.empty(0, dtype=int)
+
+        if sparse:
+            one_hot = sp.csr_matrix(
+                (np.ones(len(rows)), (rows, cols - n_numerical)), shape=(n_rows, self.n_features - n_numerical)
+            )
+            return sp.hstack([sp.csr_matrix(numerical), one_hot], format="csr")
+        out = np.zeros((n_rows, self.n_features))
+        out[:, :n_numerical] = numerical
+        out[rows, cols] = 1.0
+        return out
+
+    def transform_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        return pd.DataFrame(self.transform(df), columns=self.feature_names, index=df.index)
+
+    def transform_record(self, record: Mapping[str, object]) -> np.ndarray:
+        """Feature vector of a single row given as a mapping of column to value."""
+        out = np.zeros(self.n_features)
+        n_numerical = len(self.numerical_cols)
+        out[:n_numerical] = [np.nan if record[col] is None else record[col] for col in self.numerical_cols]
+        out[:n_numerical] -= self.mean
+        out[:n_numerical] /= self.scale
+        for col, positions in zip(self.categorical_cols, self._positions):
+            position = positions.get(None if pd.isna(record[col]) else record[col])
+            if position is not None:
+                out[position] = 1.0
+        return out
+
+    def save(self, path: Union[str, Path]):
+        state = {name: value for name, value in asdict(self).items()}
+        tmp_path = Path(f"{path}.tmp")
+        joblib.dump(state, tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "PreprocessingArtifact":
+        """
+        :raises ValueError: If the file was written by an incompatible artifact version.
+        """
+        state = joblib.load(path)
+        if not isinstance(state, dict) or state.get("version") != PREPROCESSING_ARTIFACT_VERSION:
+            found = state.get("version") if isinstance(state, dict) else None
+            raise ValueError(
+                f"Preprocessing artifact {path} has version {found}, expected {PREPROCESSING_ARTIFACT_VERSION}."
+            )
+        return cls(**state)
+
+
+_artifacts: Dict[Tuple[str, int], PreprocessingArtifact] = {}
+_artifacts_lock = threading.Lock()
+
+
+def load_preprocessing_artifact(path: Union[str, Path]) -> PreprocessingArtifact:
+    """Load an artifact once per process; it is reloaded only when the file changes."""
+    path = Path(path).resolve()
+    key = (str(path), path.stat().st_mtime_ns)
+    artifact = _artifacts.get(key)
+    if artifact is None:
+        with _artifacts_lock:
+            artifact = _artifacts.get(key)
+            if artifact is None:
+                artifact = PreprocessingArtifact.load(path)
+                for stale in [k for k in _artifacts if k[0] == key[0]]:
+                    del _artifacts[stale]
+                _artifacts[key] = artifact
+    return artifact
+
+
+def transform_only(
+    data: Union[pd.DataFrame, Mapping[str, object]],
+    artifact: Union[str, Path, PreprocessingArtifact],
+) -> Union[np.ndarray, pd.DataFrame]:
+    """
+    Featurize new rows with a saved artifact, without re-inferring column types or refitting.
+
+    Parameters:
+    - data: DataFrame of rows, or a single row as a mapping of column to value.
+    - artifact: PreprocessingArtifact or the path of one (loaded once and kept in memory).
+
+    Returns:
+    - np.ndarray for a single row, or a DataFrame with columns ``artifact.feature_names``.
+    """
+    if not isinstance(artifact, PreprocessingArtifact):
+        artifact = load_preprocessing_artifact(artifact)
+    if isinstance(data, pd.DataFrame):
+        return artifact.transform_frame(data)
+    return artifact.transform_record(data)
+
+
 if __name__ == "__main__":
     # Load Data
     data_path = Path("../data")
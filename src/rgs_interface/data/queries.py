@@ -0,0 +1,149 @@
+import hashlib
+import importlib.resources
+import re
+import string
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from rgs_interface import sql
+from rgs_interface.constants import RGS_MODES
+from sqlalchemy import TextClause, bindparam, text
+
+# Same bind parameter syntax as sqlalchemy.text(): ":name", but not "::cast" or "\:escaped"
+_BIND_PARAM = re.compile(r"(?<![:\w\\]):(\w+)(?!:)")
+_IN_BIND_PARAM = re.compile(r"\bIN\s*:(\w+)\b", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class QueryInfo:
+    """A packaged SQL file, as loaded and validated by the QueryRegistry."""
+
+    name: str
+    template: str
+    digest: str
+    parameters: Tuple[str, ...]
+    expanding_parameters: Tuple[str, ...]
+    uses_rgs_mode: bool
+
+
+def compile_query(sql_query: str) -> TextClause:
+    """
+    Build the text clause for a SQL string. Parameters bound as ``IN :name`` are declared
+    expanding, so they accept any sequence (rendered as one placeholder per element, and as
+    an always-false condition when empty).
+    """
+    expanding = dict.fromkeys(_IN_BIND_PARAM.findall(sql_query))
+    return text(sql_query).bindparams(*(bindparam(name, expanding=True) for name in expanding))
+
+
+# Inline queries are usually string literals, so caching by string hits across calls
+_compile_cached = lru_cache(maxsize=256)(compile_query)
+
+
+class QueryRegistry:
+    """
+    Catalog of the SQL files packaged under ``rgs_interface.sql``.
+
+    All files are read and validated once, on first use: their only template field may be
+    ``{rgs_mode}``, whose values are restricted to ``rgs_modes``. Compiled text clauses are
+    cached per ``(query, rgs_mode)``, so repeated fetches skip the file access, formatting
+    and construction of the clause.
+
+    :param rgs_modes: Allowed values for ``rgs_mode``.
+    """
+
+    def __init__(self, rgs_modes: Tuple[str, ...] = RGS_MODES):
+        self.rgs_modes = tuple(rgs_modes)
+        self._lock = threading.Lock()
+        self._catalog: Optional[Dict[str, QueryInfo]] = None
+        self._compiled: Dict[Tuple[str, Optional[str]], TextClause] = {}
+
+    @property
+    def catalog(self) -> Dict[str, QueryInfo]:
+        """Packaged queries by file name."""
+        if self._catalog is None:
+            with self._lock:
+                if self._catalog is None:
+                    self._catalog = self._load()
+        return self._catalog
+
+    def info(self, name: str) -> QueryInfo:
+        try:
+            return self.catalog[name]
+        except KeyError:
+            raise FileNotFoundError(f"SQL file '{name}' not found in rgs_interface.sql.") from None
+
+    def render(self, query: str, rgs_mode: Optional[str] = None) -> str:
+        """
+        Return the SQL for a packaged file name or a raw SQL string, with ``{rgs_mode}`` filled in.
+
+        :raises ValueError: If ``rgs_mode`` is not a known mode, or is missing for a query that needs it.
+        :raises FileNotFoundError: If ``query`` names a ``.sql`` file that is not packaged.
+        """
+        if query.endswith(".sql"):
+            info = self.info(query)
+            template, uses_rgs_mode = info.template, info.uses_rgs_mode
+        else:
+            template, uses_rgs_mode = query, rgs_mode is not None
+        if not uses_rgs_mode:
+            return template
+        return template.format(rgs_mode=self._check_rgs_mode(rgs_mode))
+
+    def get(self, query: str, rgs_mode: Optional[str] = None) -> TextClause:
+        """
+        Return the compiled text clause for a packaged file name or a raw SQL string.
+        See :meth:`render` for the errors raised.
+        """
+        if not query.endswith(".sql"):
+            return _compile_cached(self.render(query, rgs_mode))
+
+        key = (query, rgs_mode if self.info(query).uses_rgs_mode else None)
+        clause = self._compiled.get(key)
+        if clause is None:
+            clause = self._compiled[key] = compile_query(self.render(*key))
+        return clause
+
+    def digest(self, query_files) -> str:
+        """Combined hash of the contents of the given packaged files."""
+        combined = hashlib.sha256()
+        for name in query_files:
+            combined.update(self.info(name).digest.encode())
+        return combined.hexdigest()
+
+    def _check_rgs_mode(self, rgs_mode) -> str:
+        if rgs_mode not in self.rgs_modes:
+            raise ValueError(f"Unknown rgs_mode {rgs_mode!r}. Expected one of {self.rgs_modes}.")
+        return rgs_mode
+
+    @staticmethod
+    def _load() -> Dict[str, QueryInfo]:
+        catalog = {}
+        for resource in importlib.resources.files(sql).iterdir():
+            if not resource.name.endswith(".sql"):
+                continue
+            template = resource.read_text()
+            try:
+                fields = {field for _, field, _, _ in string.Formatter().parse(template) if field is not None}
+            except ValueError as e:
+                raise ValueError(f"Invalid template in SQL file '{resource.name}': {e}") from None
+            if fields - {"rgs_mode"}:
+                raise ValueError(
+                    f"SQL file '{resource.name}' uses unknown template fields {sorted(fields - {'rgs_mode'})}."
+                )
+            if not template.strip():
+                raise ValueError(f"SQL file '{resource.name}' is empty.")
+
+            catalog[resource.name] = QueryInfo(
+                name=resource.name,
+                template=template,
+                digest=hashlib.sha256(template.encode()).hexdigest(),
+                parameters=tuple(dict.fromkeys(_BIND_PARAM.findall(template))),
+                expanding_parameters=tuple(dict.fromkeys(_IN_BIND_PARAM.findall(template))),
+                uses_rgs_mode="rgs_mode" in fields,
+            )
+        return dict(sorted(catalog.items()))
+
+
+registry = QueryRegistry()
@@ -1,9 +1,10 @@
-from dataclasses import asdict, dataclass
+from dataclasses import asdict, dataclass, field, fields
 from datetime import date, timedelta
 from enum import Enum
-from typing import Union
+from typing import Dict, List, Optional, Union
 from uuid import UUID
 
+import numpy as np
 import pandas as pd
 
 
@@ -23,6 +24,37 @@ class PrescriptionStatusEnum(Enum):
     REJECTED = "REJECTED"
 
 
+def _check_rows(df: pd.DataFrame, invalid, message: str, max_listed: int = 10) -> None:
+    """Raise a ValueError naming the index labels of ``df`` where the boolean mask ``invalid`` is set."""
+    invalid = np.asarray(invalid, dtype=bool)
+    if not invalid.any():
+        return
+    labels = df.index[invalid]
+    listed = ", ".join(str(label) for label in labels[:max_listed])
+    if len(labels) > max_listed:
+        listed += f", ... ({len(labels)} rows)"
+    raise ValueError(f"{message} Invalid rows: {listed}")
+
+
+def _int_column(df: pd.DataFrame, column: str, minimum: Optional[int] = None) -> np.ndarray:
+    """Validate that ``df[column]`` holds whole numbers (at least ``minimum``) and return them as int64."""
+    values = df[column]
+    if not (pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)):
+        raise TypeError(f"{column} must be a numeric column, got {values.dtype}.")
+    numbers = values.to_numpy(dtype=float, na_value=np.nan)
+    invalid = np.isnan(numbers) | (numbers != np.round(numbers))
+    if minimum is not None:
+        invalid |= numbers < minimum
+    bound = "" if minimum is None else f" >= {minimum}"
+    _check_rows(df, invalid, f"{column} must hold whole numbers{bound}.")
+    return numbers.astype(np.int64)
+
+
+def _field_values(row_type, params: dict) -> dict:
+    """The values of ``params`` for the fields of the dataclass ``row_type``."""
+    return {f.name: params[f.name] for f in fields(row_type)}
+
+
 class RecsysMetricKeyEnum(Enum):
     SCORE = "score"
     DELTA_DM = "delta_dm"
@@ -77,6 +109,15 @@ class PrescriptionStagingRow:
         data["status"] = self.status.value
         return data
 
+    @classmethod
+    def from_params_dict(cls, params: dict) -> "PrescriptionStagingRow":
+        """Inverse of :meth:`to_params_dict`, with the same validation as the constructor."""
+        return cls(**{
+            **_field_values(cls, params),
+            "weekday": WeekdayEnum(params["weekday"]),
+            "status": PrescriptionStatusEnum(params["status"]),
+        })
+
     @classmethod
     def from_row(
         cls,
@@ -102,6 +143,66 @@ class PrescriptionStagingRow:
             status=status,
         )
 
+    @classmethod
+    def from_dataframe(
+        cls,
+        df: pd.DataFrame,
+        recommendation_id: UUID,
+        start: date = date.today(),
+        duration: int = 300,
+        status: PrescriptionStatusEnum = PrescriptionStatusEnum.PENDING,
+    ) -> List[dict]:
+        """
+        Vectorized equivalent of :meth:`from_row` applied to every row of ``df``. Columns are
+        validated as a whole and the rows are returned directly in ``to_params_dict()`` form,
+        ready for ``DatabaseInterface.add_prescription_staging_entries``.
+
+        :param df: Frame with ``PATIENT_ID``, ``PROTOCOL_ID``, ``WEEKDAY`` (name or 0-6 index)
+            and ``WEEKS_SINCE_START`` columns.
+        :raises TypeError: If a column or argument has the wrong type.
+        :raises ValueError: If some rows hold invalid values; the message lists their index labels.
+        """
+        if not isinstance(start, date):
+            raise TypeError("start must be a valid date object.")
+        if not isinstance(duration, int) or duration <= 0:
+            raise ValueError("session_duration must be a positive integer.")
+        if not isinstance(recommendation_id, UUID):
+            raise TypeError("recommendation_id must be an uuid.")
+        if not isinstance(status, PrescriptionStatusEnum):
+            raise TypeError("status must be an instance of PrescriptionStatusEnum.")
+
+        patient_ids = _int_column(df, "PATIENT_ID")
+        protocol_ids = _int_column(df, "PROTOCOL_ID")
+        weeks_since_start = _int_column(df, "WEEKS_SINCE_START", minimum=0)
+
+        weekday_names = np.array([weekday.value for weekday in WeekdayEnum], dtype=object)
+        weekday = df["WEEKDAY"]
+        if pd.api.types.is_numeric_dtype(weekday):
+            weekday_index = weekday.to_numpy(dtype=float, na_value=np.nan)
+            invalid = ~np.isin(weekday_index, np.arange(len(weekday_names)))
+            _check_rows(df, invalid, "WEEKDAY must be a weekday index between 0 and 6.")
+            weekdays = weekday_names[weekday_index.astype(np.int64)]
+        else:
+            invalid = ~weekday.isin(weekday_names)
+            _check_rows(df, invalid, "WEEKDAY must be a WeekdayEnum value.")
+            weekdays = weekday.to_numpy(dtype=object)
+
+        columns = {
+            "patient_id": patient_ids.tolist(),
+            "protocol_id": protocol_ids.tolist(),
+            "weekday": weekdays.tolist(),
+            "weeks_since_start": weeks_since_start.tolist(),
+        }
+        constants = {
+            "starting_date": start,
+            "ending_date": start + timedelta(days=7),
+            "session_duration": duration,
+            "recommendation_id": recommendation_id,
+            "status": status.value,
+        }
+        keys = list(columns)
+        return [{**dict(zip(keys, values)), **constants} for values in zip(*columns.values())]
+
 
 @dataclass
 class RecsysMetricsRow:
@@ -131,6 +232,11 @@ class RecsysMetricsRow:
         data["metric_key"] = self.metric_key.value
         return data
 
+    @classmethod
+    def from_params_dict(cls, params: dict) -> "RecsysMetricsRow":
+        """Inverse of :meth:`to_params_dict`, with the same validation as the constructor."""
+        return cls(**{**_field_values(cls, params), "metric_key": RecsysMetricKeyEnum(params["metric_key"])})
+
     @classmethod
     def from_row(
         cls, row: pd.Series, recommendation_id: UUID, metric_date: date = date.today()
@@ -143,3 +249,62 @@ class RecsysMetricsRow:
             metric_key=RecsysMetricKeyEnum[row["KEY"]],
             metric_value=None if pd.isna(row["VALUE"]) else row["VALUE"],
         )
+
+    @classmethod
+    def from_dataframe(
+        cls, df: pd.DataFrame, recommendation_id: UUID, metric_date: date = date.today()
+    ) -> List[dict]:
+        """
+        Vectorized equivalent of :meth:`from_row` applied to every row of ``df``. Columns are
+        validated as a whole and the rows are returned directly in ``to_params_dict()`` form,
+        ready for ``DatabaseInterface.add_recsys_metric_entries``.
+
+        :param df: Frame with ``PATIENT_ID``, ``PROTOCOL_ID``, ``KEY`` (a RecsysMetricKeyEnum
+            member name) and ``VALUE`` columns. Missing values become None.
+        :raises TypeError: If a column or argument has the wrong type.
+        :raises ValueError: If some rows hold invalid values; the message lists their index labels.
+        """
+        if not isinstance(recommendation_id, UUID):
+            raise TypeError("recommendation_id must be an uuid.")
+        if not isinstance(metric_date, date):
+            raise TypeError("metric_date must be a valid date object.")
+
+        patient_ids = _int_column(df, "PATIENT_ID")
+        protocol_ids = _int_column(df, "PROTOCOL_ID")
+
+        key_values = {member.name: member.value for member in RecsysMetricKeyEnum}
+        metric_keys = df["KEY"].map(key_values)
+        _check_rows(df, metric_keys.isna(), "KEY must be a RecsysMetricKeyEnum member name.")
+
+        values = df["VALUE"].astype(object)
+        metric_values = values.where(values.notna(), None)
+
+        return [
+            {
+                "patient_id": patient_id,
+                "protocol_id": protocol_id,
+                "recommendation_id": recommendation_id,
+                "metric_date": metric_date,
+                "metric_key": metric_key,
+                "metric_value": metric_value,
+            }
+            for patient_id, protocol_id, metric_key, metric_value in zip(
+                patient_ids.tolist(), protocol_ids.tolist(), metric_keys.tolist(), metric_values.tolist()
+            )
+        ]
+
+
+@dataclass
+class BulkInsertResult:
+    """
+    Outcome of a bulk insert. ``ids`` is aligned with the input entries and holds the
+    generated ID of each inserted row, or None for entries rejected by validation,
+    whose position maps to the error message in ``errors``.
+    """
+
+    ids: List[Optional[int]] = field(default_factory=list)
+    errors: Dict[int, str] = field(default_factory=dict)
+
+    @property
+    def inserted(self) -> int:
+        return sum(new_id is not None for new_id in self.ids)
@@ -0,0 +1,656 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import Engine, text
+
+from rgs_interface.data import arrow
+from rgs_interface.data.directory import recommendation_due
+from rgs_interface.data.emotional import NEW_EMOTIONAL_ANSWERS_QUERY, ROLLUP_KEYS, rollup_emotional_answers
+from rgs_interface.data.queries import RGS_MODES, registry as queries
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+# Sessions in any other state may still receive rows and are re-synced until they reach one of these
+FINAL_SESSION_STATUSES = ("CLOSED", "ABORTED")
+
+
+@dataclass(frozen=True)
+class SyncTable:
+    """
+    A per-mode table synced incrementally by ``SESSION_ID``.
+
+    :param name: Table name with an ``{rgs_mode}`` field.
+    :param high_water_marks: Columns whose maximum is reported by ``LocalStore.high_water_marks()``.
+    :param sort_by: Sort order of the rows within each stored file, so Parquet row group
+        statistics can skip most of a file when filtering by the leading column.
+    """
+
+    name: str
+    high_water_marks: Tuple[str, ...]
+    sort_by: Tuple[str, ...]
+
+
+SESSION_TABLES = (
+    SyncTable("session_{rgs_mode}", ("SESSION_ID",), ("SESSION_ID",)),
+    SyncTable("recording_{rgs_mode}", ("SESSION_ID",), ("SESSION_ID",)),
+    SyncTable(
+        "difficulty_modulators_{rgs_mode}",
+        ("SESSION_ID", "SECONDS_FROM_START"),
+        ("PATIENT_ID", "SESSION_ID", "SECONDS_FROM_START"),
+    ),
+    SyncTable(
+        "performance_estimators_{rgs_mode}",
+        ("SESSION_ID", "SECONDS_FROM_START"),
+        ("PATIENT_ID", "SESSION_ID", "SECONDS_FROM_START"),
+    ),
+)
+# Per-session outcomes materialized from recording_* and difficulty_modulators_* as sessions are synced
+SESSION_SUMMARY_TABLE = SyncTable("session_summary_{rgs_mode}", ("SESSION_ID",), ("SESSION_ID",))
+# RECORDING_KEY values summarized per session, and the summary columns they become
+SUMMARY_RECORDING_KEYS = {
+    "sessionDuration(seconds)": "SESSION_DURATION",
+    "totalSuccess": "TOTAL_SUCCESS",
+    "totalErrors": "TOTAL_ERRORS",
+    "score": "GAME_SCORE",
+}
+# Small tables copied in full on every sync: (name, sort column)
+SNAPSHOT_TABLES = (
+    ("patient", "PATIENT_ID"),
+    ("clinical_trials", "PATIENT_ID"),
+    ("prescription_{rgs_mode}", "PATIENT_ID"),
+)
+# Emotional answers, synced by EMOTIONAL_ANSWER_ID, and their per-(patient, day) rollup
+EMOTIONAL_ANSWERS_TABLE = "emotional_answers"
+EMOTIONAL_DAILY_TABLE = "emotional_daily"
+# Files of EMOTIONAL_ANSWERS_TABLE merged into one once there are more of them
+MAX_EMOTIONAL_ANSWER_FILES = 16
+
+
+class LocalStore:
+    """
+    Local Parquet copy of the RGS session tables, kept up to date by :meth:`sync`.
+
+    For each ``rgs_mode``, ``session_*``, ``recording_*``, ``difficulty_modulators_*`` and
+    ``performance_estimators_*`` are synced incrementally by ``SESSION_ID``: every sync
+    re-pulls the sessions from the lowest one that was still open at the previous sync (or
+    from the previous maximum if none was) and replaces those rows, so sessions that were in
+    progress are picked up once they close. Sessions still open after ``open_session_max_age``
+    seconds are treated as abandoned and no longer re-synced. ``patient``, ``clinical_trials``
+    and ``prescription_*`` are small and copied in full. As sessions are synced, their
+    outcomes (recorded duration, successes, errors, score and DM value) are summarized once
+    into ``session_summary_*``, which ``query.sql`` is answered from.
+
+    Emotional answers are synced by ``EMOTIONAL_ANSWER_ID``, and each sync updates the
+    ``emotional_daily`` rollup (see :func:`rollup_emotional_answers`) for only the
+    (patient, day) pairs that received new answers. Answers edited in place after being
+    synced are not picked up.
+
+    All tables of a mode are read within one transaction, so on MySQL/MariaDB (repeatable
+    read) they come from the same snapshot. The store's ``manifest.json`` is replaced
+    atomically once all new files are written; files it no longer lists are deleted at the
+    next sync, so readers holding the previous manifest keep working. Run syncs from a single
+    process at a time.
+
+    :meth:`fetch` answers the packaged DM/PE and session queries and the patient/clinical
+    lookups from the store; pass the store to ``DatabaseInterface(local_store=...)`` to route
+    the matching ``fetch_*`` calls to it.
+
+    :param path: Store directory, created if missing.
+    :param open_session_max_age: Seconds after which a session that is still open is no longer re-synced.
+    :param chunk_sessions: Session ID range pulled and written per file.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        open_session_max_age: float = 2 * 86400,
+        chunk_sessions: int = 20000,
+    ):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.open_session_max_age = open_session_max_age
+        self.chunk_sessions = max(1, chunk_sessions)
+
+        self._manifest_path = self.path / "manifest.json"
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._manifest_mtime = None
+
+    ### ---- Sync ---- ####
+
+    def sync(self, engine: Engine, rgs_modes: Sequence[str] = RGS_MODES, emotional: bool = True) -> Dict[str, int]:
+        """
+        Pull the rows added or changed since the previous sync.
+
+        :param engine: Engine of the source database.
+        :param rgs_modes: RGS modes to sync.
+        :param emotional: Whether to sync the emotional answers and update their daily rollup.
+        :return: Number of rows pulled per table.
+        """
+        manifest = self._load_manifest(reload=True)
+        self._delete_files(manifest.pop("obsolete", []))
+
+        pulled = {}
+        obsolete = []
+        started = time.perf_counter()
+        for rgs_mode in rgs_modes:
+            if rgs_mode not in queries.rgs_modes:
+                raise ValueError(f"Unknown rgs_mode {rgs_mode!r}. Expected one of {queries.rgs_modes}.")
+            with engine.connect() as connection, connection.begin():
+                for name, sort_column in SNAPSHOT_TABLES:
+                    table_name = name.format(rgs_mode=rgs_mode)
+                    if table_name in pulled:
+                        continue
+                    table = arrow.read_table(connection, text(f"SELECT * FROM {table_name}"))
+                    obsolete += self._replace_snapshot(manifest, table_name, table, sort_column)
+                    pulled[table_name] = table.num_rows
+                pulled.update(self._sync_sessions(connection, manifest, rgs_mode, obsolete))
+        if emotional:
+            with engine.connect() as connection:
+                pulled.update(self._sync_emotional(connection, manifest, obsolete))
+
+        manifest["obsolete"] = obsolete
+        self._save_manifest(manifest)
+        logger.info(
+            "Synced %d rows into %s in %.1fs", sum(pulled.values()), self.path, time.perf_counter() - started
+        )
+        return pulled
+
+    def _sync_sessions(self, connection, manifest, rgs_mode, obsolete) -> Dict[str, int]:
+        window = manifest["windows"].get(rgs_mode, {"resync_from": 0})
+        low = window["resync_from"]
+
+        session_table = SESSION_TABLES[0].name.format(rgs_mode=rgs_mode)
+        sessions = arrow.read_table(
+            connection, text(f"SELECT * FROM {session_table} WHERE SESSION_ID >= :low"), {"low": low}
+        )
+        pulled = {session_table: sessions.num_rows}
+        summary_table = SESSION_SUMMARY_TABLE.name.format(rgs_mode=rgs_mode)
+        if summary_table not in manifest["tables"] and session_table in manifest["tables"]:
+            obsolete += self._backfill_summaries(manifest, rgs_mode, low)
+        if sessions.num_rows == 0:
+            logger.debug("No sessions at or above %d in %s", low, session_table)
+            for spec in SESSION_TABLES[1:]:
+                pulled[spec.name.format(rgs_mode=rgs_mode)] = 0
+            return pulled
+        high = pc.max(sessions["SESSION_ID"]).as_py()
+
+        new_files = {session_table: [self._write_file(session_table, sessions, SESSION_TABLES[0].sort_by)]}
+        # Chunks hold whole sessions, so each one is summarized on its own while it's in memory
+        summaries = {spec.name: [] for spec in SESSION_TABLES[1:3]}
+        for spec in SESSION_TABLES[1:]:
+            table_name = spec.name.format(rgs_mode=rgs_mode)
+            new_files[table_name] = []
+            pulled[table_name] = 0
+            query = compile_range_query(table_name)
+            for start in range(low, high + 1, self.chunk_sessions):
+                end = min(start + self.chunk_sessions - 1, high)
+                chunk = arrow.read_table(connection, query, {"low": start, "high": end})
+                if chunk.num_rows:
+                    new_files[table_name].append(self._write_file(table_name, chunk, spec.sort_by))
+                    pulled[table_name] += chunk.num_rows
+                    if spec.name in summaries:
+                        summaries[spec.name].append(_SUMMARIZE[spec.name](chunk))
+
+        summary = summarize_sessions(
+            sessions, *(pd.concat(parts) if parts else None for parts in summaries.values())
+        )
+        new_files[summary_table] = [self._write_file(summary_table, summary, SESSION_SUMMARY_TABLE.sort_by)]
+        pulled[summary_table] = summary.num_rows
+
+        for spec in (*SESSION_TABLES, SESSION_SUMMARY_TABLE):
+            table_name = spec.name.format(rgs_mode=rgs_mode)
+            obsolete += self._truncate(manifest, table_name, low)
+            manifest["tables"].setdefault(table_name, {"files": []})["files"].extend(new_files[table_name])
+            obsolete += self._compact(manifest, table_name, spec)
+            manifest["tables"][table_name]["synced_at"] = time.time()
+
+        manifest["windows"][rgs_mode] = {"resync_from": self._resync_from(sessions, high)}
+        logger.debug(
+            "Synced sessions %d-%d of %s, re-syncing from %d next time",
+            low, high, rgs_mode, manifest["windows"][rgs_mode]["resync_from"]
+        )
+        return pulled
+
+    def _sync_emotional(self, connection, manifest, obsolete) -> Dict[str, int]:
+        after_id = manifest.get("emotional_answer_id", 0)
+        answers = arrow.read_table(connection, text(NEW_EMOTIONAL_ANSWERS_QUERY), {"after_id": after_id})
+        pulled = {EMOTIONAL_ANSWERS_TABLE: answers.num_rows}
+        if answers.num_rows == 0:
+            logger.debug("No emotional answers above %d", after_id)
+            return pulled
+
+        state = manifest["tables"].setdefault(EMOTIONAL_ANSWERS_TABLE, {"files": []})
+        state["files"].append(self._write_file(EMOTIONAL_ANSWERS_TABLE, answers, ("PATIENT_ID", "EMOTIONAL_ANSWER_ID")))
+        if len(state["files"]) > MAX_EMOTIONAL_ANSWER_FILES:
+            table = arrow.concat_tables([pq.read_table(self.path / entry["name"]) for entry in state["files"]])
+            obsolete += [entry["name"] for entry in state["files"]]
+            state["files"] = [self._write_file(EMOTIONAL_ANSWERS_TABLE, table, ("PATIENT_ID", "EMOTIONAL_ANSWER_ID"))]
+        state["synced_at"] = time.time()
+
+        # Only the days that received new answers are rolled up again, from all of their answers
+        new = answers.select(["PATIENT_ID", "CREATION_TIME"]).to_pandas()
+        touched = pd.MultiIndex.from_arrays(
+            [new["PATIENT_ID"], pd.to_datetime(new["CREATION_TIME"], format="ISO8601").dt.normalize()],
+            names=ROLLUP_KEYS,
+        ).unique()
+        patient_answers = self._read_tables(
+            state, filters=[("PATIENT_ID", "in", new["PATIENT_ID"].unique().tolist())]
+        ).to_pandas()
+        days = pd.to_datetime(patient_answers["CREATION_TIME"], format="ISO8601").dt.normalize()
+        in_touched = pd.MultiIndex.from_arrays([patient_answers["PATIENT_ID"], days]).isin(touched)
+        updated = rollup_emotional_answers(patient_answers[in_touched])
+
+        daily = manifest["tables"].get(EMOTIONAL_DAILY_TABLE)
+        if daily:
+            previous = self._read_tables(daily).to_pandas()
+            unchanged = ~pd.MultiIndex.from_frame(previous[ROLLUP_KEYS]).isin(touched)
+            updated = pd.concat([previous[unchanged], updated], ignore_index=True)
+        table = pa.Table.from_pandas(updated, preserve_index=False)
+        obsolete += self._replace_snapshot(manifest, EMOTIONAL_DAILY_TABLE, table, ROLLUP_KEYS)
+
+        manifest["emotional_answer_id"] = pc.max(answers["EMOTIONAL_ANSWER_ID"]).as_py()
+        pulled[EMOTIONAL_DAILY_TABLE] = len(touched)
+        logger.debug("Rolled up %d emotional answers into %d patient days", answers.num_rows, len(touched))
+        return pulled
+
+    def _backfill_summaries(self, manifest, rgs_mode: str, low: int) -> List[str]:
+        """
+        Summarize the sessions below ``low`` from the stored files, for stores synced before
+        ``session_summary_*`` existed. Returns the replaced files.
+        """
+        summary_table = SESSION_SUMMARY_TABLE.name.format(rgs_mode=rgs_mode)
+        manifest["tables"][summary_table] = {"files": []}
+        files = manifest["tables"][summary_table]["files"]
+        stored = {spec.name: manifest["tables"].get(spec.name.format(rgs_mode=rgs_mode)) for spec in SESSION_TABLES}
+        for start in range(0, low, self.chunk_sessions):
+            window = [("SESSION_ID", ">=", start), ("SESSION_ID", "<", min(start + self.chunk_sessions, low))]
+            sessions, recordings, dm = (
+                self._read_tables(stored[spec.name], filters=window, min_session=start) if stored[spec.name] else None
+                for spec in SESSION_TABLES[:3]
+            )
+            if sessions is None or sessions.num_rows == 0:
+                continue
+            summary = summarize_sessions(
+                sessions,
+                summarize_recordings(recordings) if recordings is not None else None,
+                first_dm_values(dm) if dm is not None else None,
+            )
+            files.append(self._write_file(summary_table, summary, SESSION_SUMMARY_TABLE.sort_by))
+        logger.info("Backfilled %d session summaries of %s", sum(entry["rows"] for entry in files), rgs_mode)
+        return self._compact(manifest, summary_table, SESSION_SUMMARY_TABLE)
+
+    def _resync_from(self, sessions: pa.Table, high: int) -> int:
+        """Lowest session ID that may still change: the oldest open session that isn't abandoned yet."""
+        df = sessions.select(["SESSION_ID", "STATUS", "STARTING_DATE"]).to_pandas()
+        cutoff = datetime.now() - timedelta(seconds=self.open_session_max_age)
+        starting = pd.to_datetime(df["STARTING_DATE"], format="ISO8601", errors="coerce")
+        open_sessions = df.loc[~df["STATUS"].isin(FINAL_SESSION_STATUSES) & (starting >= cutoff), "SESSION_ID"]
+        return int(open_sessions.min()) if len(open_sessions) else high + 1
+
+    ### ---- Files ---- ####
+
+    def _write_file(self, table_name: str, table: pa.Table, sort_by: Sequence[str]) -> dict:
+        table = table.sort_by([(column, "ascending") for column in sort_by])
+        directory = self.path / table_name
+        directory.mkdir(exist_ok=True)
+        name = f"{table_name}/{uuid.uuid4().hex}.parquet"
+        tmp_path = self.path / f"{name}.tmp"
+        pq.write_table(table, tmp_path, compression="zstd", row_group_size=65536)
+        os.replace(tmp_path, self.path / name)
+
+        entry = {"name": name, "rows": table.num_rows}
+        if "SESSION_ID" in table.column_names and table.num_rows:
+            entry["min_session"] = pc.min(table["SESSION_ID"]).as_py()
+            entry["max_session"] = pc.max(table["SESSION_ID"]).as_py()
+        return entry
+
+    def _compact(self, manifest, table_name: str, spec: SyncTable) -> List[str]:
+        """
+        Merge runs of adjacent files spanning at most ``chunk_sessions`` sessions, so the small
+        files left by each sync don't accumulate. Returns the replaced files.
+        """
+        state = manifest["tables"][table_name]
+        groups = []
+        for entry in sorted(state["files"], key=lambda entry: entry["min_session"]):
+            if groups and entry["max_session"] - groups[-1][0]["min_session"] < self.chunk_sessions:
+                groups[-1].append(entry)
+            else:
+                groups.append([entry])
+
+        files, obsolete = [], []
+        for group in groups:
+            if len(group) == 1:
+                files.append(group[0])
+                continue
+            table = arrow.concat_tables([pq.read_table(self.path / entry["name"]) for entry in group])
+            files.append(self._write_file(table_name, table, spec.sort_by))
+            obsolete += [entry["name"] for entry in group]
+        state["files"] = files
+        return obsolete
+
+    def _truncate(self, manifest, table_name: str, low: int) -> List[str]:
+        """Drop the rows with SESSION_ID >= ``low`` from the stored files of a table. Returns the replaced files."""
+        state = manifest["tables"].get(table_name)
+        if not state:
+            return []
+        kept, obsolete = [], []
+        for entry in state["files"]:
+            if entry.get("max_session", -1) < low:
+                kept.append(entry)
+                continue
+            obsolete.append(entry["name"])
+            if entry["min_session"] < low:
+                table = pq.read_table(self.path / entry["name"], filters=[("SESSION_ID", "<", low)])
+                kept.append(self._write_file(table_name, table, _spec(table_name).sort_by))
+        state["files"] = kept
+        return obsolete
+
+    def _replace_snapshot(
+        self, manifest, table_name: str, table: pa.Table, sort_by: Union[str, Sequence[str]]
+    ) -> List[str]:
+        state = manifest["tables"].get(table_name, {"files": []})
+        obsolete = [entry["name"] for entry in state["files"]]
+        manifest["tables"][table_name] = {
+            "files": [self._write_file(table_name, table, (sort_by,) if isinstance(sort_by, str) else sort_by)],
+            "synced_at": time.time(),
+        }
+        return obsolete
+
+    def _delete_files(self, names: Sequence[str]):
+        for name in names:
+            (self.path / name).unlink(missing_ok=True)
+
+    ### ---- Manifest ---- ####
+
+    def _load_manifest(self, reload: bool = False) -> dict:
+        with self._lock:
+            mtime = self._manifest_path.stat().st_mtime_ns if self._manifest_path.exists() else None
+            if reload or self._manifest is None or mtime != self._manifest_mtime:
+                manifest = {"version": STORE_VERSION, "tables": {}, "windows": {}}
+                if mtime is not None:
+                    with open(self._manifest_path, "r") as f:
+                        manifest = json.load(f)
+                    if manifest.get("version") != STORE_VERSION:
+                        raise ValueError(
+                            f"Local store {self.path} has version {manifest.get('version')}, expected {STORE_VERSION}."
+                        )
+                self._manifest, self._manifest_mtime = manifest, mtime
+            return json.loads(json.dumps(self._manifest)) if reload else self._manifest
+
+    def _save_manifest(self, manifest: dict):
+        tmp_path = self._manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._manifest_path)
+        with self._lock:
+            self._manifest, self._manifest_mtime = manifest, self._manifest_path.stat().st_mtime_ns
+
+    def high_water_marks(self) -> Dict[str, dict]:
+        """
+        Per synced table: the maximum of its high-water mark columns (for DM/PE, the latest
+        ``SECONDS_FROM_START`` of the latest session), its row count and last sync time.
+        For each mode, ``resync_from`` is the session ID the next sync starts from, and for
+        ``emotional_answers``, ``EMOTIONAL_ANSWER_ID`` is the last answer synced.
+        """
+        manifest = self._load_manifest()
+        marks = {}
+        for table_name, state in manifest["tables"].items():
+            mark = {"rows": sum(entry["rows"] for entry in state["files"]), "synced_at": state.get("synced_at")}
+            spec = _spec(table_name)
+            sessions = [entry["max_session"] for entry in state["files"] if "max_session" in entry]
+            if spec and sessions:
+                mark["SESSION_ID"] = max(sessions)
+                if "SECONDS_FROM_START" in spec.high_water_marks:
+                    latest = self.read(table_name, ["SECONDS_FROM_START"], [("SESSION_ID", "=", mark["SESSION_ID"])])
+                    mark["SECONDS_FROM_START"] = pc.max(latest["SECONDS_FROM_START"]).as_py()
+            marks[table_name] = mark
+        for rgs_mode, window in manifest["windows"].items():
+            marks[f"resync_from_{rgs_mode}"] = window["resync_from"]
+        if EMOTIONAL_ANSWERS_TABLE in marks:
+            marks[EMOTIONAL_ANSWERS_TABLE]["EMOTIONAL_ANSWER_ID"] = manifest.get("emotional_answer_id")
+        return marks
+
+    ### ---- Reads ---- ####
+
+    def read(
+        self,
+        table_name: str,
+        columns: Optional[List[str]] = None,
+        filters: Optional[list] = None,
+        min_session: Optional[int] = None,
+    ) -> pa.Table:
+        """
+        Read a synced table, optionally only some columns and the rows matching ``filters``
+        (in ``pyarrow.parquet`` DNF form). Files holding only sessions below ``min_session`` are skipped.
+
+        :raises LookupError: If the table has not been synced.
+        """
+        state = self._load_manifest()["tables"].get(table_name)
+        if state is None:
+            raise LookupError(f"Table {table_name} is not in the local store {self.path}; run sync() first.")
+        return self._read_tables(state, columns, filters, min_session)
+
+    def _read_tables(self, state: dict, columns=None, filters=None, min_session=None) -> pa.Table:
+        tables = [
+            pq.read_table(self.path / entry["name"], columns=columns, filters=filters)
+            for entry in state["files"]
+            if min_session is None or entry.get("max_session", min_session) >= min_session
+        ]
+        if not tables:
+            schema = pq.read_schema(self.path / state["files"][0]["name"]) if state["files"] else pa.schema([])
+            if columns:
+                schema = pa.schema([schema.field(column) for column in columns])
+            return schema.empty_table()
+        return arrow.concat_tables(tables)
+
+    def supports(self, query: str) -> bool:
+        return query in LOCAL_QUERIES
+
+    def fetch(self, query: str, params: Optional[dict] = None, rgs_mode: Optional[str] = None) -> pa.Table:
+        """
+        Answer a packaged query (``query.sql``, ``query_dm.sql``, ``query_pe.sql``) or one of the
+        named lookups (``"patients"``, ``"patients_by_hospital"``, ``"patients_by_name"``,
+        ``"patients_by_study"``, ``"clinical_data"``, ``"clinical_scores"``, ``"emotional_daily"``)
+        from the store, with the same columns as the database.
+
+        :raises KeyError: If the query is not supported locally.
+        """
+        if rgs_mode is not None and rgs_mode not in queries.rgs_modes:
+            raise ValueError(f"Unknown rgs_mode {rgs_mode!r}. Expected one of {queries.rgs_modes}.")
+        return LOCAL_QUERIES[query](self, params or {}, rgs_mode)
+
+
+def _spec(table_name: str) -> Optional[SyncTable]:
+    return next((spec for spec in (SESSION_SUMMARY_TABLE, *SESSION_TABLES) if table_name.startswith(spec.name.split("{")[0])), None)
+
+
+def compile_range_query(table_name: str):
+    return text(f"SELECT * FROM {table_name} WHERE SESSION_ID BETWEEN :low AND :high")
+
+
+### ---- Session summaries ---- ####
+
+
+def summarize_recordings(recordings: pa.Table) -> pd.DataFrame:
+    """Maximum of each ``SUMMARY_RECORDING_KEYS`` value per session, like the ``RecordingData`` CTE of query.sql."""
+    recordings = recordings.select(["SESSION_ID", "RECORDING_KEY", "RECORDING_VALUE"])
+    df = recordings.filter(pc.is_in(recordings["RECORDING_KEY"], pa.array(list(SUMMARY_RECORDING_KEYS)))).to_pandas()
+    df["RECORDING_VALUE"] = pd.to_numeric(df["RECORDING_VALUE"], errors="coerce")
+    return (
+        df.groupby(["SESSION_ID", "RECORDING_KEY"])["RECORDING_VALUE"].max()
+        .unstack("RECORDING_KEY")
+        .reindex(columns=list(SUMMARY_RECORDING_KEYS))
+        .rename(columns=SUMMARY_RECORDING_KEYS)
+    )
+
+
+def first_dm_values(dm: pa.Table) -> pd.DataFrame:
+    """The earliest difficulty modulator value of each session, as DM_VALUE."""
+    df = dm.select(["SESSION_ID", "SECONDS_FROM_START", "PARAMETER_VALUE"]).to_pandas()
+    df = df.sort_values(["SESSION_ID", "SECONDS_FROM_START"], kind="stable")
+    return df.groupby("SESSION_ID")[["PARAMETER_VALUE"]].first().rename(columns={"PARAMETER_VALUE": "DM_VALUE"})
+
+
+def summarize_sessions(
+    sessions: pa.Table, recordings: Optional[pd.DataFrame] = None, dm: Optional[pd.DataFrame] = None
+) -> pa.Table:
+    """
+    One row per session with its prescription, status, dates, real duration, the
+    :func:`summarize_recordings` outcomes and the :func:`first_dm_values` DM value.
+    """
+    df = sessions.select(["SESSION_ID", "PRESCRIPTION_ID", "STARTING_DATE", "ENDING_DATE", "STATUS"]).to_pandas()
+    df = df.rename(columns={"STARTING_DATE": "SESSION_DATE"})
+    starting = pd.to_datetime(df["SESSION_DATE"], format="ISO8601")
+    df["REAL_SESSION_DURATION"] = (pd.to_datetime(df["ENDING_DATE"], format="ISO8601") - starting).dt.total_seconds()
+    for outcomes in (recordings, dm):
+        if outcomes is not None:
+            df = df.join(outcomes, on="SESSION_ID")
+    outcome_columns = [*SUMMARY_RECORDING_KEYS.values(), "DM_VALUE"]
+    df = df.reindex(columns=[
+        "SESSION_ID", "PRESCRIPTION_ID", "SESSION_DATE", "ENDING_DATE", "STATUS", "REAL_SESSION_DURATION",
+        *outcome_columns,
+    ])
+    df[outcome_columns] = df[outcome_columns].astype("float64")
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+_SUMMARIZE = {SESSION_TABLES[1].name: summarize_recordings, SESSION_TABLES[2].name: first_dm_values}
+
+
+### ---- Local query implementations ---- ####
+
+
+def _timeseries(table_template: str, prefix: str) -> Callable[[LocalStore, dict, str], pa.Table]:
+    def fetch(store: LocalStore, params: dict, rgs_mode: str) -> pa.Table:
+        min_session_id = params.get("min_session_id", 0)
+        table = store.read(
+            table_template.format(rgs_mode=rgs_mode),
+            columns=["SESSION_ID", "PATIENT_ID", "PROTOCOL_ID", "GAME_MODE", "SECONDS_FROM_START",
+                     "PARAMETER_KEY", "PARAMETER_VALUE"],
+            filters=[("PATIENT_ID", "in", list(params["patient_ids"])), ("SESSION_ID", ">=", min_session_id)],
+            min_session=min_session_id,
+        )
+        table = table.set_column(6, "PARAMETER_VALUE", pc.cast(table["PARAMETER_VALUE"], pa.float64()))
+        return table.rename_columns(table.column_names[:5] + [f"{prefix}_KEY", f"{prefix}_VALUE"])
+
+    return fetch
+
+
+def _rgs_sessions(store: LocalStore, params: dict, rgs_mode: str) -> pa.Table:
+    """Equivalent of query.sql: one row per closed/aborted session, or per prescription without any."""
+    patient_ids = list(params["patient_ids"])
+    min_session_id = params.get("min_session_id", 0)
+
+    prescriptions = store.read(
+        f"prescription_{rgs_mode}",
+        columns=["PATIENT_ID", "PRESCRIPTION_ID", "PROTOCOL_ID", "STARTING_DATE", "ENDING_DATE",
+                 "WEEKDAY", "SESSION_DURATION"],
+        filters=[("PATIENT_ID", "in", patient_ids)],
+    ).to_pandas().rename(columns={
+        "STARTING_DATE": "PRESCRIPTION_STARTING_DATE",
+        "ENDING_DATE": "PRESCRIPTION_ENDING_DATE",
+        "SESSION_DURATION": "PRESCRIBED_SESSION_DURATION",
+    })
+    sessions = store.read(
+        f"session_summary_{rgs_mode}",
+        columns=["SESSION_ID", "PRESCRIPTION_ID", "SESSION_DATE", "STATUS", "REAL_SESSION_DURATION",
+                 "SESSION_DURATION", "DM_VALUE"],
+        filters=[
+            ("PRESCRIPTION_ID", "in", prescriptions["PRESCRIPTION_ID"].tolist()),
+            ("STATUS", "in", list(FINAL_SESSION_STATUSES)),
+        ],
+    ).to_pandas()
+
+    df = prescriptions.merge(sessions, on="PRESCRIPTION_ID", how="left")
+    df = df[df["SESSION_ID"].isna() | (df["SESSION_ID"] >= min_session_id)]
+    session_duration = df["SESSION_DURATION"]
+    prescribed = df["PRESCRIBED_SESSION_DURATION"]
+    df = df.assign(
+        WEEKDAY_INDEX=df["WEEKDAY"].map({day: i for i, day in enumerate(
+            ("MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY", "SUNDAY")
+        )}),
+        SESSION_ID=df["SESSION_ID"].astype("Int64"),
+        SESSION_DURATION=session_duration.round().astype("Int64"),
+        ADHERENCE=(session_duration / prescribed).where(prescribed > 0),
+    )
+    df = df.sort_values(["PATIENT_ID", "SESSION_DATE"], kind="stable", na_position="first")
+    return pa.Table.from_pandas(df[[
+        "PATIENT_ID", "PRESCRIPTION_ID", "SESSION_ID", "PROTOCOL_ID", "PRESCRIPTION_STARTING_DATE",
+        "PRESCRIPTION_ENDING_DATE", "SESSION_DATE", "STATUS", "WEEKDAY_INDEX", "REAL_SESSION_DURATION",
+        "PRESCRIBED_SESSION_DURATION", "SESSION_DURATION", "ADHERENCE", "DM_VALUE",
+    ]], preserve_index=False)
+
+
+def _patients(store: LocalStore, params: dict, rgs_mode: str) -> pa.Table:
+    return store.read("patient")
+
+
+def _patients_by_hospital(store: LocalStore, params: dict, rgs_mode: str) -> pa.Table:
+    return store.read("patient", columns=["PATIENT_ID"], filters=[("HOSPITAL_ID", "in", list(params["h_ids"]))])
+
+
+def _patients_by_name(store: LocalStore, params: dict, rgs_mode: str) -> pa.Table:
+    patients = store.read("patient")
+    # MySQL's default collations compare case-insensitively
+    return patients.filter(pc.match_like(patients["PATIENT_USER"], params["pattern"], ignore_case=True))
+
+
+def _patients_by_study(store: LocalStore, params: dict, rgs_mode: str) -> pa.Table:
+    study_ids = params["study_id"]
+    trials = store.read("clinical_trials", filters=[
+        ("STUDY_ID", "in", list(study_ids) if isinstance(study_ids, (list, tuple)) else [study_ids]),
+        ("RECOMMEND", "=", 1),
+    ])
+    return trials.filter(pa.array(recommendation_due(trials.to_pandas())))
+
+
+def _clinical_data(store: LocalStore, params: dict, rgs_mode: str) -> pa.Table:
+    trials = store.read("clinical_trials", filters=[("PATIENT_ID", "in", list(params["patient_ids"]))])
+    return trials.append_column("CLINICAL_TRIAL_START_DATE", trials["START_DATE"]).append_column(
+        "CLINICAL_TRIAL_END_DATE", trials["END_DATE"]
+    )
+
+
+def _clinical_scores(store: LocalStore, params: dict, rgs_mode: str) -> pa.Table:
+    return store.read(
+        "clinical_trials",
+        columns=["CLINICAL_TRIAL_ID", "PATIENT_ID", "STUDY_ID", "CLINICAL_SCORES"],
+        filters=[("PATIENT_ID", "in", list(params["patient_ids"]))],
+    )
+
+
+def _emotional_daily(store: LocalStore, params: dict, rgs_mode: str) -> pa.Table:
+    filters = [("PATIENT_ID", "in", list(params["patient_ids"]))]
+    if params.get("start_date") is not None:
+        filters.append(("ANSWER_DATE", ">=", pd.Timestamp(params["start_date"]).normalize()))
+    if params.get("end_date") is not None:
+        filters.append(("ANSWER_DATE", "<=", pd.Timestamp(params["end_date"]).normalize()))
+    return store.read(EMOTIONAL_DAILY_TABLE, filters=filters)
+
+
+LOCAL_QUERIES: Dict[str, Callable[[LocalStore, dict, Optional[str]], pa.Table]] = {
+    "query.sql": _rgs_sessions,
+    "query_dm.sql": _timeseries("difficulty_modulators_{rgs_mode}", "DM"),
+    "query_pe.sql": _timeseries("performance_estimators_{rgs_mode}", "PE"),
+    "patients": _patients,
+    "patients_by_hospital": _patients_by_hospital,
+    "patients_by_name": _patients_by_name,
+    "patients_by_study": _patients_by_study,
+    "clinical_data": _clinical_data,
+    "clinical_scores": _clinical_scores,
+    "emotional_daily": _emotional_daily,
+}
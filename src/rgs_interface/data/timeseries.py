@@ -0,0 +1,109 @@
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+TIMESERIES_INDEX = ["SESSION_ID", "PATIENT_ID", "PROTOCOL_ID", "GAME_MODE", "SECONDS_FROM_START"]
+
+
+def pivot_long(
+    parts: Sequence[Tuple[pd.DataFrame, str, str]],
+    index: List[str] = TIMESERIES_INDEX,
+) -> pd.DataFrame:
+    """
+    Pivot one or more long-format frames into a single wide frame.
+
+    Each part is ``(df, key_column, value_column)``. The result has one row per distinct
+    ``index`` tuple found in any part, sorted by ``index``, and one float column per key
+    (float32 if all value columns are float32, float64 otherwise).
+    Keys are factorized to integer codes (cheap for categorical columns) and the values
+    scattered into a preallocated 2-D array, so no intermediate cross product is built.
+    If the same key and index tuple appear more than once, the last value wins. Keys that
+    appear in more than one part are prefixed with the name of their value column.
+
+    :param parts: Long-format frames with their key and value column names.
+    :param index: Columns identifying a row of the wide frame.
+    :return: Wide DataFrame with the ``index`` columns followed by one column per key.
+    """
+    row_codes, index_columns = _row_codes([df for df, _, _ in parts], index)
+    n_rows = len(next(iter(index_columns.values()))) if index else 0
+
+    key_codes = []
+    key_names = []
+    for df, key_column, value_column in parts:
+        codes, uniques = pd.factorize(df[key_column], sort=True)
+        key_codes.append(codes)
+        key_names.append((value_column, [str(key) for key in uniques]))
+
+    all_names = [name for _, names in key_names for name in names]
+    duplicated = {name for name in all_names if all_names.count(name) > 1}
+    columns = [
+        f"{value_column}_{name}" if name in duplicated else name
+        for value_column, names in key_names
+        for name in names
+    ]
+
+    # Keep float32 values (see dtypes.QUERY_SCHEMAS) as float32, anything else becomes float64
+    value_dtype = np.float32 if all(df[value_column].dtype == np.float32 for df, _, value_column in parts) else float
+    values = np.full((n_rows, len(columns)), np.nan, dtype=value_dtype)
+    row_offset = 0
+    column_offset = 0
+    for (df, _, value_column), codes, (_, names) in zip(parts, key_codes, key_names):
+        part_rows = row_codes[row_offset:row_offset + len(df)]
+        has_key = codes >= 0
+        part_values = df[value_column].to_numpy(dtype=value_dtype, na_value=np.nan)
+        values[part_rows[has_key], codes[has_key] + column_offset] = part_values[has_key]
+        row_offset += len(df)
+        column_offset += len(names)
+
+    wide = pd.DataFrame(index_columns)
+    wide[columns] = values
+    return wide
+
+
+def _row_codes(frames: Sequence[pd.DataFrame], index: List[str]):
+    """
+    Assign a dense row code to every distinct ``index`` tuple across ``frames``, in sorted
+    order. Each index column is factorized on its own and the codes are combined into a
+    single integer key, which avoids hashing row tuples. Falls back to a groupby if the
+    combined key could overflow 64 bits.
+
+    :return: The row code of every input row (frames concatenated), and the index columns
+        of the distinct rows.
+    """
+    column_codes = []
+    column_uniques = []
+    for column in index:
+        values = pd.concat([df[column] for df in frames], ignore_index=True)
+        codes, uniques = pd.factorize(values, sort=True, use_na_sentinel=False)
+        column_codes.append(codes)
+        column_uniques.append(uniques)
+
+    key_space = 1
+    for uniques in column_uniques:
+        key_space *= max(len(uniques), 1)
+
+    if key_space < 2**63:
+        combined = np.zeros(len(column_codes[0]) if column_codes else 0, dtype=np.int64)
+        for codes, uniques in zip(column_codes, column_uniques):
+            combined = combined * len(uniques) + codes
+        _, first, row_codes = np.unique(combined, return_index=True, return_inverse=True)
+    else:
+        all_index = pd.DataFrame(dict(zip(index, column_codes)))
+        row_codes = all_index.groupby(index, sort=True).ngroup().to_numpy()
+        _, first = np.unique(row_codes, return_index=True)
+
+    index_columns = {
+        column: uniques.take(codes[first])
+        for column, codes, uniques in zip(index, column_codes, column_uniques)
+    }
+    return row_codes.ravel(), index_columns
+
+
+def pivot_timeseries(dm: pd.DataFrame, pe: pd.DataFrame) -> pd.DataFrame:
+    """
+    Combine long-format difficulty modulator and performance estimator frames (as returned
+    by ``query_dm.sql`` and ``query_pe.sql``) into one row per (session, timestamp) with one
+    column per DM and PE key. Timestamps present in only one of the two get NaN for the other.
+    """
+    return pivot_long([(dm, "DM_KEY", "DM_VALUE"), (pe, "PE_KEY", "PE_VALUE")])
@@ -1,33 +1,260 @@
 import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field, fields
+from typing import Dict, Optional, Tuple
 
-from rgs_interface.config import load_config
-from sqlalchemy import create_engine
+from rgs_interface.config import get_pool_config, load_config
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.pool import QueuePool
 
 logger = logging.getLogger(__name__)
 
+# Process-wide engines, keyed by credentials
+_engines: Dict[Tuple[str, str, str, str], Engine] = {}
+_engines_lock = threading.Lock()
 
-def get_db_engine():
-    """Create and return a SQLAlchemy engine for MySQL."""
+
+@dataclass
+class PoolMetrics:
+    """Counters of a connection pool, updated by pool events."""
+
+    checked_out: int = 0
+    checkouts: int = 0
+    connections_created: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+    connect_seconds_total: float = 0.0
+    connect_seconds_max: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def wait_seconds_avg(self) -> float:
+        return self.wait_seconds_total / self.checkouts if self.checkouts else 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def record_connect(self, seconds: float) -> None:
+        with self._lock:
+            self.connect_seconds_total += seconds
+            self.connect_seconds_max = max(self.connect_seconds_max, seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checked_out = self.checkouts = self.connections_created = 0
+            self.wait_seconds_total = self.wait_seconds_max = 0.0
+            self.connect_seconds_total = self.connect_seconds_max = 0.0
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            data = {f.name: getattr(self, f.name) for f in fields(self) if not f.name.startswith("_")}
+        data["wait_seconds_avg"] = self.wait_seconds_avg
+        return data
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that records in ``self.metrics`` how long each checkout waited for a pooled
+    connection and, separately, how long opening new connections took.
+    """
+
+    metrics: Optional[PoolMetrics] = None
+    # Start and connect time of the checkout in progress on this thread
+    _checkout = threading.local()
+
+    def _do_get(self):
+        if getattr(self._checkout, "start", None) is not None:
+            # QueuePool._do_get retries by calling itself; the outer call times the checkout
+            return super()._do_get()
+        self._checkout.start = start = time.perf_counter()
+        self._checkout.connect_seconds = 0.0
+        try:
+            return super()._do_get()
+        finally:
+            self._checkout.start = None
+            if self.metrics is not None:
+                self.metrics.record_wait(time.perf_counter() - start - self._checkout.connect_seconds)
+
+    def _create_connection(self):
+        start = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            seconds = time.perf_counter() - start
+            if getattr(self._checkout, "start", None) is not None:
+                self._checkout.connect_seconds += seconds
+            if self.metrics is not None:
+                self.metrics.record_connect(seconds)
+
+    def recreate(self):
+        # Engine.dispose() swaps in a recreated pool; keep counting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def _instrument(engine: Engine) -> PoolMetrics:
+    metrics = PoolMetrics()
+    engine.pool.metrics = metrics
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        with metrics._lock:
+            metrics.connections_created += 1
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        with metrics._lock:
+            metrics.checked_out += 1
+            metrics.checkouts += 1
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        with metrics._lock:
+            metrics.checked_out = max(metrics.checked_out - 1, 0)
+
+    return metrics
+
+
+def create_db_engine(credentials: dict, pool_config: Optional[dict] = None) -> Engine:
+    """
+    Create an instrumented SQLAlchemy engine for MySQL from credentials and pool settings.
+
+    :param credentials: Dict with DB_USER, DB_PASS, DB_HOST and DB_NAME.
+    :param pool_config: Pool settings as returned by ``get_pool_config()``. Read from the config if omitted.
+    """
+    engine = create_engine(
+        _connection_string(credentials, "pymysql"),
+        poolclass=TimedQueuePool,
+        **_pool_options(pool_config or get_pool_config()),
+    )
+    _instrument(engine)
+    return engine
+
+
+def create_async_db_engine(credentials: dict, pool_config: Optional[dict] = None):
+    """
+    Create a SQLAlchemy AsyncEngine for MySQL on the aiomysql driver (``pip install rgs-interface[async]``).
+    Takes the same arguments as :func:`create_db_engine`.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    return create_async_engine(
+        _connection_string(credentials, "aiomysql"),
+        **_pool_options(pool_config or get_pool_config()),
+    )
+
+
+def get_async_db_engine():
+    """
+    Return a new AsyncEngine built from the stored credentials, or None if it could not be created.
+    Async pools belong to the event loop that uses them, so these engines are not shared.
+    """
     try:
         credentials = load_config()
+        engine = create_async_db_engine(credentials)
+        logger.info("Async database engine created successfully - %s", credentials["DB_NAME"])
+        return engine
+    except Exception as e:
+        logger.critical("Async database engine creation failed: %s", e)
+        return None
+
+
+def _connection_string(credentials: dict, driver: str) -> str:
+    db_user = credentials["DB_USER"]
+    db_password = credentials["DB_PASS"]
+    db_host = credentials["DB_HOST"]
+    db_name = credentials["DB_NAME"]
 
-        db_user = credentials["DB_USER"]
-        db_password = credentials["DB_PASS"]
-        db_host = credentials["DB_HOST"]
-        db_name = credentials["DB_NAME"]
+    if not all([db_user, db_password, db_host, db_name]):
+        raise ValueError("Missing database credentials in environment variables")
 
-        if not all([db_user, db_password, db_host, db_name]):
-            raise ValueError("Missing database credentials in environment variables")
+    return f"mysql+{driver}://{db_user}:{db_password}@{db_host}/{db_name}"
 
-        # Create the database connection string
-        connection_string = (
-            f"mysql+pymysql://{db_user}:{db_password}@{db_host}/{db_name}"
-        )
-        engine = create_engine(connection_string, pool_pre_ping=True)
 
-        logger.info("Database engine created successfully - %s", db_name)
+def _pool_options(pool_config: dict) -> dict:
+    return {
+        "pool_size": pool_config["DB_POOL_SIZE"],
+        "max_overflow": pool_config["DB_MAX_OVERFLOW"],
+        "pool_recycle": pool_config["DB_POOL_RECYCLE"],
+        "pool_timeout": pool_config["DB_POOL_TIMEOUT"],
+        "pool_pre_ping": pool_config["DB_POOL_PRE_PING"],
+    }
+
+
+def get_db_engine(shared: bool = True):
+    """
+    Return a SQLAlchemy engine for MySQL built from the stored credentials.
+
+    Engines are shared process-wide: every call with the same credentials returns the same
+    engine and connection pool, so creating many DatabaseInterface objects is cheap.
+
+    :param shared: Set to False to get a private engine that is not registered.
+    :return: The engine, or None if it could not be created.
+    """
+    try:
+        credentials = load_config()
+        if not shared:
+            engine = create_db_engine(credentials)
+            logger.info("Database engine created successfully - %s", credentials["DB_NAME"])
+            return engine
+
+        key = (credentials["DB_USER"], credentials["DB_PASS"], credentials["DB_HOST"], credentials["DB_NAME"])
+        with _engines_lock:
+            engine = _engines.get(key)
+            if engine is None:
+                engine = _engines[key] = create_db_engine(credentials)
+                logger.info("Database engine created successfully - %s", credentials["DB_NAME"])
         return engine
 
     except Exception as e:
         logger.critical("Database engine creation failed: %s", e)
         return None
+
+
+def is_shared_engine(engine: Engine) -> bool:
+    """Whether ``engine`` belongs to the process-wide registry (and must not be disposed by its users)."""
+    with _engines_lock:
+        return any(shared is engine for shared in _engines.values())
+
+
+def get_pool_metrics(engine: Engine) -> Optional[dict]:
+    """
+    Return pool counters for an engine created by this module: connections currently checked
+    out, total checkouts, connections created, time spent waiting for a pooled connection, and
+    time spent opening new connections.
+    Returns None for engines without instrumentation.
+    """
+    metrics = getattr(engine.pool, "metrics", None)
+    if metrics is None:
+        return None
+    return {**metrics.to_dict(), "pool_size": engine.pool.size(), "pool_status": engine.pool.status()}
+
+
+def dispose_engines() -> None:
+    """Dispose and forget all shared engines, e.g. at application shutdown."""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+
+def _reset_after_fork() -> None:
+    # Pooled connections inherited from the parent must not be used (or closed) by the child.
+    # Drop them without closing and start from fresh pools and counters.
+    global _engines_lock
+    _engines_lock = threading.Lock()
+    for engine in list(_engines.values()):
+        engine.dispose(close=False)
+        metrics = getattr(engine.pool, "metrics", None)
+        if metrics is not None:
+            metrics._lock = threading.Lock()
+            metrics.reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -17,27 +17,31 @@ WITH SessionData AS (
     LEFT JOIN session_{rgs_mode} sp
         ON sp.PRESCRIPTION_ID = pp.PRESCRIPTION_ID
         AND sp.STATUS IN ('CLOSED', 'ABORTED') -- Keep this in ON clause so we don't filter out prescriptions without sessions
+    WHERE pp.PATIENT_ID IN :patient_ids    -- Filter the cohort here so the CTEs below only touch its sessions
+      AND (sp.SESSION_ID IS NULL OR sp.SESSION_ID >= :min_session_id) -- Incremental refresh, 0 fetches everything
 ),
 
 -- Single CTE to compute average DDM per session
 DifficultyData AS (
     SELECT
-        SESSION_ID,
-        PARAMETER_VALUE AS DM_VALUE
-    FROM difficulty_modulators_{rgs_mode}
-    GROUP BY SESSION_ID
+        dm.SESSION_ID,
+        dm.PARAMETER_VALUE AS DM_VALUE
+    FROM difficulty_modulators_{rgs_mode} dm
+    WHERE dm.SESSION_ID IN (SELECT SESSION_ID FROM SessionData)
+    GROUP BY dm.SESSION_ID
 ),
 
 -- Recording metrics
 RecordingData AS (
     SELECT
-        SESSION_ID,
-        MAX(CASE WHEN RECORDING_KEY = 'sessionDuration(seconds)' THEN RECORDING_VALUE END) AS SESSION_DURATION,
-        MAX(CASE WHEN RECORDING_KEY = 'totalSuccess' THEN RECORDING_VALUE END) AS TOTAL_SUCCESS,
-        MAX(CASE WHEN RECORDING_KEY = 'totalErrors' THEN RECORDING_VALUE END) AS TOTAL_ERRORS,
-        MAX(CASE WHEN RECORDING_KEY = 'score' THEN RECORDING_VALUE END) AS GAME_SCORE
-    FROM recording_{rgs_mode}
-    GROUP BY SESSION_ID
+        rec.SESSION_ID,
+        MAX(CASE WHEN rec.RECORDING_KEY = 'sessionDuration(seconds)' THEN rec.RECORDING_VALUE END) AS SESSION_DURATION,
+        MAX(CASE WHEN rec.RECORDING_KEY = 'totalSuccess' THEN rec.RECORDING_VALUE END) AS TOTAL_SUCCESS,
+        MAX(CASE WHEN rec.RECORDING_KEY = 'totalErrors' THEN rec.RECORDING_VALUE END) AS TOTAL_ERRORS,
+        MAX(CASE WHEN rec.RECORDING_KEY = 'score' THEN rec.RECORDING_VALUE END) AS GAME_SCORE
+    FROM recording_{rgs_mode} rec
+    WHERE rec.SESSION_ID IN (SELECT SESSION_ID FROM SessionData)
+    GROUP BY rec.SESSION_ID
 )
 
 -- Main query selecting from the above CTE
@@ -82,6 +86,4 @@ LEFT JOIN RecordingData r
 LEFT JOIN DifficultyData dd
     ON sd.SESSION_ID = dd.SESSION_ID
 
-WHERE sd.PATIENT_ID IN :patient_ids
-
 ORDER BY sd.PATIENT_ID, sd.SESSION_DATE;
@@ -7,4 +7,5 @@ SELECT
     dm.PARAMETER_KEY AS DM_KEY,
     CAST(dm.PARAMETER_VALUE AS FLOAT) AS DM_VALUE
 FROM difficulty_modulators_{rgs_mode} dm
-WHERE dm.PATIENT_ID IN :patient_ids;
+WHERE dm.PATIENT_ID IN :patient_ids
+  AND dm.SESSION_ID >= :min_session_id;
@@ -10,6 +10,7 @@ WITH EmotionalAnswers AS (
         ON eqp.EMOTIONAL_QUESTION_PATIENT_ID = ea.EMOTIONAL_QUESTION_PATIENT_ID
     JOIN emotional_question as eq
         ON eqp.EMOTIONAL_QUESTION_ID = eq.EMOTIONAL_QUESTION_ID
+    WHERE eqp.PATIENT_ID IN :patient_ids   -- Rank only the cohort's answers
 ),
 
 SessionData AS (
@@ -37,6 +38,7 @@ SessionData AS (
     JOIN protocol_type as prt
         ON pr.PROTOCOL_TYPE_ID = prt.PROTOCOL_TYPE_ID
     WHERE sp.STATUS IN ('CLOSED', 'ABORTED')
+      AND pp.PATIENT_ID IN :patient_ids  -- Filter the cohort here so the session lookups below only touch its sessions
 )
 
 SELECT
@@ -100,13 +102,14 @@ FROM patient p
 LEFT JOIN SessionData sd ON p.PATIENT_ID = sd.PATIENT_ID
 LEFT JOIN (
     SELECT
-        SESSION_ID,
-        MAX(CASE WHEN RECORDING_KEY = 'sessionDuration(seconds)' THEN RECORDING_VALUE END) AS SESSION_DURATION,
-        MAX(CASE WHEN RECORDING_KEY = 'totalSuccess' THEN RECORDING_VALUE END) AS TOTAL_SUCCESS,
-        MAX(CASE WHEN RECORDING_KEY = 'totalErrors' THEN RECORDING_VALUE END) AS TOTAL_ERRORS,
-        MAX(CASE WHEN RECORDING_KEY = 'score' THEN RECORDING_VALUE END) AS SCORE
-    FROM recording_{rgs_mode}
-    GROUP BY SESSION_ID
+        rec.SESSION_ID,
+        MAX(CASE WHEN rec.RECORDING_KEY = 'sessionDuration(seconds)' THEN rec.RECORDING_VALUE END) AS SESSION_DURATION,
+        MAX(CASE WHEN rec.RECORDING_KEY = 'totalSuccess' THEN rec.RECORDING_VALUE END) AS TOTAL_SUCCESS,
+        MAX(CASE WHEN rec.RECORDING_KEY = 'totalErrors' THEN rec.RECORDING_VALUE END) AS TOTAL_ERRORS,
+        MAX(CASE WHEN rec.RECORDING_KEY = 'score' THEN rec.RECORDING_VALUE END) AS SCORE
+    FROM recording_{rgs_mode} rec
+    WHERE rec.SESSION_ID IN (SELECT SESSION_ID FROM SessionData)
+    GROUP BY rec.SESSION_ID
 ) r ON sd.SESSION_ID = r.SESSION_ID
 
 LEFT JOIN (SELECT PATIENT_ID, ANSWER_DATE, EMOTIONAL_QUESTION_KEY, EMOTIONAL_ANSWER FROM EmotionalAnswers WHERE answer_rank = 1) ea1
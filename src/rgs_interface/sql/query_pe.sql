@@ -7,4 +7,5 @@ SELECT
     pe.PARAMETER_KEY AS PE_KEY,
     CAST(pe.PARAMETER_VALUE AS FLOAT) AS PE_VALUE
 FROM performance_estimators_{rgs_mode} pe
-WHERE pe.PATIENT_ID IN :patient_ids;
\ No newline at end of file
+WHERE pe.PATIENT_ID IN :patient_ids
+  AND pe.SESSION_ID >= :min_session_id;
\ No newline at end of file
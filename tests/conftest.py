@@ -0,0 +1,33 @@
+import pytest
+from sqlalchemy import create_engine
+
+
+def server_side_cursor_engine(url="sqlite://"):
+    """
+    SQLite engine that takes the server-side cursor path of ``stream_results``, like pymysql:
+    SQLAlchemy then prefetches the first row of each result into its own buffer.
+    """
+    engine = create_engine(url)
+    context_cls = engine.dialect.execution_ctx_cls
+    engine.dialect.execution_ctx_cls = type(
+        "ServerSideCursorContext", (context_cls,), {"create_server_side_cursor": lambda self: self._dbapi_connection.cursor()}
+    )
+    engine.dialect.supports_server_side_cursors = True
+    return engine
+
+
+@pytest.fixture(params=["client", "server"], ids=["client_cursor", "server_side_cursor"])
+def cursor_engine(request, tmp_path):
+    url = f"sqlite:///{tmp_path / 'rgs.db'}"
+    engine = create_engine(url) if request.param == "client" else server_side_cursor_engine(url)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def seeded_engine(cursor_engine):
+    """``cursor_engine`` filled with a small synthetic RGS database."""
+    from benchmarks.synthetic import SyntheticScale, seed_database
+
+    seed_database(cursor_engine, SyntheticScale(patients=6, hospitals=2, sessions_per_patient=4, samples_per_session=5))
+    return cursor_engine
@@ -0,0 +1,49 @@
+import pyarrow as pa
+import pytest
+from sqlalchemy import text
+
+from rgs_interface.data import arrow
+
+
+@pytest.fixture
+def connection(cursor_engine):
+    with cursor_engine.connect() as connection:
+        connection.execute(text("CREATE TABLE t (a INTEGER, b TEXT)"))
+        connection.execute(text("INSERT INTO t VALUES (1, NULL), (2, NULL), (3, 'x'), (4, 'y'), (5, NULL)"))
+        yield connection
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 5, 100])
+def test_read_table_keeps_every_row(connection, batch_size):
+    table = arrow.read_table(connection, text("SELECT a, b FROM t ORDER BY a"), batch_size=batch_size)
+
+    assert table.column("a").to_pylist() == [1, 2, 3, 4, 5]
+    assert table.column("b").to_pylist() == [None, None, "x", "y", None]
+    assert table.schema.field("b").type == pa.string()
+
+
+def test_batches_are_bounded(connection):
+    batches = list(arrow.iter_record_batches(connection, text("SELECT a FROM t ORDER BY a"), batch_size=2))
+
+    assert [batch.num_rows for batch in batches] == [2, 2, 1]
+
+
+def test_empty_result(connection):
+    table = arrow.read_table(connection, text("SELECT a, b FROM t WHERE a > 10"))
+
+    assert table.num_rows == 0
+    assert table.column_names == ["a", "b"]
+
+
+def test_arrow_backend_matches_read_sql(seeded_engine):
+    from rgs_interface.data.interface import DatabaseInterface
+
+    patient_ids = list(range(1, 7))
+    expected = DatabaseInterface(engine=seeded_engine).fetch_dm_data(patient_ids)
+    handler = DatabaseInterface(engine=seeded_engine, fetch_backend="arrow")
+
+    assert len(expected) > 0
+    assert handler.fetch_dm_data(patient_ids).equals(expected)
+    assert handler.fetch_dm_table(patient_ids).num_rows == len(expected)
+    chunks = list(handler.fetch_dm_data_iter(patient_ids, chunksize=7))
+    assert sum(len(chunk) for chunk in chunks) == len(expected)
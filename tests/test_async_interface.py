@@ -0,0 +1,46 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from rgs_interface.data.async_interface import AsyncDatabaseInterface
+from rgs_interface.data.cohort import Cohort
+from rgs_interface.data.interface import DatabaseInterface
+
+PATIENT_IDS = list(range(1, 7))
+
+
+def _run(fetch, seeded_engine, patient_batch_size):
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{seeded_engine.url.database}")
+        try:
+            return await fetch(AsyncDatabaseInterface(engine=engine, patient_batch_size=patient_batch_size))
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("patient_batch_size", [2, 1000], ids=["batched", "single"])
+@pytest.mark.parametrize(
+    "fetch_async, fetch",
+    [
+        (lambda db: db.fetch_timeseries_data(PATIENT_IDS), lambda db: db.fetch_timeseries_data(PATIENT_IDS)),
+        (lambda db: db.fetch_clinical_data(PATIENT_IDS), lambda db: db.fetch_clinical_data(PATIENT_IDS)),
+        (
+            lambda db: db.fetch_clinical_data(Cohort("hospital:1 | patient:2")),
+            lambda db: db.fetch_clinical_data(Cohort("hospital:1 | patient:2")),
+        ),
+    ],
+    ids=["timeseries", "clinical", "cohort"],
+)
+def test_async_matches_sync(seeded_engine, patient_batch_size, fetch_async, fetch):
+    expected = fetch(DatabaseInterface(engine=seeded_engine))
+    actual = _run(fetch_async, seeded_engine, patient_batch_size)
+
+    assert len(expected) > 0
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
@@ -0,0 +1,37 @@
+import uuid
+from datetime import date
+
+from rgs_interface.data.interface import PRESCRIPTION_STAGING_TABLE, prepare_bulk_rows
+from rgs_interface.data.schemas import PrescriptionStagingRow
+
+
+def _params(**overrides):
+    params = {
+        "patient_id": 1,
+        "protocol_id": 2,
+        "starting_date": date(2024, 1, 1),
+        "ending_date": date(2024, 1, 8),
+        "weekday": "MONDAY",
+        "session_duration": 300,
+        "recommendation_id": uuid.uuid4(),
+        "weeks_since_start": 0,
+        "status": "PENDING",
+    }
+    return {**params, **overrides}
+
+
+def test_dict_entries_are_validated_like_rows():
+    entries = [
+        _params(),
+        _params(session_duration=-5),
+        _params(starting_date="2024-01-01"),
+        _params(recommendation_id="not-a-uuid"),
+        _params(weekday="FUNDAY"),
+        {"patient_id": 1},
+    ]
+    result, rows, positions = prepare_bulk_rows(PRESCRIPTION_STAGING_TABLE, PrescriptionStagingRow, entries)
+
+    assert positions == [0]
+    assert rows[0]["WEEKDAY"] == "MONDAY"
+    assert sorted(result.errors) == [1, 2, 3, 4, 5]
+    assert "session_duration" in result.errors[1]
@@ -0,0 +1,88 @@
+import threading
+
+import pandas as pd
+
+from rgs_interface.data.cache import ResultCache
+
+QUERY_FILES = ("query_dm.sql",)
+
+
+def _sessions(*session_ids):
+    return pd.DataFrame({"SESSION_ID": list(session_ids), "VALUE": [float(i) for i in session_ids]})
+
+
+class Loader:
+    def __init__(self, df):
+        self.df = df
+        self.calls = []
+
+    def __call__(self, min_session_id):
+        self.calls.append(min_session_id)
+        return self.df[self.df["SESSION_ID"] >= min_session_id].reset_index(drop=True)
+
+
+def test_entry_is_served_until_it_expires(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("rgs_interface.data.cache.time.time", lambda: now[0])
+    cache = ResultCache(tmp_path, ttl=60)
+    loader = Loader(_sessions(1, 2))
+
+    cache.fetch(QUERY_FILES, "plus", [2, 1], loader)
+    cached = cache.fetch(QUERY_FILES, "plus", [1, 2], loader)
+    assert loader.calls == [0]
+    assert cached["SESSION_ID"].tolist() == [1, 2]
+
+    now[0] += 61
+    cache.fetch(QUERY_FILES, "plus", [1, 2], loader)
+    assert loader.calls == [0, 0]
+    assert (cache.stats.hits, cache.stats.misses) == (1, 2)
+
+
+def test_incremental_refresh_fetches_from_the_high_water_mark(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("rgs_interface.data.cache.time.time", lambda: now[0])
+    cache = ResultCache(tmp_path, ttl=60, incremental=True)
+    loader = Loader(_sessions(1, 2, 3))
+    cache.fetch(QUERY_FILES, "plus", [1], loader)
+
+    now[0] += 61
+    loader.df = pd.DataFrame({"SESSION_ID": [1, 2, 3, 3, 4], "VALUE": [1.0, 2.0, 3.0, 3.5, 4.0]})
+    df = cache.fetch(QUERY_FILES, "plus", [1], loader, sort_by=["SESSION_ID"])
+
+    assert loader.calls == [0, 3]
+    assert cache.stats.incremental_refreshes == 1
+    assert df["SESSION_ID"].tolist() == [1, 2, 3, 3, 4]
+    assert df["VALUE"].tolist() == [1.0, 2.0, 3.0, 3.5, 4.0]
+
+
+def test_concurrent_writes_of_the_same_key(tmp_path):
+    cache = ResultCache(tmp_path, ttl=0)
+    key = cache.key(QUERY_FILES, "plus", [1])
+    frames = [_sessions(*range(i, i + 2000)) for i in range(8)]
+    barrier = threading.Barrier(len(frames))
+    errors = []
+
+    def write(df):
+        barrier.wait()
+        try:
+            cache._write(key, df)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(df,)) for df in frames]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert list(tmp_path.glob("*.tmp")) == []
+    assert len(pd.read_parquet(tmp_path / f"{key}.parquet")) == 2000
+
+
+def test_entries_over_the_size_bound_are_evicted(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=0)
+    cache.fetch(QUERY_FILES, "plus", [1], Loader(_sessions(1)))
+
+    assert cache.size_bytes == 0
+    assert cache.stats.evictions == 1
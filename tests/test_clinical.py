@@ -0,0 +1,58 @@
+import json
+
+import pandas as pd
+import pytest
+
+from rgs_interface.data.clinical import ClinicalScoresCache, flatten_clinical_scores, pivot_clinical_scores
+
+PRE = {"evaluation_date": "2023-12-04", "condition": "pre", "MoCA": {"Naming": 3, "Memory": 4}, "Barthel": 80}
+POST = {"evaluation_date": "2024-02-04", "condition": "post", "MoCA": {"Naming": 5}}
+
+
+def _trials(*documents):
+    return pd.DataFrame({
+        "CLINICAL_TRIAL_ID": range(1, len(documents) + 1),
+        "PATIENT_ID": [100 + i for i in range(len(documents))],
+        "STUDY_ID": "STUDY_001",
+        "CLINICAL_SCORES": list(documents),
+    })
+
+
+def test_documents_are_flattened_per_item():
+    df = flatten_clinical_scores(_trials(json.dumps([PRE, POST]), None, json.dumps(POST)))
+
+    assert df["CLINICAL_TRIAL_ID"].tolist() == [1, 1, 1, 1, 3]
+    assert df["SCALE"].astype(str).tolist() == ["MoCA", "MoCA", "Barthel", "MoCA", "MoCA"]
+    assert df["ITEM"].astype(str).tolist() == ["Naming", "Memory", "Barthel", "Naming", "Naming"]
+    assert df["VALUE"].tolist() == [3, 4, 80, 5, 5]
+    assert df["EVALUATION_DATE"].iloc[0] == pd.Timestamp("2023-12-04")
+
+
+def test_pivot_has_one_row_per_evaluation():
+    wide = pivot_clinical_scores(flatten_clinical_scores(_trials(json.dumps([PRE, POST]))))
+
+    assert wide["CONDITION"].astype(str).tolist() == ["pre", "post"]
+    assert wide["MoCA_Naming"].tolist() == [3, 5]
+    assert wide["Barthel_Barthel"].isna().tolist() == [False, True]
+
+
+def test_unchanged_documents_are_served_from_the_cache():
+    cache = ClinicalScoresCache()
+    flatten_clinical_scores(_trials(json.dumps(PRE), json.dumps(POST)), cache)
+    flatten_clinical_scores(_trials(json.dumps(PRE), json.dumps([POST, PRE])), cache)
+
+    assert (cache.stats.hits, cache.stats.misses) == (1, 3)
+
+
+@pytest.mark.parametrize(
+    "bad",
+    ['{"MoCA": 1}, {"Barthel": 2}', "", "{not json"],
+    ids=["two_values", "empty", "malformed"],
+)
+def test_bad_document_does_not_shift_the_others(bad):
+    cache = ClinicalScoresCache()
+    df = flatten_clinical_scores(_trials(json.dumps(PRE), bad, json.dumps(POST)), cache)
+    expected = flatten_clinical_scores(_trials(json.dumps(PRE), None, json.dumps(POST)))
+
+    pd.testing.assert_frame_equal(df, expected)
+    assert cache.stats.parse_errors == 1
@@ -0,0 +1,88 @@
+import re
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from rgs_interface.data.cohort import COHORT_TABLE_PREFIX, Cohort, CohortSyntaxError, Selector, SetOperation
+from rgs_interface.data.interface import PATIENT_IDS_PARAM, DatabaseInterface, plan_cohort_query
+from rgs_interface.data.queries import registry as queries
+
+
+@pytest.fixture
+def exclude_file(tmp_path):
+    path = tmp_path / "exclude.txt"
+    path.write_text("2\n5\n")
+    return path
+
+
+def test_and_binds_tighter_than_or_and_minus():
+    cohort = Cohort("hospital:1 | patient:2,3 & study:'STUDY 001' - name:ptn")
+
+    intersection = SetOperation("&", Selector("patient", (2, 3)), Selector("study", ("STUDY 001",)))
+    assert cohort.root == SetOperation(
+        "-", SetOperation("|", Selector("hospital", (1,)), intersection), Selector("name", ("ptn",))
+    )
+
+
+def test_parentheses_group():
+    cohort = Cohort("(hospital:1 | hospital:2) & patient:1")
+
+    assert cohort.root.op == "&"
+    assert cohort.root.left == SetOperation("|", Selector("hospital", (1,)), Selector("hospital", (2,)))
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "", "hospital:1 &", "(hospital:1", "hospital:x", "ward:1", "hospital:1 patient:2", "file:a,b",
+        "hospital:1-patient:2",
+    ],
+)
+def test_malformed_expressions_are_rejected(expression):
+    with pytest.raises(CohortSyntaxError):
+        Cohort(expression)
+
+
+@pytest.mark.parametrize("query", ["query_all.sql", "query_emotional.sql"])
+def test_file_tables_are_referenced_once(exclude_file, query):
+    cohort = Cohort(f"hospital:1,2 - file:{exclude_file}")
+    sql_query, _, setup = plan_cohort_query(queries.render(query, "plus"), {PATIENT_IDS_PARAM: cohort})
+
+    tables = re.findall(rf"\b{COHORT_TABLE_PREFIX}\w+", str(sql_query))
+    assert len(tables) > 1
+    assert len(tables) == len(set(tables))
+    created = {re.search(rf"{COHORT_TABLE_PREFIX}\w+", str(statement)).group() for statement, _ in setup}
+    assert created == set(tables)
+
+
+def test_multi_placeholder_query_filters_on_cohort(seeded_engine, exclude_file):
+    db = DatabaseInterface(engine=seeded_engine)
+    query = (
+        "SELECT PATIENT_ID FROM patient WHERE PATIENT_ID IN :patient_ids "
+        "AND HOSPITAL_ID IN (SELECT HOSPITAL_ID FROM patient WHERE PATIENT_ID IN :patient_ids) "
+        "ORDER BY PATIENT_ID"
+    )
+    df = db._fetch(query=query, params={PATIENT_IDS_PARAM: Cohort(f"patient:1,2,3,4,5,6 - file:{exclude_file}")})
+
+    assert df["PATIENT_ID"].tolist() == [1, 3, 4, 6]
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "name:ptn_00000 - patient:1",
+        "(hospital:1 | hospital:2) & patient:1,2,3",
+        "study:STUDY_001",
+        "study:STUDY_002,STUDY_003 | patient:1",
+        "hospital:1 & study:STUDY_001,STUDY_002",
+        "hospital:1,2 - study:STUDY_003",
+    ],
+)
+def test_evaluate_matches_database(seeded_engine, expression):
+    cohort = Cohort(expression)
+    with seeded_engine.connect() as connection:
+        patients = pd.read_sql(text("SELECT * FROM patient"), connection)
+        trials = pd.read_sql(text("SELECT * FROM clinical_trials"), connection)
+
+    assert cohort.evaluate(patients, trials) == DatabaseInterface(engine=seeded_engine).resolve_cohort(cohort)
@@ -0,0 +1,52 @@
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+
+from rgs_interface.db import TimedQueuePool, _instrument, get_pool_metrics
+
+CONNECT_SECONDS = 0.2
+
+
+def _slow_engine():
+    def connect():
+        time.sleep(CONNECT_SECONDS)
+        return sqlite3.connect(":memory:", check_same_thread=False)
+
+    engine = create_engine("sqlite://", creator=connect, poolclass=TimedQueuePool, pool_size=1, max_overflow=0)
+    _instrument(engine)
+    return engine
+
+
+def test_connect_time_is_not_wait_time():
+    engine = _slow_engine()
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    metrics = get_pool_metrics(engine)
+    assert metrics["connections_created"] == 1
+    assert metrics["connect_seconds_total"] >= CONNECT_SECONDS
+    assert metrics["wait_seconds_total"] < CONNECT_SECONDS / 2
+
+
+def test_wait_for_a_pooled_connection_is_counted():
+    engine = _slow_engine()
+    held = threading.Event()
+
+    def hold():
+        with engine.connect():
+            held.set()
+            time.sleep(0.3)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    held.wait()
+    with engine.connect():
+        pass
+    thread.join()
+
+    metrics = get_pool_metrics(engine)
+    assert metrics["checkouts"] == 2
+    assert metrics["connections_created"] == 1
+    assert metrics["wait_seconds_max"] >= 0.2
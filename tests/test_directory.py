@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from rgs_interface.data.directory import PatientDirectory, recommendation_due
+
+
+@pytest.fixture
+def directory(seeded_engine):
+    return PatientDirectory(seeded_engine, refresh_interval=0)
+
+
+def _query(engine, sql, **params):
+    with engine.connect() as connection:
+        return pd.read_sql(text(sql), connection, params=params, dtype_backend="numpy_nullable")
+
+
+def test_by_hospital_matches_database(seeded_engine, directory):
+    expected = _query(seeded_engine, "SELECT PATIENT_ID FROM patient WHERE HOSPITAL_ID IN (1, 2) ORDER BY PATIENT_ID")
+
+    assert directory.by_hospital([2, 1, 3])["PATIENT_ID"].tolist() == expected["PATIENT_ID"].tolist()
+
+
+@pytest.mark.parametrize("pattern", ["ptn_00000", "PTN_000003", "00_0", "ptn%5", "missing", ""])
+def test_by_name_matches_like(seeded_engine, directory, pattern):
+    sql = "SELECT * FROM patient WHERE PATIENT_USER LIKE :pattern ORDER BY PATIENT_ID"
+    expected = _query(seeded_engine, sql, pattern=f"%{pattern}%")
+
+    assert directory.by_name(pattern)["PATIENT_ID"].tolist() == expected["PATIENT_ID"].tolist()
+
+
+def test_by_study_returns_the_trials_due_today(seeded_engine, directory):
+    today = pd.Timestamp.now().normalize()
+    end, due_start, not_due_start = (str(today + pd.Timedelta(days=days)) for days in (30, -14, -3))
+    with seeded_engine.begin() as connection:
+        connection.execute(text("UPDATE clinical_trials SET RECOMMEND = 1, END_DATE = :end"), {"end": end})
+        connection.execute(
+            text("UPDATE clinical_trials SET START_DATE = CASE WHEN PATIENT_ID % 2 = 0 THEN :due ELSE :not_due END"),
+            {"due": due_start, "not_due": not_due_start},
+        )
+    trials = _query(seeded_engine, "SELECT * FROM clinical_trials")
+    study_ids = trials["STUDY_ID"].unique().tolist()
+
+    due = directory.by_study(study_ids)
+    expected = trials[recommendation_due(trials)]
+
+    assert len(due) > 0
+    assert sorted(due["PATIENT_ID"].tolist()) == sorted(expected["PATIENT_ID"].tolist())
+    assert all(patient_id % 2 == 0 for patient_id in due["PATIENT_ID"])
+
+
+def test_refresh_loads_new_patients(seeded_engine, directory):
+    n_patients = len(directory.patients())
+    with seeded_engine.begin() as connection:
+        connection.execute(
+            text("INSERT INTO patient (PATIENT_ID, HOSPITAL_ID, PATIENT_USER) VALUES (100, 1, 'new_user')")
+        )
+
+    assert directory.by_name("new_user")["PATIENT_ID"].tolist() == [100]
+    assert 100 in directory.by_hospital([1])["PATIENT_ID"].tolist()
+    assert len(directory.patients()) == n_patients + 1
+    assert directory.stats.delta_refreshes >= 1
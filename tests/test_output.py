@@ -0,0 +1,81 @@
+import pandas as pd
+import pyarrow.dataset as ds
+import pytest
+
+from rgs_interface.data.output import OutputSink
+
+
+def _read(path, output_format):
+    dataset = ds.dataset(path, format="ipc" if output_format == "feather" else output_format, partitioning="hive")
+    return dataset.to_table().to_pandas().sort_values("a", ignore_index=True)
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "feather"])
+@pytest.mark.parametrize("partition_cols", [None, ["a"]])
+def test_all_null_first_chunk_takes_declared_type(tmp_path, output_format, partition_cols):
+    path = tmp_path / f"out.{output_format}"
+    with OutputSink(path, partition_cols=partition_cols, column_types={"c": "double"}) as sink:
+        sink.write_chunk(pd.DataFrame({"a": [1, 2], "b": [None, None], "c": [1, 2]}))
+        sink.write_chunk(pd.DataFrame({"a": [3], "b": ["x"], "c": [1.5]}))
+        sink.write_chunk(pd.DataFrame({"a": [4], "b": [None], "c": [4]}))
+
+    df = _read(path, output_format)
+    assert df["b"].tolist() == [None, None, "x", None]
+    assert df["c"].tolist() == [1.0, 2.0, 1.5, 4.0]
+    assert sink.n_rows == 4
+
+
+def test_csv_chunks_are_appended(tmp_path):
+    path = tmp_path / "out.csv"
+    with OutputSink(path) as sink:
+        sink.write_chunk(pd.DataFrame({"a": [1], "b": [None]}))
+        sink.write_chunk(pd.DataFrame({"a": [2], "b": ["x"]}))
+
+    assert pd.read_csv(path)["b"].tolist()[1] == "x"
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "feather"])
+def test_categorical_chunks_with_different_categories(tmp_path, output_format):
+    path = tmp_path / f"out.{output_format}"
+    with OutputSink(path) as sink:
+        sink.write_chunk(pd.DataFrame({"a": [1, 2], "key": pd.Categorical(["x", "y"])}))
+        sink.write_chunk(pd.DataFrame({"a": [3, 4], "key": pd.Categorical(["z", "x"])}))
+        sink.write_chunk(pd.DataFrame({"a": range(5, 305), "key": pd.Categorical([f"k{i}" for i in range(300)])}))
+
+    df = _read(path, output_format)
+    assert df["key"].astype(str).tolist()[:5] == ["x", "y", "z", "x", "k0"]
+    assert len(df) == 304
+
+
+def test_undeclared_columns_are_widened(tmp_path):
+    path = tmp_path / "out.parquet"
+    with OutputSink(path) as sink:
+        sink.write_chunk(pd.DataFrame({"a": pd.Series([1, 2], dtype="uint8"), "b": [None, None]}))
+        sink.write_chunk(pd.DataFrame({"a": pd.Series([300], dtype="uint16"), "b": ["x"]}))
+
+    df = pd.read_parquet(path)
+    assert df["a"].tolist() == [1, 2, 300]
+    assert df["b"].tolist() == [None, None, "x"]
+
+
+def test_declared_types_match_streamed_query(tmp_path):
+    from rgs_interface.data.dtypes import QUERY_COLUMN_TYPES
+
+    path = tmp_path / "out.parquet"
+    first = pd.DataFrame({
+        "SESSION_ID": pd.array([None], dtype="Int64"),
+        "SESSION_DATE": pd.array([None], dtype="string"),
+        "DM_VALUE": pd.array([None], dtype="string"),
+    })
+    later = pd.DataFrame({
+        "SESSION_ID": [7],
+        "SESSION_DATE": pd.to_datetime(["2024-01-02 10:00"]),
+        "DM_VALUE": [0.25],
+    })
+    with OutputSink(path, column_types=QUERY_COLUMN_TYPES["query.sql"]) as sink:
+        sink.write_chunk(first)
+        sink.write_chunk(later)
+
+    df = pd.read_parquet(path)
+    assert df["SESSION_DATE"].iloc[1] == pd.Timestamp("2024-01-02 10:00")
+    assert df["DM_VALUE"].iloc[1] == 0.25
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("sklearn")
+
+from rgs_interface.data.preprocess import (
+    PreprocessingArtifact,
+    preprocess_rgs_interaction,
+    preprocess_rgs_interaction_chunked,
+    transform_only,
+)
+
+
+def _identity(df):
+    return df.copy()
+
+
+@pytest.fixture
+def data():
+    return pd.DataFrame({
+        "AGE": [70.0, 65.0, np.nan, 80.0, 72.0, 58.0, 61.0],
+        "DM_VALUE": [0.1, 0.5, 0.3, 0.9, 0.2, 0.4, 0.6],
+        "SEX": ["M", "F", None, np.nan, "F", "M", pd.NA],
+        "GAME_MODE": ["A", "B", "A", "C", "B", "A", "C"],
+        "COMMENTS": pd.Series([None] * 7, dtype=object),
+    })
+
+
+def _chunks(data, size=3):
+    return lambda: (data.iloc[i:i + size] for i in range(0, len(data), size))
+
+
+def test_missing_values_encode_the_same_in_every_path(tmp_path, data):
+    expected = preprocess_rgs_interaction(data, _identity, tmp_path, artifact_filename="artifact.joblib")
+    assert "SEX_None" in expected.columns
+    assert "COMMENTS_None" in expected.columns
+
+    preprocess_rgs_interaction_chunked(
+        _chunks(data), _identity, tmp_path, pipeline_filename=None, artifact_filename="chunked.joblib"
+    )
+    chunked = pd.read_parquet(tmp_path / "rgs_interaction_processed")
+    pd.testing.assert_frame_equal(chunked, expected)
+
+    for artifact in ("artifact.joblib", "chunked.joblib"):
+        pd.testing.assert_frame_equal(transform_only(data, tmp_path / artifact), expected)
+        record = transform_only(data.iloc[2].to_dict(), tmp_path / artifact)
+        np.testing.assert_allclose(record, expected.iloc[2].to_numpy(), equal_nan=True)
+
+
+def test_missing_value_unseen_in_fit_is_all_zeros(tmp_path, data):
+    fitted = data.assign(SEX=["M", "F", "F", "M", "F", "M", "F"])
+    preprocess_rgs_interaction(fitted, _identity, tmp_path, artifact_filename="artifact.joblib")
+    artifact = PreprocessingArtifact.load(tmp_path / "artifact.joblib")
+
+    out = artifact.transform_frame(data)
+    assert "SEX_None" not in out.columns
+    assert (out.loc[data["SEX"].isna(), ["SEX_F", "SEX_M"]] == 0).all().all()
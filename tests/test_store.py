@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from rgs_interface.data.interface import DatabaseInterface
+from rgs_interface.data.store import LocalStore
+
+PATIENT_IDS = list(range(1, 7))
+
+
+@pytest.fixture
+def handlers(seeded_engine, tmp_path):
+    store = LocalStore(tmp_path / "store")
+    store.sync(seeded_engine, ["plus"])
+    return DatabaseInterface(engine=seeded_engine), DatabaseInterface(engine=seeded_engine, local_store=store)
+
+
+def _sorted(df, by):
+    return df.sort_values(by).reset_index(drop=True)
+
+
+@pytest.mark.parametrize(
+    "fetch, key",
+    [
+        (lambda db: db.fetch_dm_data(PATIENT_IDS), ["SESSION_ID", "SECONDS_FROM_START", "DM_KEY"]),
+        (lambda db: db.fetch_pe_data(PATIENT_IDS), ["SESSION_ID", "SECONDS_FROM_START", "PE_KEY"]),
+        (lambda db: db.fetch_clinical_data(PATIENT_IDS), ["CLINICAL_TRIAL_ID"]),
+        (lambda db: db.fetch_emotional_data(PATIENT_IDS), ["PATIENT_ID", "ANSWER_DATE"]),
+        (lambda db: db.fetch_patients(), ["PATIENT_ID"]),
+    ],
+    ids=["dm", "pe", "clinical", "emotional", "patients"],
+)
+def test_local_store_matches_database(handlers, fetch, key):
+    database, local = handlers
+    expected = fetch(database)
+    actual = fetch(local)
+
+    assert len(expected) > 0
+    pd.testing.assert_frame_equal(_sorted(actual, key), _sorted(expected, key), check_dtype=False)
+
+
+def test_sync_pulls_every_row(seeded_engine, tmp_path):
+    pulled = LocalStore(tmp_path / "store").sync(seeded_engine, ["plus"])
+
+    with seeded_engine.connect() as connection:
+        for table_name in ("patient", "session_plus", "difficulty_modulators_plus", "performance_estimators_plus"):
+            count = connection.execute(text(f"SELECT COUNT(*) FROM {table_name}")).scalar()
+            assert pulled[table_name] == count, table_name
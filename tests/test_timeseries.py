@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from rgs_interface.data.interface import DatabaseInterface
+from rgs_interface.data.timeseries import TIMESERIES_INDEX, pivot_timeseries
+
+PATIENT_IDS = list(range(1, 7))
+
+
+def _long(keys, values, seconds, key_column, value_column):
+    return pd.DataFrame({
+        "SESSION_ID": 1, "PATIENT_ID": 10, "PROTOCOL_ID": 5, "GAME_MODE": "STANDARD",
+        "SECONDS_FROM_START": seconds, key_column: keys, value_column: values,
+    })
+
+
+def _reference(dm, pe):
+    long = pd.concat([
+        dm.rename(columns={"DM_KEY": "KEY", "DM_VALUE": "VALUE"}),
+        pe.rename(columns={"PE_KEY": "KEY", "PE_VALUE": "VALUE"}),
+    ])
+    wide = long.pivot_table(index=TIMESERIES_INDEX, columns="KEY", values="VALUE", aggfunc="last")
+    wide.columns = wide.columns.astype(object).rename(None)
+    return wide.reset_index()
+
+
+def test_pivot_matches_pivot_table(seeded_engine):
+    db = DatabaseInterface(engine=seeded_engine)
+    dm, pe = db.fetch_dm_data(PATIENT_IDS), db.fetch_pe_data(PATIENT_IDS)
+    wide = db.fetch_timeseries_data(PATIENT_IDS)
+
+    assert len(wide) > 0
+    expected = _reference(dm, pe)
+    pd.testing.assert_frame_equal(wide[expected.columns], expected, check_dtype=False)
+
+
+def test_timestamps_in_one_part_only_get_nan():
+    dm = _long(["speed", "speed"], [1.0, 2.0], [0.0, 1.0], "DM_KEY", "DM_VALUE")
+    pe = _long(["hits"], [7.0], [2.0], "PE_KEY", "PE_VALUE")
+    wide = pivot_timeseries(dm, pe)
+
+    assert wide["SECONDS_FROM_START"].tolist() == [0.0, 1.0, 2.0]
+    np.testing.assert_array_equal(wide["speed"], [1.0, 2.0, np.nan])
+    np.testing.assert_array_equal(wide["hits"], [np.nan, np.nan, 7.0])
+
+
+def test_keys_in_both_parts_are_prefixed():
+    dm = _long(["level"], [3.0], [0.0], "DM_KEY", "DM_VALUE")
+    pe = _long(["level"], [0.5], [0.0], "PE_KEY", "PE_VALUE")
+
+    wide = pivot_timeseries(dm, pe)
+    assert wide[["DM_VALUE_level", "PE_VALUE_level"]].iloc[0].tolist() == [3.0, 0.5]
+
+
+def test_no_samples_give_an_empty_frame(seeded_engine):
+    wide = DatabaseInterface(engine=seeded_engine).fetch_timeseries_data([999])
+
+    assert wide is not None
+    assert len(wide) == 0
+    assert list(wide.columns) == TIMESERIES_INDEX